@@ -0,0 +1,203 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import bindparam, event, text
+from typing import Dict, Iterable, Optional, Tuple
+import logging
+import secrets
+import threading
+import time
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Catalogo de la pantalla de venta (huevos de stock y gallinas de salvamento) con su
+# disponibilidad, en memoria y versionado:
+# - cada producto guarda la version en que cambio por ultima vez, asi que
+#   ?since=<version> devuelve solo los que cambiaron despues.
+# - la version es "<epoca>-<contador>": la epoca identifica a este proceso (cada
+#   worker y cada reinicio tiene la suya) y el contador solo crece dentro de el.
+#   Un since de otra epoca no se puede comparar y recibe el catalogo completo.
+# - app/crud/stock.py anota en la sesion los productos que modifica (marcar_cambio);
+#   al hacer commit quedan pendientes y en la siguiente lectura se recargan solo esos.
+# - CATALOGO_CACHE_TTL recarga todo el catalogo para ver los cambios de otros procesos.
+
+TIPO_POR_DETALLE = {"detalle_huevos": "huevos", "detalle_salvamento": "salvamento"}
+COLUMNA_ID = {"huevos": "id_producto", "salvamento": "id_salvamento"}
+CONSULTAS = {
+    "huevos": """
+        SELECT
+            stock.id_producto,
+            stock.unidad_medida,
+            tipo_huevos.color,
+            tipo_huevos.tamaño AS tamanio,
+            stock.cantidad_disponible AS disponible
+        FROM stock
+        INNER JOIN tipo_huevos ON tipo_huevos.id_tipo_huevo = stock.tipo
+        {filtro}
+    """,
+    "salvamento": """
+        SELECT
+            salvamento.id_salvamento,
+            tipo_gallinas.raza,
+            tipo_gallinas.descripcion,
+            salvamento.cantidad_gallinas AS disponible
+        FROM salvamento
+        INNER JOIN tipo_gallinas ON salvamento.id_tipo_gallina = tipo_gallinas.id_tipo_gallinas
+        {filtro}
+    """,
+}
+FILTROS_ID = {"huevos": "WHERE stock.id_producto IN :ids", "salvamento": "WHERE salvamento.id_salvamento IN :ids"}
+
+CAMBIOS_SESION = "catalogo_cambios"
+
+_lock = threading.Lock()
+# Una recarga a la vez: consultar y aplicar en orden evita que una recarga que
+# leyo antes (p. ej. la completa) pise los datos de otra que leyo despues.
+_lock_recarga = threading.Lock()
+# (tipo, id) -> fila del producto con su "version" (contador); los eliminados quedan con "eliminado"
+_productos: Dict[Tuple[str, int], dict] = {}
+_epoca = secrets.token_hex(6)
+_version = 0
+_cargado_en: Optional[float] = None
+_pendientes: Dict[str, Optional[set]] = {}  # tipo -> ids por recargar (None = todos)
+_stats = {"recargas": 0, "recargas_parciales": 0, "cambios": 0}
+
+
+def marcar_cambio(db: Session, tabla_detalle: str, ids: Optional[Iterable[int]] = None) -> None:
+    '''
+    Anota en la sesion los productos cuya disponibilidad cambia (None = todos los
+    del tipo). Pasan al catalogo cuando la sesion hace commit.
+    '''
+    tipo = TIPO_POR_DETALLE[tabla_detalle]
+    _agregar_pendientes(db.info.setdefault(CAMBIOS_SESION, {}), tipo, ids)
+
+
+def _agregar_pendientes(pendientes: dict, tipo: str, ids: Optional[Iterable[int]]) -> None:
+    if ids is None or (tipo in pendientes and pendientes[tipo] is None):
+        pendientes[tipo] = None
+    else:
+        pendientes.setdefault(tipo, set()).update(ids)
+
+
+@event.listens_for(Session, "after_commit")
+def _confirmar_cambios(session):
+    cambios = session.info.pop(CAMBIOS_SESION, None)
+    if cambios:
+        with _lock:
+            for tipo, ids in cambios.items():
+                _agregar_pendientes(_pendientes, tipo, ids)
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _descartar_cambios(session, transaction):
+    if transaction.parent is None:
+        session.info.pop(CAMBIOS_SESION, None)
+
+
+def _consultar(db: Session, tipo: str, ids: Optional[set] = None) -> Dict[Tuple[str, int], dict]:
+    if ids is None:
+        sentencia = text(CONSULTAS[tipo].format(filtro=""))
+        params = {}
+    else:
+        sentencia = text(CONSULTAS[tipo].format(filtro=FILTROS_ID[tipo])).bindparams(bindparam("ids", expanding=True))
+        params = {"ids": list(ids)}
+    return {(tipo, fila[COLUMNA_ID[tipo]]): dict(fila) for fila in db.execute(sentencia, params).mappings()}
+
+
+def _version_texto(contador: int) -> str:
+    return f"{_epoca}-{contador}"
+
+
+def _contador_since(since: Optional[str]) -> Optional[int]:
+    '''
+    Contador de una version de este proceso, o None si since no es de esta
+    epoca (otro worker, un reinicio o un valor invalido) o es posterior a la actual.
+    '''
+    if since is None:
+        return None
+    epoca, _, contador = since.rpartition("-")
+    if epoca != _epoca or not contador.isdigit() or int(contador) > _version:
+        return None
+    return int(contador)
+
+
+def _refrescar(db: Session) -> None:
+    '''
+    Recarga todo el catalogo si vencio el TTL (o nunca se cargo) y, si no,
+    solo los productos pendientes. Cada producto cuyo dato cambio recibe una version nueva.
+    '''
+    with _lock_recarga:
+        _recargar(db)
+
+
+def _recargar(db: Session) -> None:
+    global _version, _cargado_en
+    ahora = time.monotonic()
+    with _lock:
+        completo = _cargado_en is None or ahora - _cargado_en > settings.CATALOGO_CACHE_TTL
+        pendientes = dict(_pendientes)
+        _pendientes.clear()
+    if not completo and not pendientes:
+        return
+
+    try:
+        if completo:
+            filas = {**_consultar(db, "huevos"), **_consultar(db, "salvamento")}
+        else:
+            filas = {}
+            for tipo, ids in pendientes.items():
+                filas.update(_consultar(db, tipo, ids))
+    except Exception as e:
+        logger.error(f"Error al recargar el catalogo: {e}")
+        with _lock:
+            for tipo, ids in pendientes.items():
+                _agregar_pendientes(_pendientes, tipo, ids)
+        raise
+
+    with _lock:
+        for clave, fila in filas.items():
+            anterior = _productos.get(clave)
+            if anterior is None or {k: v for k, v in anterior.items() if k != "version"} != fila:
+                _version += 1
+                _productos[clave] = {**fila, "version": _version}
+                _stats["cambios"] += 1
+        # Productos que ya no existen (en la recarga completa o entre los pendientes)
+        revisados = _productos if completo else [
+            clave for clave in _productos
+            if clave[0] in pendientes and (pendientes[clave[0]] is None or clave[1] in pendientes[clave[0]])
+        ]
+        for clave in [clave for clave in revisados if clave not in filas and not _productos[clave].get("eliminado")]:
+            _version += 1
+            _productos[clave] = {"eliminado": True, "version": _version}
+        if completo:
+            _cargado_en = ahora
+            _stats["recargas"] += 1
+        else:
+            _stats["recargas_parciales"] += 1
+
+
+def obtener_catalogo(db: Session, since: Optional[str] = None) -> dict:
+    '''
+    Catalogo con la version actual. Con since solo los productos que cambiaron
+    despues de esa version (completo=False), salvo que since sea de otra epoca
+    (otro worker o un reinicio): entonces se devuelve completo.
+    '''
+    _refrescar(db)
+    with _lock:
+        desde = _contador_since(since)
+        catalogo = {"version": _version_texto(_version), "completo": desde is None, "huevos": [], "salvamento": [],
+                    "eliminados": {"huevos": [], "salvamento": []}}
+        for (tipo, id_producto), producto in _productos.items():
+            if desde is not None and producto["version"] <= desde:
+                continue
+            if producto.get("eliminado"):
+                if desde is not None:
+                    catalogo["eliminados"][tipo].append(id_producto)
+            else:
+                catalogo[tipo].append({**producto, "version": _version_texto(producto["version"])})
+    return catalogo
+
+
+def catalogo_stats() -> dict:
+    with _lock:
+        return {**_stats, "version": _version_texto(_version), "productos": len(_productos), "ttl": settings.CATALOGO_CACHE_TTL}
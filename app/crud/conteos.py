@@ -0,0 +1,120 @@
+from collections import OrderedDict, defaultdict
+from sqlalchemy.orm import Session
+from sqlalchemy import text
+from typing import Dict, Hashable, Optional, Tuple
+import logging
+import threading
+import time
+
+from core.config import settings
+from core.dialect import es_sqlite
+
+logger = logging.getLogger(__name__)
+
+# Modos de conteo de los listados paginados
+EXACTO = "exacto"      # COUNT real (guardado en cache por filtro)
+ESTIMADO = "estimado"  # estadisticas del motor, solo para listados sin filtro
+NINGUNO = "ninguno"    # no se cuenta; total_* y total_pages salen en null
+
+# Descripcion de los parametros de consulta que eligen el modo en los routers
+DESCRIPCION_INCLUDE_TOTAL = "Si es false no se cuenta el total: total_* y total_pages salen en null"
+DESCRIPCION_ESTIMATED_TOTAL = "Total aproximado desde las estadisticas del motor (solo listados sin filtro)"
+
+# Conteos en memoria: (tabla, consulta, parametros) -> (total, momento en que se conto).
+# Los CRUD que escriben en la tabla llaman a invalidar_conteos(tabla); el TTL
+# cubre las escrituras hechas por otros procesos (otros workers, scripts).
+_lock = threading.Lock()
+_conteos: "OrderedDict[Tuple[str, str, Hashable], Tuple[int, float]]" = OrderedDict()
+_versiones: Dict[str, int] = defaultdict(int)
+_stats = {"hits": 0, "misses": 0}
+
+
+def modo_conteo(include_total: bool, estimated_total: bool) -> str:
+    if not include_total:
+        return NINGUNO
+    return ESTIMADO if estimated_total else EXACTO
+
+
+def total_paginas(total: Optional[int], page_size: int) -> Optional[int]:
+    if total is None:
+        return None
+    return (total + page_size - 1) // page_size
+
+
+def invalidar_conteos(tabla: str):
+    '''
+    Descarta los conteos guardados de la tabla (llamar despues de escribir en ella).
+    '''
+    with _lock:
+        _versiones[tabla] += 1
+        for clave in [clave for clave in _conteos if clave[0] == tabla]:
+            del _conteos[clave]
+
+
+def contar(db: Session, tabla: str, consulta: str, params: Optional[dict] = None) -> int:
+    '''
+    Ejecuta la consulta COUNT o devuelve el resultado guardado para el mismo filtro.
+    '''
+    params = params or {}
+    clave = (tabla, consulta, tuple(sorted(params.items())))
+    ttl = settings.CONTEOS_CACHE_TTL
+
+    if ttl > 0:
+        with _lock:
+            entrada = _conteos.get(clave)
+            if entrada is not None and time.monotonic() - entrada[1] <= ttl:
+                _conteos.move_to_end(clave)
+                _stats["hits"] += 1
+                return entrada[0]
+            _stats["misses"] += 1
+            version_inicial = _versiones[tabla]
+
+    total = db.execute(text(consulta), params).scalar() or 0
+
+    if ttl > 0:
+        with _lock:
+            # Si hubo una escritura mientras se contaba, el resultado puede estar desactualizado
+            if _versiones[tabla] == version_inicial:
+                _conteos[clave] = (total, time.monotonic())
+                _conteos.move_to_end(clave)
+                while len(_conteos) > settings.CONTEOS_CACHE_SIZE:
+                    _conteos.popitem(last=False)
+    return total
+
+
+def contar_estimado(db: Session, tabla: str) -> int:
+    '''
+    Numero aproximado de filas de la tabla sin recorrerla:
+    - MySQL/MariaDB: TABLE_ROWS de information_schema (estadistica de InnoDB).
+    - SQLite: MAX(rowid), que ignora los huecos de filas borradas.
+    Si el motor no tiene el dato se hace el conteo exacto.
+    '''
+    if es_sqlite(db):
+        estimado = db.execute(text(f"SELECT MAX(rowid) FROM {tabla}")).scalar()
+    else:
+        estimado = db.execute(text("""
+            SELECT TABLE_ROWS
+            FROM information_schema.TABLES
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :tabla
+        """), {"tabla": tabla}).scalar()
+    if estimado is None:
+        return contar(db, tabla, f"SELECT COUNT(*) FROM {tabla}")
+    return int(estimado)
+
+
+def contar_segun_modo(db: Session, modo: str, tabla: str, consulta: str, params: Optional[dict] = None,
+                      filtrado: bool = False) -> Optional[int]:
+    '''
+    Total de un listado segun el modo pedido. Los listados filtrados no tienen
+    estimacion barata, asi que en modo ESTIMADO usan el conteo exacto en cache.
+    '''
+    if modo == NINGUNO:
+        return None
+    if modo == ESTIMADO and not filtrado:
+        return contar_estimado(db, tabla)
+    return contar(db, tabla, consulta, params)
+
+
+def conteos_cache_stats() -> dict:
+    with _lock:
+        return {**_stats, "size": len(_conteos), "ttl": settings.CONTEOS_CACHE_TTL}
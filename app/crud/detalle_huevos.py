@@ -1,18 +1,21 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import text
+from sqlalchemy import bindparam, text
 from sqlalchemy.exc import SQLAlchemyError
-from typing import Optional
+from typing import List, Optional
 from fastapi import HTTPException
 import logging
 
 from app.schemas.detalle_huevos import DetalleHuevosCreate, DetalleHuevosUpdate
+from app.crud.totales_venta import ajustar_total_venta, quitar_detalles_de_totales
+from app.crud.stock import devolver_existencia, devolver_existencias, registrar_movimientos, reservar_existencias, reservar_para_venta
 
 logger = logging.getLogger(__name__)
 
 def create_detalle_huevos(db: Session, detalle_h: DetalleHuevosCreate) -> dict:
     try:
-        stock_disponible = db.execute(text("SELECT cantidad_disponible FROM stock WHERE id_producto = :id_producto"), {"id_producto": detalle_h.id_producto}).mappings().first()
-        if not stock_disponible or stock_disponible['cantidad_disponible'] < detalle_h.cantidad:
+        # Descuenta el stock solo si alcanza (una sentencia, sin carrera entre ventas simultaneas)
+        if not reservar_para_venta(db, "detalle_huevos", detalle_h.id_producto, detalle_h.cantidad, detalle_h.id_venta):
+            db.rollback()
             raise HTTPException(status_code=400, detail="Stock insuficiente para completar la operación")
 
         sentencia = text("""
@@ -24,14 +27,14 @@ def create_detalle_huevos(db: Session, detalle_h: DetalleHuevosCreate) -> dict:
                 :valor_descuento, :precio_venta
             )
         """)
-        db.execute(sentencia, detalle_h.model_dump())
-        id_creado = db.execute(text("SELECT LAST_INSERT_ID()")).scalar()
-        
-        db.execute(text("""
-            UPDATE stock
-            SET cantidad_disponible = cantidad_disponible - :cantidad
-            WHERE id_producto = :id_producto
-        """), {"cantidad": detalle_h.cantidad, "id_producto": detalle_h.id_producto})
+        detalle_data = detalle_h.model_dump()
+        resultado = db.execute(sentencia, detalle_data)
+        id_creado = resultado.lastrowid
+        registrar_movimientos(db, "detalle_huevos", [{
+            "id_producto": detalle_h.id_producto, "delta": -detalle_h.cantidad, "motivo": "venta",
+            "id_venta": detalle_h.id_venta, "id_detalle": id_creado,
+        }])
+        ajustar_total_venta(db, detalle_h.id_venta, agregados=[detalle_data])
         db.commit()
         return {"id_detalle_huevo": id_creado}
     except SQLAlchemyError as e:
@@ -49,10 +52,12 @@ def update_detalle_huevos_by_id(db: Session, detalle_id: int, detalle_h: Detalle
         
 
         datos_anteriores = db.execute(text("""
-            SELECT id_producto, cantidad
+            SELECT id_producto, cantidad, id_venta, valor_descuento, precio_venta
             FROM detalle_huevos
             WHERE id_detalle = :id_detalle
         """), {"id_detalle": detalle_id}).mappings().first()
+        if datos_anteriores is None:
+            raise HTTPException(status_code=404, detail="Detalle de huevos no encontrado")
 
         id_producto_anterior = datos_anteriores['id_producto']
         cantidad_anterior = datos_anteriores['cantidad']
@@ -62,47 +67,28 @@ def update_detalle_huevos_by_id(db: Session, detalle_id: int, detalle_h: Detalle
         cantidad_nueva = detalle_huevos_data.get('cantidad', cantidad_anterior)
 
 
+        # Primero se reserva lo que se descuenta: si no alcanza, aun no se ha modificado nada
         if id_producto_nuevo != id_producto_anterior:
-            
-            stock_nuevo = db.execute(text("""
-                SELECT cantidad_disponible FROM stock WHERE id_producto = :id
-            """), {"id": id_producto_nuevo}).mappings().first()
-
-            if not stock_nuevo:
-                raise HTTPException(status_code=400, detail="Error validacion")
-            
-            if stock_nuevo['cantidad_disponible'] < cantidad_nueva:
+            if not reservar_existencias(db, "detalle_huevos", id_producto_nuevo, cantidad_nueva):
+                db.rollback()
                 raise HTTPException(status_code=400, detail="Stock insuficiente en este producto")
-        else:
-            diferencia_cantidad = cantidad_nueva - cantidad_anterior
-            if diferencia_cantidad > 0:
-                stock_actual = db.execute(text("""
-                    SELECT cantidad_disponible FROM stock WHERE id_producto = :id
-                """), {"id": id_producto_nuevo}).mappings().first()
-
-                if not stock_actual or stock_actual['cantidad_disponible'] < diferencia_cantidad:
-                    raise HTTPException(status_code=400, detail="Stock insuficiente")
-                
-        if id_producto_nuevo != id_producto_anterior:
-            db.execute(text("""
-                UPDATE stock
-                SET cantidad_disponible = cantidad_disponible + :cant
-                WHERE id_producto = :id_ant
-            """), {"cant": cantidad_anterior, "id_ant": id_producto_anterior})
-
-            db.execute(text("""
-                UPDATE stock
-                SET cantidad_disponible = cantidad_disponible - :cantidad_nueva
-                WHERE id_producto = :id_producto_nuevo
-            """), {"cantidad_nueva": cantidad_nueva, "id_producto_nuevo": id_producto_nuevo})
+            devolver_existencia(db, "detalle_huevos", id_producto_anterior, cantidad_anterior)
+            movimientos = [
+                {"id_producto": id_producto_nuevo, "delta": -cantidad_nueva},
+                {"id_producto": id_producto_anterior, "delta": cantidad_anterior},
+            ]
         else:
             diferencia = cantidad_nueva - cantidad_anterior
-            if diferencia != 0:
-                db.execute(text("""
-                    UPDATE stock
-                    SET cantidad_disponible = cantidad_disponible - :dife
-                    WHERE id_producto = :id_producto_nuevo
-                """), {"dife": diferencia, "id_producto_nuevo": id_producto_nuevo})
+            if diferencia > 0 and not reservar_existencias(db, "detalle_huevos", id_producto_nuevo, diferencia):
+                db.rollback()
+                raise HTTPException(status_code=400, detail="Stock insuficiente")
+            if diferencia < 0:
+                devolver_existencia(db, "detalle_huevos", id_producto_nuevo, -diferencia)
+            movimientos = [{"id_producto": id_producto_nuevo, "delta": -diferencia}] if diferencia else []
+        id_venta = detalle_huevos_data.get('id_venta', datos_anteriores['id_venta'])
+        registrar_movimientos(db, "detalle_huevos", [
+            {**movimiento, "motivo": "ajuste", "id_venta": id_venta, "id_detalle": detalle_id} for movimiento in movimientos
+        ])
 
         # Construir dinámicamente la sentencia UPDATE
         set_clauses = ", ".join([f"{key} = :{key}" for key in detalle_huevos_data.keys()])
@@ -112,6 +98,14 @@ def update_detalle_huevos_by_id(db: Session, detalle_id: int, detalle_h: Detalle
             WHERE id_detalle = :id_detalle
         """)
 
+        # Ajustar el total materializado de la venta (o de ambas si cambia de venta)
+        datos_nuevos = {**datos_anteriores, **detalle_huevos_data}
+        if datos_nuevos['id_venta'] == datos_anteriores['id_venta']:
+            ajustar_total_venta(db, datos_anteriores['id_venta'], agregados=[datos_nuevos], quitados=[datos_anteriores])
+        else:
+            ajustar_total_venta(db, datos_anteriores['id_venta'], quitados=[datos_anteriores])
+            ajustar_total_venta(db, datos_nuevos['id_venta'], agregados=[datos_nuevos])
+
         # Agregar el id_detalle
         detalle_huevos_data["id_detalle"] = detalle_id
 
@@ -122,7 +116,6 @@ def update_detalle_huevos_by_id(db: Session, detalle_id: int, detalle_h: Detalle
     except SQLAlchemyError as e:
         db.rollback()
         logger.error(f"Error al actualizar detalle_huevos {detalle_id}: {e}")
-        print("Error al actualizar detalle_huevos:", e)
         raise 
 
 
@@ -154,8 +147,11 @@ def get_detalle_huevos_by_id_venta(db:Session, id:int):
 def delete_detalle_huevos_by_id(db: Session, detalle_id: int):
     try:
         data = db.execute(text("""
-            SELECT id_producto, cantidad FROM detalle_huevos WHERE id_detalle = :id_detalle
+            SELECT id_producto, cantidad, id_venta, valor_descuento, precio_venta
+            FROM detalle_huevos WHERE id_detalle = :id_detalle
         """), {"id_detalle": detalle_id}).mappings().first()
+        if data is None:
+            return False
 
         sentencia = text("""
             DELETE FROM detalle_huevos
@@ -163,11 +159,12 @@ def delete_detalle_huevos_by_id(db: Session, detalle_id: int):
         """)
         result = db.execute(sentencia, {"id_detalle": detalle_id})
 
-        db.execute(text("""
-            UPDATE stock
-            SET cantidad_disponible = cantidad_disponible + :cantidad
-            WHERE id_producto = :id_producto
-        """), data)
+        devolver_existencia(db, "detalle_huevos", data["id_producto"], data["cantidad"])
+        registrar_movimientos(db, "detalle_huevos", [{
+            "id_producto": data["id_producto"], "delta": data["cantidad"], "motivo": "devolucion",
+            "id_venta": data["id_venta"], "id_detalle": detalle_id,
+        }])
+        ajustar_total_venta(db, data['id_venta'], quitados=[data])
 
         db.commit()
         return result.rowcount > 0
@@ -177,42 +174,28 @@ def delete_detalle_huevos_by_id(db: Session, detalle_id: int):
         raise Exception("Error de base de datos al eliminar el detalle_huevos")
     
 def delete_all_detalle_huevos_by_id_venta(db: Session, id_venta: int):
+    return delete_all_detalle_huevos_by_ids_venta(db, [id_venta])
+
+
+def delete_all_detalle_huevos_by_ids_venta(db: Session, ids_venta: List[int]) -> bool:
+    '''
+    Elimina los detalles de huevos de las ventas dadas: resta sus importes de los totales,
+    devuelve las cantidades al stock y los borra, con una sentencia por paso.
+    '''
     try:
-        # Obtener los detalles de la venta
-        data = db.execute(text("""
-            SELECT id_detalle, id_producto, cantidad
-            FROM detalle_huevos
-            WHERE id_venta = :id_venta
-        """), {'id_venta': id_venta}).mappings().all()
-
-        if not data:
-            # Si no se encuentran detalles, podemos considerarlo un caso no crítico
-            logger.info(f"No se encontraron detalles para la venta con id {id_venta}.")
-            return True  # No hay errores, pero tampoco hay detalles que eliminar.
-
-        # Eliminar cada detalle y actualizar la tabla salvamento
-        for detalle in data:
-            db.execute(text("""
-                DELETE FROM detalle_huevos
-                WHERE id_detalle = :id_detalle
-            """), {"id_detalle": detalle['id_detalle']})
-
-            # Actualizar el stock de gallinas en la tabla salvamento
-            db.execute(text("""
-                UPDATE stock
-                SET cantidad_disponible = cantidad_disponible + :cantidad 
-                WHERE id_producto = :id_producto
-            """), {
-                "cantidad": detalle['cantidad'],
-                "id_producto": detalle['id_producto']
-            })
+        quitar_detalles_de_totales(db, "detalle_huevos", ids_venta)
+        devolver_existencias(db, "detalle_huevos", ids_venta)
+        db.execute(text("""
+            DELETE FROM detalle_huevos
+            WHERE id_venta IN :ids
+        """).bindparams(bindparam("ids", expanding=True)), {"ids": ids_venta})
 
         # *No commit aquí*. La función solo realiza las acciones SQL, y la transacción se maneja en la función llamadora.
         return True
 
     except SQLAlchemyError as e:
-        logger.error(f"Error al eliminar detalles de venta con id_venta {id_venta}: {e}")
-        raise Exception("Error al eliminar los detalles de venta")
+        logger.error(f"Error al eliminar detalles de las ventas {ids_venta}: {e}")
+        raise Exception("Error al eliminar los detalles de venta")
     
 def get_all_products_stock(db: Session):
     try:
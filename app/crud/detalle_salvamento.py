@@ -1,22 +1,22 @@
 from fastapi import HTTPException
 from sqlalchemy.orm import Session
-from sqlalchemy import text
+from sqlalchemy import bindparam, text
 from sqlalchemy.exc import SQLAlchemyError
-from typing import Optional
+from typing import List, Optional
 import logging
 
 from app.schemas.detalle_salvamento import CreateDetalleSalvamento, DetalleSalvamentoUpdate
+from app.crud.totales_venta import ajustar_total_venta, quitar_detalles_de_totales
+from app.crud.stock import devolver_existencia, devolver_existencias, registrar_movimientos, reservar_existencias, reservar_para_venta
 
 # app./crud/detalle_salvamento
 logger = logging.getLogger(__name__) # Agarra la ubicación del archivo con el que estamos trabajando
 
 def create_detalle_salvamento(db: Session, detalle_salvamento: CreateDetalleSalvamento) -> dict:
     try:
-        # Verificar cantidad disponible
-        salvamento_query = db.execute(text("SELECT cantidad_gallinas FROM salvamento WHERE id_salvamento = :id_producto"),
-                                {"id_producto": detalle_salvamento.id_producto}).mappings().first()
-        
-        if not salvamento_query or salvamento_query["cantidad_gallinas"] < detalle_salvamento.cantidad:
+        # Descontar la cantidad solo si alcanza (una sentencia, sin carrera entre ventas simultaneas)
+        if not reservar_para_venta(db, "detalle_salvamento", detalle_salvamento.id_producto, detalle_salvamento.cantidad, detalle_salvamento.id_venta):
+            db.rollback()
             raise HTTPException(status_code=400, detail="Cantidad insuficiente para completar la operación")
         
         sentencia = text("""
@@ -28,16 +28,14 @@ def create_detalle_salvamento(db: Session, detalle_salvamento: CreateDetalleSalv
                 :valor_descuento, :precio_venta
             )
         """)
-        db.execute(sentencia, detalle_salvamento.model_dump())
-        id_creado = db.execute(text("SELECT LAST_INSERT_ID()")).scalar()
-
-        
-        # Actualizar cantidad
-        db.execute(text("""
-            UPDATE salvamento
-            SET cantidad_gallinas = cantidad_gallinas - :cantidad
-            WHERE id_salvamento = :id_producto
-        """), {"cantidad": detalle_salvamento.cantidad, "id_producto": detalle_salvamento.id_producto})
+        detalle_data = detalle_salvamento.model_dump()
+        resultado = db.execute(sentencia, detalle_data)
+        id_creado = resultado.lastrowid
+        registrar_movimientos(db, "detalle_salvamento", [{
+            "id_producto": detalle_salvamento.id_producto, "delta": -detalle_salvamento.cantidad, "motivo": "venta",
+            "id_venta": detalle_salvamento.id_venta, "id_detalle": id_creado,
+        }])
+        ajustar_total_venta(db, detalle_salvamento.id_venta, agregados=[detalle_data])
 
         db.commit() # Guardar cambios permanentemente
         return {"id_detalle_salvamento": id_creado}
@@ -81,7 +79,8 @@ def update_detalle_salvamento_by_id(db: Session, detalle_id: int, detalle: Detal
         
         # Obtener el detalle actual
         detalle_anterior = db.execute(text("""
-            SELECT id_producto, cantidad FROM detalle_salvamento WHERE id_detalle = :id_detalle
+            SELECT id_producto, cantidad, id_venta, valor_descuento, precio_venta
+            FROM detalle_salvamento WHERE id_detalle = :id_detalle
         """), {"id_detalle": detalle_id}).mappings().first()
 
         if not detalle_anterior:
@@ -94,54 +93,36 @@ def update_detalle_salvamento_by_id(db: Session, detalle_id: int, detalle: Detal
         id_producto_nuevo = detalle_salvamento_data.get("id_producto", id_producto_ant)
         cantidad_nueva = detalle_salvamento_data.get("cantidad", cantidad_ant)
 
-        # Validar cantidad suficiente si se va a restar stock
+        # Ajustar el stock: primero se reserva lo que se descuenta (si no alcanza, aun no se ha modificado nada)
         if id_producto_nuevo != id_producto_ant:
-            # Si el producto cambia, verificar el stock del nuevo producto
-            salvamento_nuevo = db.execute(text("""
-                SELECT cantidad_gallinas FROM salvamento WHERE id_salvamento = :id
-            """), {"id": id_producto_nuevo}).mappings().first()
-            if not  salvamento_nuevo:
-                raise HTTPException(status_code=400, detail="Error validación")
-            if  salvamento_nuevo["cantidad_gallinas"] < cantidad_nueva:
+            # Restar la nueva cantidad al nuevo producto y devolver la anterior
+            if not reservar_existencias(db, "detalle_salvamento", id_producto_nuevo, cantidad_nueva):
+                db.rollback()
                 raise HTTPException(status_code=400, detail="Cantidad insuficiente en este producto")
+            devolver_existencia(db, "detalle_salvamento", id_producto_ant, cantidad_ant)
+            movimientos = [
+                {"id_producto": id_producto_nuevo, "delta": -cantidad_nueva},
+                {"id_producto": id_producto_ant, "delta": cantidad_ant},
+            ]
         else:
-            # Si es el mismo producto y aumenta cantidad, validar cantidad
-            diferencia = cantidad_nueva - cantidad_ant
-            if diferencia > 0:
-                salvamento_actual = db.execute(text("""
-                    SELECT cantidad_gallinas FROM salvamento WHERE id_salvamento = :id
-                """), {"id": id_producto_nuevo}).mappings().first()
-                if not salvamento_actual:
-                    raise HTTPException(status_code=400, detail="El producto no existe en el salvamento")
-                if salvamento_actual["cantidad_gallinas"] < diferencia:
-                    raise HTTPException(status_code=400, detail="Cantidad insuficiente")
-
-        # Ajustar el stock según los cambios detectados
-        if id_producto_nuevo != id_producto_ant:
-            # Devolver cantidad anterior y restar a la nueva
-            db.execute(text("""
-                UPDATE salvamento
-                SET cantidad_gallinas = cantidad_gallinas + :cant
-                WHERE id_salvamento = :id_ant
-            """), {"cant": cantidad_ant, "id_ant": id_producto_ant})
-
-            db.execute(text("""
-                UPDATE salvamento
-                SET cantidad_gallinas = cantidad_gallinas - :cant
-                WHERE id_salvamento = :id_nuevo
-            """), {"cant": cantidad_nueva, "id_nuevo": id_producto_nuevo})
-
-        else:
-            # Mismo producto diferencia de la cantidad antigua
+            # Mismo producto: solo la diferencia con la cantidad antigua
             diferencia = cantidad_nueva - cantidad_ant
-            if diferencia != 0:
-                db.execute(text("""
-                    UPDATE salvamento
-                    SET cantidad_gallinas = cantidad_gallinas - :dif
-                    WHERE id_salvamento = :id_prod
-                """), {"dif": diferencia, "id_prod": id_producto_nuevo})
+            if diferencia > 0 and not reservar_existencias(db, "detalle_salvamento", id_producto_nuevo, diferencia):
+                db.rollback()
+                raise HTTPException(status_code=400, detail="Cantidad insuficiente")
+            if diferencia < 0:
+                devolver_existencia(db, "detalle_salvamento", id_producto_nuevo, -diferencia)
+            movimientos = [{"id_producto": id_producto_nuevo, "delta": -diferencia}] if diferencia else []
+        registrar_movimientos(db, "detalle_salvamento", [
+            {**movimiento, "motivo": "ajuste", "id_venta": detalle_anterior["id_venta"], "id_detalle": detalle_id}
+            for movimiento in movimientos
+        ])
         
                 
+        # Ajustar el total materializado de la venta
+        datos_nuevos = {**detalle_anterior, **detalle_salvamento_data}
+        ajustar_total_venta(db, detalle_anterior["id_venta"], agregados=[datos_nuevos], quitados=[detalle_anterior])
+
         # Agregar el id_detalle
         detalle_salvamento_data["id_detalle"] = detalle_id
         # Construir dinámicamente la sentencia UPDATE
@@ -165,7 +146,8 @@ def delete_detalle_salvamento_by_id(db: Session, id_detalle: int) -> Optional[bo
     try:
         # Obtener cantidad e id_producto antes de borrar
         data = db.execute(text("""
-            SELECT id_producto, cantidad FROM detalle_salvamento WHERE id_detalle = :id_detalle
+            SELECT id_producto, cantidad, id_venta, valor_descuento, precio_venta
+            FROM detalle_salvamento WHERE id_detalle = :id_detalle
         """), {"id_detalle": id_detalle}).mappings().first()
         if not data:
             return False
@@ -174,11 +156,12 @@ def delete_detalle_salvamento_by_id(db: Session, id_detalle: int) -> Optional[bo
         result = db.execute(query, {"id_detalle": id_detalle})
         
         # Devolver la cantidad al salvamento
-        db.execute(text("""
-            UPDATE salvamento
-            SET cantidad_gallinas = cantidad_gallinas + :cantidad
-            WHERE id_salvamento = :id_producto
-        """), data)
+        devolver_existencia(db, "detalle_salvamento", data["id_producto"], data["cantidad"])
+        registrar_movimientos(db, "detalle_salvamento", [{
+            "id_producto": data["id_producto"], "delta": data["cantidad"], "motivo": "devolucion",
+            "id_venta": data["id_venta"], "id_detalle": id_detalle,
+        }])
+        ajustar_total_venta(db, data["id_venta"], quitados=[data])
         
         db.commit()
         
@@ -190,39 +173,27 @@ def delete_detalle_salvamento_by_id(db: Session, id_detalle: int) -> Optional[bo
         raise Exception(f"Error de base de datos al eliminar el detalle de salvamento {e}")
 
 def delete_all_detalle_salvamento_by_id_venta(db: Session, id_venta: int) -> Optional[bool]:
+    return delete_all_detalle_salvamento_by_ids_venta(db, [id_venta])
+
+
+def delete_all_detalle_salvamento_by_ids_venta(db: Session, ids_venta: List[int]) -> Optional[bool]:
+    '''
+    Elimina los detalles de salvamento de las ventas dadas: resta sus importes de los totales,
+    devuelve las gallinas a salvamento y los borra, con una sentencia por paso.
+    '''
     try:
-        # Obtener información sibre detalles salvamento por id venta 
-        data = db.execute(text("""
-            SELECT  id_detalle, id_producto, cantidad FROM detalle_salvamento WHERE id_venta = :id_venta
-        """), {"id_venta": id_venta}).mappings().all()
-        if not data:
-            # Si no se encuentran detalles, podemos considerarlo un caso no critico 
-            logger.info(f"No se encontraron detalles para la venta con id {id_venta}.")
-            return True #No hay errores, pero tampoco hay detalles que eliminar.
-        
-        # Eliminar todos los detalles que encontro en la consulta de arriba
-        # Recordar q el data almacena los datos consultados y por eso el for, pueden ser varios
-        for detalle in data: 
-            db.execute(text("""
-                DELETE FROM detalle_salvamento
-                WHERE id_detalle = :id_detalle
-            """), {"id_detalle": detalle['id_detalle']})
-            
-            # Actualizar el stock 
-            db.execute(text("""
-                UPDATE salvamento
-                SET cantidad_gallinas = cantidad_gallinas + :cantidad
-                WHERE id_salvamento = :id_producto
-            """), {
-                "cantidad": detalle['cantidad'], 
-                "id_producto": detalle['id_producto']
-            })
-        
+        quitar_detalles_de_totales(db, "detalle_salvamento", ids_venta)
+        devolver_existencias(db, "detalle_salvamento", ids_venta)
+        db.execute(text("""
+            DELETE FROM detalle_salvamento
+            WHERE id_venta IN :ids
+        """).bindparams(bindparam("ids", expanding=True)), {"ids": ids_venta})
+
         #db.commit() *no commit aqui*
         return True
     except SQLAlchemyError as e:
         db.rollback()
-        logger.error(f"Error al eliminar detalles de venta {id_venta}: {e}")
+        logger.error(f"Error al eliminar detalles de las ventas {ids_venta}: {e}")
         raise Exception(f"Error de base de datos al eliminar el detalle de la venta")
     
 def get_all_products_salvamento(db: Session):
@@ -0,0 +1,199 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import bindparam, event, text
+from sqlalchemy.exc import SQLAlchemyError
+from typing import Dict, List, Optional
+from datetime import datetime
+import logging
+import threading
+
+from core.dialect import upsert_sumando
+
+logger = logging.getLogger(__name__)
+
+# Existencias de huevos por tipo en huevos sueltos (tabla disponibilidad_huevos,
+# migrations/005). app/crud/stock.py anota en la sesion los cambios de stock
+# (anotar_disponibilidad) y se aplican al hacer commit, asi que los totales por
+# tipo en cualquier empaque se leen sin recorrer stock.
+# Todos los empaques de un tipo suman en la misma fila: si se ajustara dentro de
+# la venta, la fila quedaria bloqueada hasta su commit y las ventas de productos
+# distintos del mismo tipo se harian en fila. Por eso el ajuste va despues del
+# commit, en una transaccion propia de una sola sentencia que bloquea la fila solo
+# mientras suma. Si falla (o el proceso cae entre los dos commits), la tabla queda
+# desfasada hasta correr scripts.reconstruir_disponibilidad: los ajustes fallidos
+# se cuentan en /metrics (disponibilidad_stats) y el desfase contra stock sale en
+# la conciliacion de detalle_huevos (diferencias_disponibilidad).
+
+# Huevos por empaque (valores del enum stock.unidad_medida)
+HUEVOS_POR_UNIDAD = {"unidad": 1, "docena": 12, "medio_panal": 15, "panal": 30}
+
+DISPONIBILIDAD_SESION = "disponibilidad_cambios"
+
+_lock = threading.Lock()
+_stats = {"ajustes": 0, "ajustes_fallidos": 0, "ultimo_fallo": None}
+
+
+def huevos_por_unidad(columna: str) -> str:
+    '''
+    Expresion SQL con los huevos por empaque de una columna unidad_medida.
+    '''
+    casos = " ".join(f"WHEN '{unidad}' THEN {huevos}" for unidad, huevos in HUEVOS_POR_UNIDAD.items())
+    return f"CASE {columna} {casos} END"
+
+
+def ajustar_disponibilidad(db: Session, deltas: Dict[int, int]) -> None:
+    '''
+    Suma a la disponibilidad de cada tipo los cambios de stock dados
+    ({id_producto: delta en empaques}), con un INSERT ... SELECT agrupado. No hace commit.
+    '''
+    if not deltas:
+        return
+    params = {"ids": list(deltas)}
+    casos = []
+    for i, (id_producto, delta) in enumerate(deltas.items()):
+        casos.append(f"WHEN :id_{i} THEN :delta_{i}")
+        params[f"id_{i}"] = id_producto
+        params[f"delta_{i}"] = delta
+    db.execute(text(f"""
+        INSERT INTO disponibilidad_huevos (tipo, huevos)
+        SELECT stock.tipo, SUM(CASE stock.id_producto {' '.join(casos)} END * {huevos_por_unidad('stock.unidad_medida')})
+        FROM stock
+        WHERE stock.id_producto IN :ids
+        GROUP BY stock.tipo
+        {upsert_sumando(db, ["tipo"], ["huevos"])}
+    """).bindparams(bindparam("ids", expanding=True)), params)
+
+
+def anotar_disponibilidad(db: Session, deltas: Dict[int, int]) -> None:
+    '''
+    Anota en la sesion cambios de stock ({id_producto: delta en empaques}).
+    Se suman a la disponibilidad cuando la sesion hace commit y se descartan si hace rollback.
+    '''
+    pendientes = db.info.setdefault(DISPONIBILIDAD_SESION, {})
+    for id_producto, delta in deltas.items():
+        pendientes[id_producto] = pendientes.get(id_producto, 0) + delta
+
+
+def cantidades_de_ventas(db: Session, ids_venta: List[int], signo: int) -> Dict[int, int]:
+    '''
+    {id_producto: signo * cantidad} de los detalles de huevos de las ventas dadas.
+    '''
+    filas = db.execute(text("""
+        SELECT id_producto, SUM(cantidad) AS cantidad
+        FROM detalle_huevos
+        WHERE id_venta IN :ids
+        GROUP BY id_producto
+    """).bindparams(bindparam("ids", expanding=True)), {"ids": ids_venta})
+    return {id_producto: signo * cantidad for id_producto, cantidad in filas}
+
+
+@event.listens_for(Session, "after_commit")
+def _aplicar_disponibilidad(session):
+    deltas = {id_producto: delta for id_producto, delta in session.info.pop(DISPONIBILIDAD_SESION, {}).items() if delta}
+    if not deltas:
+        return
+    db = Session(bind=session.get_bind())
+    try:
+        ajustar_disponibilidad(db, deltas)
+        db.commit()
+        with _lock:
+            _stats["ajustes"] += 1
+    except Exception as e:
+        db.rollback()
+        with _lock:
+            _stats["ajustes_fallidos"] += 1
+            _stats["ultimo_fallo"] = datetime.now().isoformat(timespec="seconds")
+        logger.error(f"No se pudo ajustar la disponibilidad de huevos {deltas}: {e}")
+    finally:
+        db.close()
+
+
+def disponibilidad_stats() -> dict:
+    with _lock:
+        return dict(_stats)
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _descartar_disponibilidad(session, transaction):
+    if transaction.parent is None:
+        session.info.pop(DISPONIBILIDAD_SESION, None)
+
+
+def recalcular_disponibilidad(db: Session) -> int:
+    '''
+    Rehace disponibilidad_huevos a partir de stock. Devuelve los tipos escritos. No hace commit.
+    '''
+    try:
+        db.execute(text("DELETE FROM disponibilidad_huevos"))
+        return db.execute(text(f"""
+            INSERT INTO disponibilidad_huevos (tipo, huevos)
+            SELECT stock.tipo, SUM(stock.cantidad_disponible * {huevos_por_unidad('stock.unidad_medida')})
+            FROM stock
+            GROUP BY stock.tipo
+        """)).rowcount
+    except SQLAlchemyError as e:
+        logger.error(f"Error al recalcular la disponibilidad de huevos: {e}")
+        raise Exception("Error de base de datos al recalcular la disponibilidad de huevos")
+
+
+def diferencias_disponibilidad(db: Session) -> list:
+    '''
+    Tipos cuya fila de disponibilidad_huevos no coincide con recalcularla desde stock
+    (ajustes perdidos despues del commit o stock cambiado por fuera de la API).
+    '''
+    try:
+        filas = db.execute(text(f"""
+            SELECT
+                tipos.tipo,
+                COALESCE(calculo.huevos, 0) AS esperado,
+                COALESCE(disponibilidad_huevos.huevos, 0) AS actual
+            FROM (SELECT tipo FROM stock UNION SELECT tipo FROM disponibilidad_huevos) AS tipos
+            LEFT JOIN (
+                SELECT stock.tipo, SUM(stock.cantidad_disponible * {huevos_por_unidad('stock.unidad_medida')}) AS huevos
+                FROM stock
+                GROUP BY stock.tipo
+            ) AS calculo ON calculo.tipo = tipos.tipo
+            LEFT JOIN disponibilidad_huevos ON disponibilidad_huevos.tipo = tipos.tipo
+            WHERE COALESCE(calculo.huevos, 0) <> COALESCE(disponibilidad_huevos.huevos, 0)
+            ORDER BY tipos.tipo
+        """)).mappings().all()
+        return [
+            {"tipo": fila["tipo"], "esperado": int(fila["esperado"]), "actual": int(fila["actual"]),
+             "diferencia": int(fila["actual"]) - int(fila["esperado"])}
+            for fila in filas
+        ]
+    except SQLAlchemyError as e:
+        logger.error(f"Error al comparar la disponibilidad de huevos con stock: {e}")
+        raise Exception("Error de base de datos al comparar la disponibilidad de huevos")
+
+
+def get_disponibilidad(db: Session, unidad_medida: str, tipo: Optional[int] = None) -> list:
+    '''
+    Huevos disponibles de cada tipo y cuantos empaques de unidad_medida completan
+    (sobrante = huevos que no alcanzan para otro empaque). Una fila por tipo.
+    '''
+    try:
+        por_empaque = HUEVOS_POR_UNIDAD[unidad_medida]
+        filtro = "WHERE disponibilidad_huevos.tipo = :tipo" if tipo is not None else ""
+        filas = db.execute(text(f"""
+            SELECT
+                disponibilidad_huevos.tipo,
+                tipo_huevos.color,
+                tipo_huevos.tamaño AS tamanio,
+                disponibilidad_huevos.huevos
+            FROM disponibilidad_huevos
+            INNER JOIN tipo_huevos ON tipo_huevos.id_tipo_huevo = disponibilidad_huevos.tipo
+            {filtro}
+            ORDER BY disponibilidad_huevos.tipo
+        """), {"tipo": tipo}).mappings().all()
+        return [
+            {
+                **fila,
+                "unidad_medida": unidad_medida,
+                "cantidad": fila["huevos"] // por_empaque,
+                "sobrante": fila["huevos"] % por_empaque,
+            }
+            for fila in filas
+        ]
+    except SQLAlchemyError as e:
+        logger.error(f"Error al obtener la disponibilidad de huevos: {e}")
+        raise Exception("Error de base de datos al obtener la disponibilidad de huevos")
@@ -3,6 +3,7 @@ from sqlalchemy import text
 from sqlalchemy.exc import SQLAlchemyError
 import logging
 from app.schemas.permisos import PermisoCreate, PermisoUpdate
+from app.crud.permisos import invalidar_matriz_permisos
 
 logger = logging.getLogger(__name__)
 
@@ -15,6 +16,7 @@ def create_permiso(db: Session, permiso: PermisoCreate):
         """)
         db.execute(query, permiso.model_dump())
         db.commit()
+        invalidar_matriz_permisos()
         return True
     except SQLAlchemyError as e:
         db.rollback()
@@ -61,6 +63,7 @@ def update_permiso(db: Session, id_modulo: int, id_rol: int, permiso: PermisoUpd
         """)
         result = db.execute(query, fields)
         db.commit()
+        invalidar_matriz_permisos()
         return result.rowcount > 0
     except SQLAlchemyError as e:
         db.rollback()
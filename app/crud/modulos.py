@@ -3,6 +3,7 @@ from sqlalchemy import text
 from sqlalchemy.exc import SQLAlchemyError
 import logging
 from app.schemas.modulos import ModuloCreate, ModuloUpdate
+from app.crud.permisos import invalidar_matriz_permisos
 
 logger = logging.getLogger(__name__)
 
@@ -68,6 +69,7 @@ def change_modulo_status(db: Session, id_modulo: int, estado: bool) -> bool:
         """)
         result = db.execute(sentencia, {"estado": estado, "id_modulo": id_modulo})
         db.commit()
+        invalidar_matriz_permisos()
         return result.rowcount > 0
     except SQLAlchemyError as e:
         db.rollback()
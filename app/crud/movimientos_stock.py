@@ -0,0 +1,201 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import bindparam, text
+from sqlalchemy.exc import SQLAlchemyError
+from typing import Optional
+from datetime import date, datetime, time, timedelta
+import logging
+
+from app.crud.stock import INVENTARIOS
+
+logger = logging.getLogger(__name__)
+
+# Consultas sobre el libro movimientos_stock y las fotos diarias snapshots_stock
+# (migrations/004). La foto de un dia son las existencias al cierre del dia; las
+# existencias en cualquier momento se obtienen con la foto anterior mas los
+# movimientos desde entonces, sin recorrer toda la historia.
+# Los productos sin foto (nuevos, o si aun no hay ninguna) se calculan hacia atras:
+# existencias actuales menos los movimientos posteriores.
+
+# Suma de movimientos por producto en un intervalo de fecha_hora
+MOVIMIENTOS_POR_PRODUCTO = """
+    SELECT id_producto, SUM(delta) AS delta
+    FROM movimientos_stock
+    WHERE inventario = :inventario {condicion}
+    GROUP BY id_producto
+"""
+
+
+def _inicio_dia_siguiente(dia: date) -> datetime:
+    return datetime.combine(dia + timedelta(days=1), time.min)
+
+
+def ultimo_snapshot(db: Session, tabla_detalle: str, antes_de: Optional[date] = None) -> Optional[date]:
+    '''
+    Dia de la ultima foto del inventario (la ultima anterior a antes_de, si se da).
+    '''
+    condicion = "AND dia < :antes_de" if antes_de else ""
+    dia = db.execute(text(f"""
+        SELECT MAX(dia) FROM snapshots_stock
+        WHERE inventario = :inventario {condicion}
+    """), {"inventario": INVENTARIOS[tabla_detalle][0], "antes_de": antes_de}).scalar()
+    return date.fromisoformat(str(dia)[:10]) if dia else None
+
+
+def compactar_dia(db: Session, tabla_detalle: str, dia: date) -> int:
+    '''
+    Escribe la foto de existencias al cierre de dia: la foto anterior mas los
+    movimientos del dia y, para los productos sin foto anterior, las existencias
+    actuales menos los movimientos posteriores. Devuelve las filas escritas. No hace commit.
+    '''
+    tabla, columna_id, columna_cantidad = INVENTARIOS[tabla_detalle]
+    try:
+        anterior = ultimo_snapshot(db, tabla_detalle, antes_de=dia)
+        params = {
+            "inventario": tabla, "dia": dia, "anterior": anterior,
+            "inicio": _inicio_dia_siguiente(anterior) if anterior else None,
+            "fin": _inicio_dia_siguiente(dia),
+        }
+        filas = 0
+        if anterior:
+            filas += db.execute(text(f"""
+                INSERT INTO snapshots_stock (inventario, dia, id_producto, cantidad)
+                SELECT anterior.inventario, :dia, anterior.id_producto, anterior.cantidad + COALESCE(del_dia.delta, 0)
+                FROM snapshots_stock AS anterior
+                LEFT JOIN ({MOVIMIENTOS_POR_PRODUCTO.format(condicion="AND fecha_hora >= :inicio AND fecha_hora < :fin")}) AS del_dia
+                    ON del_dia.id_producto = anterior.id_producto
+                WHERE anterior.inventario = :inventario AND anterior.dia = :anterior
+            """), params).rowcount
+
+        filas += db.execute(text(f"""
+            INSERT INTO snapshots_stock (inventario, dia, id_producto, cantidad)
+            SELECT :inventario, :dia, {tabla}.{columna_id}, {tabla}.{columna_cantidad} - COALESCE(posteriores.delta, 0)
+            FROM {tabla}
+            LEFT JOIN ({MOVIMIENTOS_POR_PRODUCTO.format(condicion="AND fecha_hora >= :fin")}) AS posteriores
+                ON posteriores.id_producto = {tabla}.{columna_id}
+            WHERE NOT EXISTS (
+                SELECT 1 FROM snapshots_stock AS foto
+                WHERE foto.inventario = :inventario AND foto.dia = :dia AND foto.id_producto = {tabla}.{columna_id}
+            )
+        """), params).rowcount
+        return filas
+    except SQLAlchemyError as e:
+        logger.error(f"Error al compactar las existencias de {tabla} del {dia}: {e}")
+        raise Exception("Error de base de datos al compactar las existencias")
+
+
+def _existencias_out(momento: datetime, dia: Optional[date], existencias: dict) -> dict:
+    return {
+        "fecha_hora": momento,
+        "snapshot": dia,
+        "existencias": [{"id_producto": id_producto, "cantidad": cantidad}
+                        for id_producto, cantidad in sorted(existencias.items())],
+    }
+
+
+def existencias_a_fecha(db: Session, tabla_detalle: str, momento: datetime) -> dict:
+    '''
+    Existencias de cada producto en el momento dado: la ultima foto anterior
+    mas los movimientos hasta el momento.
+    '''
+    tabla, columna_id, columna_cantidad = INVENTARIOS[tabla_detalle]
+    try:
+        dia = ultimo_snapshot(db, tabla_detalle, antes_de=momento.date())
+        params = {"inventario": tabla, "dia": dia, "momento": momento,
+                  "inicio": _inicio_dia_siguiente(dia) if dia else None}
+        existencias = {}
+        filtro_productos = filtro_movimientos = ""
+        if dia:
+            filas = db.execute(text(f"""
+                SELECT foto.id_producto, foto.cantidad + COALESCE(movimientos.delta, 0) AS cantidad
+                FROM snapshots_stock AS foto
+                LEFT JOIN ({MOVIMIENTOS_POR_PRODUCTO.format(condicion="AND fecha_hora >= :inicio AND fecha_hora <= :momento")}) AS movimientos
+                    ON movimientos.id_producto = foto.id_producto
+                WHERE foto.inventario = :inventario AND foto.dia = :dia
+            """), params).mappings()
+            existencias = {fila["id_producto"]: fila["cantidad"] for fila in filas}
+
+            # Solo los productos que no estan en la foto (normalmente ninguno o
+            # pocos) se calculan hacia atras; asi no se recorre el libro entero
+            params["ids"] = db.execute(text(f"""
+                SELECT {tabla}.{columna_id} FROM {tabla}
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM snapshots_stock AS foto
+                    WHERE foto.inventario = :inventario AND foto.dia = :dia AND foto.id_producto = {tabla}.{columna_id}
+                )
+            """), params).scalars().all()
+            if not params["ids"]:
+                return _existencias_out(momento, dia, existencias)
+            filtro_productos = f"WHERE {tabla}.{columna_id} IN :ids"
+            filtro_movimientos = "AND id_producto IN :ids"
+
+        # Productos sin foto en ese dia: hacia atras desde las existencias actuales
+        sentencia = text(f"""
+            SELECT {tabla}.{columna_id} AS id_producto, {tabla}.{columna_cantidad} - COALESCE(posteriores.delta, 0) AS cantidad
+            FROM {tabla}
+            LEFT JOIN ({MOVIMIENTOS_POR_PRODUCTO.format(condicion=f"AND fecha_hora > :momento {filtro_movimientos}")}) AS posteriores
+                ON posteriores.id_producto = {tabla}.{columna_id}
+            {filtro_productos}
+        """)
+        if dia:
+            sentencia = sentencia.bindparams(bindparam("ids", expanding=True))
+        for fila in db.execute(sentencia, params).mappings():
+            existencias.setdefault(fila["id_producto"], fila["cantidad"])
+
+        return _existencias_out(momento, dia, existencias)
+    except SQLAlchemyError as e:
+        logger.error(f"Error al obtener las existencias de {tabla} al {momento}: {e}")
+        raise Exception("Error de base de datos al obtener las existencias a la fecha")
+
+
+def conciliar_existencias(db: Session, tabla_detalle: str) -> dict:
+    '''
+    Compara las existencias actuales con la ultima foto mas los movimientos
+    posteriores. Las diferencias son cambios hechos por fuera del libro
+    (produccion, ajustes manuales o SQL directo).
+    '''
+    tabla, columna_id, columna_cantidad = INVENTARIOS[tabla_detalle]
+    try:
+        dia = ultimo_snapshot(db, tabla_detalle)
+        if dia is None:
+            return {"snapshot": None, "diferencias": []}
+        filas = db.execute(text(f"""
+            SELECT
+                foto.id_producto,
+                foto.cantidad + COALESCE(movimientos.delta, 0) AS esperado,
+                {tabla}.{columna_cantidad} AS actual
+            FROM snapshots_stock AS foto
+            INNER JOIN {tabla} ON {tabla}.{columna_id} = foto.id_producto
+            LEFT JOIN ({MOVIMIENTOS_POR_PRODUCTO.format(condicion="AND fecha_hora >= :inicio")}) AS movimientos
+                ON movimientos.id_producto = foto.id_producto
+            WHERE foto.inventario = :inventario AND foto.dia = :dia
+              AND foto.cantidad + COALESCE(movimientos.delta, 0) <> {tabla}.{columna_cantidad}
+            ORDER BY foto.id_producto
+        """), {"inventario": tabla, "dia": dia, "inicio": _inicio_dia_siguiente(dia)}).mappings().all()
+        return {
+            "snapshot": dia,
+            "diferencias": [{**fila, "diferencia": fila["actual"] - fila["esperado"]} for fila in filas],
+        }
+    except SQLAlchemyError as e:
+        logger.error(f"Error al conciliar las existencias de {tabla}: {e}")
+        raise Exception("Error de base de datos al conciliar las existencias")
+
+
+def reservas_sin_vender(db: Session, tabla_detalle: str, antes_de: datetime) -> list:
+    '''
+    Reservas del coalescedor (app/crud/stock.py) que nunca se vendieron ni se
+    devolvieron: por venta y producto, movimientos sin detalle cuya suma es negativa.
+    Solo grupos cuyo ultimo movimiento es anterior a antes_de, para no tocar ventas en curso.
+    '''
+    tabla = INVENTARIOS[tabla_detalle][0]
+    try:
+        return db.execute(text("""
+            SELECT id_venta, id_producto, -SUM(delta) AS cantidad
+            FROM movimientos_stock
+            WHERE inventario = :inventario AND id_detalle IS NULL AND motivo IN ('venta', 'devolucion')
+            GROUP BY id_venta, id_producto
+            HAVING SUM(delta) < 0 AND MAX(fecha_hora) < :antes_de
+            ORDER BY id_venta, id_producto
+        """), {"inventario": tabla, "antes_de": antes_de}).mappings().all()
+    except SQLAlchemyError as e:
+        logger.error(f"Error al buscar reservas sin vender de {tabla}: {e}")
+        raise Exception("Error de base de datos al buscar reservas sin vender")
@@ -2,51 +2,132 @@ from sqlalchemy.exc import SQLAlchemyError
 from fastapi.exceptions import HTTPException
 from sqlalchemy import text
 from sqlalchemy.orm import Session
+from typing import Dict, Optional, Tuple
 import logging
+import threading
+import time
+
+from core.config import settings
 
 logger = logging.getLogger(__name__)
 
+# Bits de cada accion dentro de la mascara de permisos
+ACCIONES = {
+    'insertar': 1,
+    'actualizar': 2,
+    'seleccionar': 4,
+    'borrar': 8,
+}
+
+# Matriz de permisos en memoria:
+# - _matriz: (id_rol, id_modulo) -> mascara de bits con las acciones permitidas
+# - _roles: id_rol -> estado del rol (activo o inactivo)
+# Se carga completa la primera vez que se necesita y se descarta cuando
+# algun CRUD modifica permisos, roles o modulos (o cuando vence el TTL).
+_lock = threading.Lock()
+_matriz: Optional[Dict[Tuple[int, int], int]] = None
+_roles: Optional[Dict[int, bool]] = None
+_cargada_en: float = 0.0
+_version: int = 0
+
+
+def invalidar_matriz_permisos():
+    '''
+    Descarta la matriz de permisos en memoria para que la siguiente
+    verificacion la vuelva a cargar desde la base de datos.
+    '''
+    global _matriz, _roles, _version
+    with _lock:
+        _matriz = None
+        _roles = None
+        _version += 1
+
+
+def _cargar_matriz_permisos(db: Session):
+    global _matriz, _roles, _cargada_en
+
+    version_inicial = _version
+
+    roles = db.execute(text("SELECT id_rol, estado FROM roles")).mappings().all()
+    permisos = db.execute(text("""
+                     SELECT id_rol, id_modulo, insertar, actualizar, seleccionar, borrar
+                     FROM permisos
+                     """)).mappings().all()
+
+    nuevos_roles = {row['id_rol']: bool(row['estado']) for row in roles}
+    nueva_matriz = {}
+    for row in permisos:
+        mascara = 0
+        for accion, bit in ACCIONES.items():
+            if row[accion]:
+                mascara |= bit
+        nueva_matriz[(row['id_rol'], row['id_modulo'])] = mascara
+
+    with _lock:
+        # Si alguien invalido la matriz mientras se consultaba, no se publica
+        # lo leido porque podria estar desactualizado.
+        if _version == version_inicial:
+            _matriz = nueva_matriz
+            _roles = nuevos_roles
+            _cargada_en = time.monotonic()
+
+    return nueva_matriz, nuevos_roles
+
+
+def obtener_matriz_permisos(db: Session):
+    '''
+    Devuelve (matriz, roles) desde memoria, cargandolos si no existen
+    o si superaron el tiempo de vida configurado.
+    '''
+    matriz, roles = _matriz, _roles
+    vencida = time.monotonic() - _cargada_en > settings.PERMISOS_CACHE_TTL
+    if matriz is None or roles is None or vencida:
+        matriz, roles = _cargar_matriz_permisos(db)
+    return matriz, roles
+
+
+def get_user_with_permission(db: Session, id_usuario: int, id_modulo: int):
+    '''
+    Obtiene en una sola consulta el usuario, el estado de su rol y los
+    permisos del rol sobre el modulo indicado (None si no tiene fila de permisos).
+    '''
+    try:
+        query = text("""
+                     SELECT usuarios.id_usuario, usuarios.nombre, usuarios.documento, usuarios.id_rol,
+                            usuarios.email, usuarios.telefono, usuarios.estado, roles.nombre_rol,
+                            roles.descripcion AS descripcion_rol, roles.estado AS estado_rol,
+                            permisos.insertar, permisos.actualizar, permisos.seleccionar, permisos.borrar
+                     FROM usuarios
+                     JOIN roles ON usuarios.id_rol = roles.id_rol
+                     LEFT JOIN permisos ON permisos.id_rol = usuarios.id_rol AND permisos.id_modulo = :modulo
+                     WHERE usuarios.id_usuario = :id_usuario
+                     """)
+        result = db.execute(query, {"id_usuario": id_usuario, "modulo": id_modulo}).mappings().first()
+        return result
+    except SQLAlchemyError as e:
+        logger.error(f"Error al obtener usuario y permisos: {e}")
+        raise Exception("Error de base de datos al obtener permisos")
+
+
 def verify_permissions(db: Session, id_rol: int, id_modulo: int, accion: str):
     try:
+        matriz, roles = obtener_matriz_permisos(db)
+
         # consultar estado del rol (activo o inactivo)
-        sentencia = text("""
-                        SELECT estado
-                        FROM roles
-                        WHERE id_rol = :rol 
-                        """)
-        res = db.execute(sentencia, {"rol": id_rol}).mappings().first()
-        
-        if not res:
+        if id_rol not in roles:
             raise HTTPException(status_code=404, detail="Usuario no autorizado")
         
         # Si el estado del rol es inactivo
-        if res['estado'] == 0:
+        if not roles[id_rol]:
             raise HTTPException(status_code=401, detail="Usuario no autorizado")
         
-        query = text("""
-                     SELECT insertar, actualizar, seleccionar, borrar
-                     FROM permisos
-                     WHERE id_rol = :rol AND id_modulo = :modulo
-                     """)
-        result = db.execute(query, {"rol": id_rol, "modulo": id_modulo}).mappings().first()
-
-        if result is None:
+        mascara = matriz.get((id_rol, id_modulo))
+        if mascara is None:
             raise HTTPException(status_code=401, detail="Usuario no autorizado")
         
-        permiso = 0
-        
-        if result.insertar == 1 and accion == 'insertar':
-            permiso = 1
-        if result.actualizar == 1 and accion == 'actualizar':
-            permiso = 1
-        if result.seleccionar == 1 and accion == 'seleccionar':
-            permiso = 1
-        if result.borrar == 1 and accion == 'borrar':
-            permiso = 1 
-        
+        permiso = 1 if mascara & ACCIONES.get(accion, 0) else 0
         
         return permiso
     except SQLAlchemyError as e:
         logger.error(f"Error al obtener permisos: {e}")
         raise Exception("Error de base de datos al obtener permisos")
-    
\ No newline at end of file
@@ -4,6 +4,9 @@ from sqlalchemy import text
 from typing import Optional
 import logging
 from app.schemas.roles import RolCreate, RolUpdate, RolEstado
+from app.crud.permisos import invalidar_matriz_permisos
+from app.crud.conteos import EXACTO, contar_segun_modo, invalidar_conteos
+from core.security import revocar_tokens_rol
 from sqlalchemy.exc import SQLAlchemyError
 
 logger = logging.getLogger(__name__)
@@ -20,6 +23,8 @@ def create_rol(db: Session, rol: RolCreate) -> Optional[bool]:
         """)
         db.execute(sentencia, rol.model_dump())
         db.commit()
+        invalidar_matriz_permisos()
+        invalidar_conteos("roles")
         return True
     except SQLAlchemyError as e:
         db.rollback()
@@ -55,7 +60,7 @@ def get_rol_by_id(db: Session, rol_id: int):
         raise Exception("Error de base de datos al obtener el rol")
    
     
-def get_all_roles_pag(db: Session, skip: int = 0, limit: int = 10):
+def get_all_roles_pag(db: Session, skip: int = 0, limit: int = 10, conteo: str = EXACTO):
 
     '''
     Obtiene los roles con paginacion.
@@ -63,11 +68,10 @@ def get_all_roles_pag(db: Session, skip: int = 0, limit: int = 10):
 
     try:
         # 1. contar roles
-        count_query = text("""
+        total_result = contar_segun_modo(db, conteo, "roles", """
             SELECT COUNT(id_rol) AS total
             FROM roles
         """)
-        total_result = db.execute(count_query).scalar()
 
         # 2. Consultar roles paginadas
         data_query = text("""
@@ -85,7 +89,7 @@ def get_all_roles_pag(db: Session, skip: int = 0, limit: int = 10):
 
         # 3. Retornar resultados
         return {
-            "cant_roles": total_result or 0,
+            "cant_roles": total_result,
             "roles": [dict(row) for row in result]
         }
     
@@ -133,6 +137,8 @@ def cambiar_rol_estado(db: Session, id_rol: int, nuevo_estado: bool) -> bool:
         # Verificar si alguna fila fue afectada
         if result.rowcount > 0:
             db.commit()
+            invalidar_matriz_permisos()
+            revocar_tokens_rol(id_rol)
             return True
         else:
             db.rollback()  
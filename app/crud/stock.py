@@ -0,0 +1,364 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import bindparam, event, text
+from typing import Dict, List, Optional
+from datetime import datetime
+import logging
+import threading
+import time
+
+from core.config import settings
+from core.dialect import update_desde
+from core.database import crear_sesiones_dedicadas
+from app.crud.catalogo import marcar_cambio
+from app.crud.disponibilidad_huevos import anotar_disponibilidad, cantidades_de_ventas
+
+logger = logging.getLogger(__name__)
+
+# Existencias de los productos que se venden, por tabla de detalle.
+# Todo cambio de cantidad_disponible / cantidad_gallinas por ventas pasa por este modulo,
+# que ademas avisa al catalogo de la pantalla de venta (app/crud/catalogo.py) y, en
+# huevos, anota el ajuste de la disponibilidad por tipo (app/crud/disponibilidad_huevos.py).
+# Cada cambio queda en el libro movimientos_stock (migrations/004) en la misma
+# transaccion: devolver_existencias lo escribe por si misma; con las demas funciones
+# el llamador llama a registrar_movimientos cuando conoce la venta y el detalle.
+# (tabla de existencias, columna id, columna de cantidad disponible)
+INVENTARIOS = {
+    "detalle_huevos": ("stock", "id_producto", "cantidad_disponible"),
+    "detalle_salvamento": ("salvamento", "id_salvamento", "cantidad_gallinas"),
+}
+
+
+def _existencias_cambiadas(db: Session, tabla_detalle: str, deltas: Dict[int, int]) -> None:
+    marcar_cambio(db, tabla_detalle, deltas)
+    if tabla_detalle == "detalle_huevos":
+        anotar_disponibilidad(db, deltas)
+
+
+def registrar_movimientos(db: Session, tabla_detalle: str, movimientos: List[dict]) -> None:
+    '''
+    Agrega al libro movimientos_stock los cambios de existencias dados
+    ({id_producto, delta, motivo, id_venta, id_detalle}) con un solo executemany.
+    No hace commit.
+    '''
+    movimientos = _completar_reservas(db, tabla_detalle, movimientos)
+    if not movimientos:
+        return
+    base = {"inventario": INVENTARIOS[tabla_detalle][0], "id_venta": None, "id_detalle": None, "fecha_hora": datetime.now()}
+    db.execute(text("""
+        INSERT INTO movimientos_stock (inventario, id_producto, delta, motivo, id_venta, id_detalle, fecha_hora)
+        VALUES (:inventario, :id_producto, :delta, :motivo, :id_venta, :id_detalle, :fecha_hora)
+    """), [{**base, **movimiento} for movimiento in movimientos])
+
+
+def _completar_reservas(db: Session, tabla_detalle: str, movimientos: List[dict]) -> List[dict]:
+    '''
+    Las ventas reservadas por el coalescedor ya tienen su movimiento (sin detalle):
+    se le pone el detalle en vez de escribir otro. Devuelve los movimientos que faltan.
+    '''
+    pendientes = db.info.get(RESERVAS_PENDIENTES)
+    if not pendientes:
+        return movimientos
+    restantes = []
+    for movimiento in movimientos:
+        reserva = next((reserva for reserva in pendientes
+                        if not reserva["completa"] and movimiento["motivo"] == "venta"
+                        and reserva["tabla_detalle"] == tabla_detalle
+                        and reserva["id_producto"] == movimiento["id_producto"]
+                        and reserva["cantidad"] == -movimiento["delta"]
+                        and reserva["id_venta"] == movimiento.get("id_venta")), None)
+        if reserva is None:
+            restantes.append(movimiento)
+            continue
+        db.execute(text("UPDATE movimientos_stock SET id_detalle = :id_detalle WHERE id_movimiento = :id_movimiento"),
+                   {"id_detalle": movimiento.get("id_detalle"), "id_movimiento": reserva["id_movimiento"]})
+        reserva["completa"] = True
+    return restantes
+
+
+def registrar_movimientos_de_ventas(db: Session, tabla_detalle: str, ids_venta: List[int], signo: int, motivo: str) -> None:
+    '''
+    Un movimiento por cada detalle de las ventas dadas (delta = signo * cantidad),
+    con un INSERT ... SELECT. No hace commit.
+    '''
+    db.execute(text(f"""
+        INSERT INTO movimientos_stock (inventario, id_producto, delta, motivo, id_venta, id_detalle, fecha_hora)
+        SELECT :inventario, id_producto, :signo * cantidad, :motivo, id_venta, id_detalle, :fecha_hora
+        FROM {tabla_detalle}
+        WHERE id_venta IN :ids
+    """).bindparams(bindparam("ids", expanding=True)), {
+        "inventario": INVENTARIOS[tabla_detalle][0], "signo": signo, "motivo": motivo,
+        "fecha_hora": datetime.now(), "ids": ids_venta,
+    })
+
+
+def devolver_existencias(db: Session, tabla_detalle: str, ids_venta: List[int], motivo: str = "cancelacion") -> int:
+    '''
+    Devuelve a las existencias las cantidades de los detalles de las ventas dadas,
+    con un solo UPDATE unido a las cantidades agregadas por producto, y las anota
+    en el libro de movimientos. Devuelve los productos actualizados. No hace commit.
+    '''
+    tabla, columna_id, columna_cantidad = INVENTARIOS[tabla_detalle]
+    sentencia = update_desde(
+        db, tabla,
+        f"""
+            SELECT id_producto, SUM(cantidad) AS cantidad
+            FROM {tabla_detalle}
+            WHERE id_venta IN :ids
+            GROUP BY id_producto
+        """,
+        "devuelto",
+        f"devuelto.id_producto = {tabla}.{columna_id}",
+        f"{columna_cantidad} = {columna_cantidad} + devuelto.cantidad",
+    )
+    result = db.execute(text(sentencia).bindparams(bindparam("ids", expanding=True)), {"ids": ids_venta})
+    if result.rowcount:
+        registrar_movimientos_de_ventas(db, tabla_detalle, ids_venta, 1, motivo)
+        marcar_cambio(db, tabla_detalle)
+        if tabla_detalle == "detalle_huevos":
+            anotar_disponibilidad(db, cantidades_de_ventas(db, ids_venta, 1))
+    return result.rowcount
+
+
+def reservar_existencias(db: Session, tabla_detalle: str, id_producto: int, cantidad: int) -> bool:
+    '''
+    Descuenta la cantidad de las existencias del producto solo si alcanzan, en una
+    sola sentencia y sin leerlas antes: la fila queda bloqueada hasta el commit, asi
+    que dos ventas simultaneas no pueden vender la misma existencia.
+    Devuelve False si el producto no existe o no alcanza. No hace commit.
+    '''
+    tabla, columna_id, columna_cantidad = INVENTARIOS[tabla_detalle]
+    result = db.execute(text(f"""
+        UPDATE {tabla}
+        SET {columna_cantidad} = {columna_cantidad} - :cantidad
+        WHERE {columna_id} = :id_producto
+          AND {columna_cantidad} >= :cantidad
+    """), {"cantidad": cantidad, "id_producto": id_producto})
+    if result.rowcount != 1:
+        return False
+    _existencias_cambiadas(db, tabla_detalle, {id_producto: -cantidad})
+    return True
+
+
+def devolver_existencia(db: Session, tabla_detalle: str, id_producto: int, cantidad: int) -> None:
+    '''
+    Suma la cantidad a las existencias del producto. No hace commit.
+    '''
+    tabla, columna_id, columna_cantidad = INVENTARIOS[tabla_detalle]
+    db.execute(text(f"""
+        UPDATE {tabla}
+        SET {columna_cantidad} = {columna_cantidad} + :cantidad
+        WHERE {columna_id} = :id_producto
+    """), {"cantidad": cantidad, "id_producto": id_producto})
+    _existencias_cambiadas(db, tabla_detalle, {id_producto: cantidad})
+
+
+def reservar_existencias_lote(db: Session, tabla_detalle: str, cantidades: Dict[int, int]) -> bool:
+    '''
+    Como reservar_existencias para varios productos con un UPDATE ... CASE.
+    Devuelve False si algun producto no existe o no alcanza; en ese caso el llamador
+    debe hacer rollback (los demas ya quedaron descontados). No hace commit.
+    '''
+    tabla, columna_id, columna_cantidad = INVENTARIOS[tabla_detalle]
+    params = {"ids": list(cantidades)}
+    casos = []
+    for i, (id_producto, cantidad) in enumerate(cantidades.items()):
+        casos.append(f"WHEN :id_{i} THEN :cantidad_{i}")
+        params[f"id_{i}"] = id_producto
+        params[f"cantidad_{i}"] = cantidad
+    descuento = f"CASE {columna_id} {' '.join(casos)} END"
+    sentencia = text(f"""
+        UPDATE {tabla}
+        SET {columna_cantidad} = {columna_cantidad} - {descuento}
+        WHERE {columna_id} IN :ids
+          AND {columna_cantidad} >= {descuento}
+    """).bindparams(bindparam("ids", expanding=True))
+    if db.execute(sentencia, params).rowcount != len(cantidades):
+        return False
+    _existencias_cambiadas(db, tabla_detalle, {id_producto: -cantidad for id_producto, cantidad in cantidades.items()})
+    return True
+
+
+def producto_sin_existencias(db: Session, tabla_detalle: str, cantidades: Dict[int, int]) -> Optional[int]:
+    '''
+    Primer producto cuyas existencias no alcanzan para la cantidad pedida
+    (None si todos alcanzan), con una sola consulta.
+    '''
+    tabla, columna_id, columna_cantidad = INVENTARIOS[tabla_detalle]
+    sentencia = text(f"""
+        SELECT {columna_id} AS id_producto, {columna_cantidad} AS disponible
+        FROM {tabla}
+        WHERE {columna_id} IN :ids
+    """).bindparams(bindparam("ids", expanding=True))
+    filas = db.execute(sentencia, {"ids": list(cantidades)}).mappings().all()
+    disponibles = {fila["id_producto"]: fila["disponible"] for fila in filas}
+    for id_producto, cantidad in cantidades.items():
+        if disponibles.get(id_producto, 0) < cantidad:
+            return id_producto
+    return None
+
+
+# Coalescedor de reservas (opcional, STOCK_COALESCER_VENTANA_MS > 0; desactivado por defecto).
+# En horas pico casi todas las ventas descuentan las mismas filas de stock y cada
+# transaccion espera el bloqueo de la fila. El coalescedor junta las reservas
+# concurrentes de un mismo producto durante la ventana y las aplica con un solo
+# UPDATE condicionado en su propia transaccion (con su propio pool de conexiones,
+# STOCK_COALESCER_POOL_SIZE); cada llamador recibe su resultado.
+# En esa misma transaccion se escribe en movimientos_stock un movimiento "venta" por
+# reserva, con la venta y sin detalle; la transaccion del llamador le pone el detalle
+# (registrar_movimientos). Si el llamador termina sin commit, _compensar_reservas
+# devuelve las existencias y escribe un movimiento "devolucion" sin detalle.
+# Asi, por venta y producto, los movimientos sin detalle suman 0 cuando todo termina
+# bien. Si el proceso cae entre los dos commits o falla la compensacion, la reserva
+# queda con suma negativa (existencias descontadas sin detalle, pero anotadas en el
+# libro): python -m scripts.reparar_reservas las devuelve.
+# Necesita un pool con varias conexiones: no sirve con SQLite en memoria (una sola conexion).
+
+RESERVAS_PENDIENTES = "reservas_stock_pendientes"
+
+
+def _registrar_reserva(db: Session, tabla_detalle: str, id_producto: int, delta: int, motivo: str, id_venta: int) -> int:
+    '''
+    Movimiento sin detalle de una reserva del coalescedor (o de su devolucion).
+    Devuelve su id. No hace commit.
+    '''
+    return db.execute(text("""
+        INSERT INTO movimientos_stock (inventario, id_producto, delta, motivo, id_venta, id_detalle, fecha_hora)
+        VALUES (:inventario, :id_producto, :delta, :motivo, :id_venta, NULL, :fecha_hora)
+    """), {"inventario": INVENTARIOS[tabla_detalle][0], "id_producto": id_producto, "delta": delta,
+           "motivo": motivo, "id_venta": id_venta, "fecha_hora": datetime.now()}).lastrowid
+
+
+def devolver_reserva(db: Session, tabla_detalle: str, id_producto: int, cantidad: int, id_venta: int) -> None:
+    '''
+    Devuelve a las existencias una reserva del coalescedor que no llego a venderse y
+    lo anota en el libro (movimiento "devolucion" sin detalle). No hace commit.
+    '''
+    devolver_existencia(db, tabla_detalle, id_producto, cantidad)
+    _registrar_reserva(db, tabla_detalle, id_producto, cantidad, "devolucion", id_venta)
+
+
+class _Pedido:
+    def __init__(self, cantidad: int, id_venta: int):
+        self.cantidad = cantidad
+        self.id_venta = id_venta
+        self.id_movimiento = None
+        self.error = None
+        self.listo = threading.Event()
+
+
+class CoalescedorStock:
+    def __init__(self, ventana_ms: float, sesiones):
+        self.ventana = ventana_ms / 1000
+        self.sesiones = sesiones
+        self._lock = threading.Lock()
+        self._grupos = {}
+
+    def reservar(self, tabla_detalle: str, id_producto: int, cantidad: int, id_venta: int) -> Optional[int]:
+        '''
+        Reserva la cantidad junto con las demas reservas del producto que lleguen
+        durante la ventana. El primero en llegar espera la ventana y aplica el grupo.
+        Devuelve el id del movimiento de la reserva, o None si no alcanzo.
+        '''
+        clave = (tabla_detalle, id_producto)
+        pedido = _Pedido(cantidad, id_venta)
+        with self._lock:
+            lider = clave not in self._grupos
+            self._grupos.setdefault(clave, []).append(pedido)
+
+        if lider:
+            time.sleep(self.ventana)
+            with self._lock:
+                grupo = self._grupos.pop(clave)
+            self._aplicar(tabla_detalle, id_producto, grupo)
+
+        pedido.listo.wait()
+        if pedido.error is not None:
+            raise pedido.error
+        return pedido.id_movimiento
+
+    def _aplicar(self, tabla_detalle: str, id_producto: int, grupo: List[_Pedido]) -> None:
+        db = self.sesiones()
+        try:
+            if reservar_existencias(db, tabla_detalle, id_producto, sum(pedido.cantidad for pedido in grupo)):
+                reservados = grupo
+            else:
+                # No alcanza para todo el grupo: se atienden en orden de llegada los que quepan
+                reservados = [pedido for pedido in grupo
+                              if reservar_existencias(db, tabla_detalle, id_producto, pedido.cantidad)]
+            for pedido in reservados:
+                pedido.id_movimiento = _registrar_reserva(db, tabla_detalle, id_producto, -pedido.cantidad, "venta", pedido.id_venta)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Error al aplicar reservas agrupadas de {tabla_detalle} {id_producto}: {e}")
+            for pedido in grupo:
+                pedido.id_movimiento = None
+                pedido.error = e
+        finally:
+            db.close()
+            for pedido in grupo:
+                pedido.listo.set()
+
+
+_coalescedor: Optional[CoalescedorStock] = None
+_sesiones_coalescedor = None
+
+
+def configurar_coalescedor(ventana_ms: float) -> None:
+    '''
+    Activa el coalescedor con la ventana dada en milisegundos (0 lo desactiva).
+    '''
+    global _coalescedor, _sesiones_coalescedor
+    if ventana_ms > 0 and _sesiones_coalescedor is None:
+        _sesiones_coalescedor = crear_sesiones_dedicadas(settings.STOCK_COALESCER_POOL_SIZE)
+    _coalescedor = CoalescedorStock(ventana_ms, _sesiones_coalescedor) if ventana_ms > 0 else None
+
+
+configurar_coalescedor(settings.STOCK_COALESCER_VENTANA_MS)
+
+
+def reservar_para_venta(db: Session, tabla_detalle: str, id_producto: int, cantidad: int, id_venta: int) -> bool:
+    '''
+    Reserva existencias para una linea de venta nueva.
+    Sin coalescedor es reservar_existencias dentro de la transaccion de db.
+    Con coalescedor la reserva (y su movimiento sin detalle) se confirma en otra
+    transaccion y queda pendiente en db hasta su commit; si db hace rollback se devuelve.
+    Debe ser la primera escritura de la transaccion de db: si db ya tuviera
+    bloqueada la fila del producto, el coalescedor esperaria a db y db a el.
+    '''
+    if _coalescedor is None:
+        return reservar_existencias(db, tabla_detalle, id_producto, cantidad)
+
+    id_movimiento = _coalescedor.reservar(tabla_detalle, id_producto, cantidad, id_venta)
+    if id_movimiento is None:
+        return False
+    db.connection()  # inicia la transaccion de db para que la compensacion quede ligada a ella
+    db.info.setdefault(RESERVAS_PENDIENTES, []).append({
+        "tabla_detalle": tabla_detalle, "id_producto": id_producto, "cantidad": cantidad,
+        "id_venta": id_venta, "id_movimiento": id_movimiento, "completa": False,
+    })
+    return True
+
+
+@event.listens_for(Session, "after_commit")
+def _confirmar_reservas(session):
+    session.info.pop(RESERVAS_PENDIENTES, None)
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _compensar_reservas(session, transaction):
+    if transaction.parent is not None:
+        return
+    pendientes = session.info.pop(RESERVAS_PENDIENTES, None)
+    if not pendientes:
+        return
+    db = _sesiones_coalescedor()
+    try:
+        for reserva in pendientes:
+            devolver_reserva(db, reserva["tabla_detalle"], reserva["id_producto"], reserva["cantidad"], reserva["id_venta"])
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.error(f"No se pudieron devolver reservas de stock {pendientes} (corregir con scripts.reparar_reservas): {e}")
+    finally:
+        db.close()
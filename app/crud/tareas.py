@@ -5,6 +5,7 @@ from sqlalchemy import text
 from sqlalchemy.exc import SQLAlchemyError
 import logging
 from app.schemas.tareas import TareaCreate, TareaUpdate
+from app.crud.conteos import EXACTO, contar_segun_modo, invalidar_conteos
 from typing import Optional
 from datetime import date   
 
@@ -19,6 +20,7 @@ def create_tarea(db: Session, tarea: TareaCreate):
         """)
         db.execute(sentencia, tarea.model_dump())
         db.commit()
+        invalidar_conteos("tareas")
         return True
     except SQLAlchemyError as e:
         db.rollback()
@@ -31,13 +33,14 @@ def get_tareas_pag(
     skip: int = 0,
     limit: int = 10,
     fecha_inicio: Optional[date] = None,
-    fecha_fin: Optional[date] = None
+    fecha_fin: Optional[date] = None,
+    conteo: str = EXACTO
 ):
     """
     Devuelve las tareas paginadas, opcionalmente filtradas por rango de fechas.
     """
     try:
-        base_query = """
+        select = """
             SELECT 
                 t.id_tarea,
                 u.id_usuario,
@@ -47,11 +50,13 @@ def get_tareas_pag(
                 t.fecha_hora_init,
                 t.estado,
                 t.fecha_hora_fin
+        """
+        base_query = """
             FROM tareas t
             JOIN usuarios u ON t.id_usuario = u.id_usuario   
             WHERE 1=1
         """
-        params = {"skip": skip, "limit": limit}
+        params = {}
 
         # Aplicar filtros si se envían
         if fecha_inicio:
@@ -61,16 +66,16 @@ def get_tareas_pag(
             base_query += " AND DATE(fecha_hora_fin) <= :fecha_fin"
             params["fecha_fin"] = fecha_fin
 
-        # Contar total de registros con los mismos filtros
-        count_query = f"SELECT COUNT(*) AS total FROM ({base_query}) AS sub"
-        total_result = db.execute(text(count_query), params).scalar()
+        # Contar total de registros con los mismos filtros (sin subconsulta)
+        total_result = contar_segun_modo(db, conteo, "tareas", "SELECT COUNT(*) AS total" + base_query,
+                                         params, filtrado=bool(params))
 
         # Agregar orden y paginación
-        base_query += " ORDER BY fecha_hora_init DESC LIMIT :limit OFFSET :skip"
-        result = db.execute(text(base_query), params).mappings().all()
+        data_query = select + base_query + " ORDER BY fecha_hora_init DESC LIMIT :limit OFFSET :skip"
+        result = db.execute(text(data_query), {**params, "skip": skip, "limit": limit}).mappings().all()
 
         return {
-            "total": total_result or 0,
+            "total": total_result,
             "tareas": [dict(row) for row in result]
         }
 
@@ -142,6 +147,8 @@ def update_tarea(db: Session, id_tarea: int, tarea: TareaUpdate):
         query = text(f"UPDATE tareas SET {set_clause} WHERE id_tarea = :id_tarea")
         result = db.execute(query, fields)
         db.commit()
+        # las fechas de la tarea afectan el conteo filtrado de /tareas/pag
+        invalidar_conteos("tareas")
         return result.rowcount > 0
     except SQLAlchemyError as e:
         db.rollback()
@@ -161,6 +168,8 @@ def update_tarea_by_user(db: Session, id_usuario: int, tarea: TareaUpdate):
         query = text(f"UPDATE tareas SET {set_clause} WHERE id_usuario = :id_usuario")
         result = db.execute(query, fields)
         db.commit()
+        # las fechas de la tarea afectan el conteo filtrado de /tareas/pag
+        invalidar_conteos("tareas")
         return result.rowcount > 0
     except SQLAlchemyError as e:
         db.rollback()
@@ -0,0 +1,253 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import bindparam, event, text
+from decimal import Decimal
+from datetime import date
+from typing import Iterable, List, Tuple
+import logging
+
+from core.dialect import upsert_sumando
+
+logger = logging.getLogger(__name__)
+
+# Totales materializados de las ventas:
+# - ventas.total: suma de (precio_venta - valor_descuento) * cantidad de los detalles
+#   de huevos y de salvamento de la venta.
+# - ventas_resumen_diario: por dia, tipo_pago e id_usuario, cantidad de ventas activas
+#   y los importes bruto, descuento y neto de sus detalles.
+# ventas.total lo mantienen los CRUD de ventas y detalles en la misma transaccion en
+# que escriben. Los cambios del resumen se calculan en esa transaccion pero solo se
+# anotan en la sesion y se aplican despues del commit, en una transaccion propia de
+# una sola sentencia: todas las ventas de un dia (por tipo de pago y usuario) suman
+# en las mismas filas, y bloquearlas hasta el commit de cada venta haria que las
+# ventas del dia se atendieran en fila. Si ese ajuste falla (o el proceso cae entre
+# los dos commits), el resumen queda desfasado hasta correr scripts.reconstruir_resumen.
+# Las funciones de recalculo sirven para reparar o verificar.
+
+
+def suma_detalles(expresion: str) -> str:
+    '''
+    Fragmento SQL con la suma de la expresion sobre los detalles de huevos y de
+    salvamento de cada fila de ventas de la consulta exterior.
+    '''
+    return f"""
+    COALESCE((
+        SELECT SUM({expresion})
+        FROM detalle_huevos
+        WHERE detalle_huevos.id_venta = ventas.id_venta
+    ), 0)
+    +
+    COALESCE((
+        SELECT SUM({expresion})
+        FROM detalle_salvamento
+        WHERE detalle_salvamento.id_venta = ventas.id_venta
+    ), 0)
+"""
+
+
+# Total calculado desde los detalles (para reparar o verificar)
+TOTAL_DESDE_DETALLES = suma_detalles("(precio_venta - valor_descuento) * cantidad")
+BRUTO_DESDE_DETALLES = suma_detalles("precio_venta * cantidad")
+DESCUENTO_DESDE_DETALLES = suma_detalles("valor_descuento * cantidad")
+
+CLAVE_RESUMEN = ("dia", "tipo_pago", "id_usuario")
+COLUMNAS_RESUMEN = ("cantidad_ventas", "bruto", "descuento", "neto")
+
+RESUMEN_SESION = "resumen_cambios"
+
+
+def importes(detalle) -> Tuple[Decimal, Decimal]:
+    '''
+    (bruto, descuento) de un detalle: precio_venta y valor_descuento por la cantidad.
+    '''
+    cantidad = detalle["cantidad"]
+    return Decimal(detalle["precio_venta"]) * cantidad, Decimal(detalle["valor_descuento"]) * cantidad
+
+
+def ajustar_total_venta(db: Session, id_venta: int, agregados: Iterable = (), quitados: Iterable = ()) -> None:
+    '''
+    Suma a la venta los importes de los detalles agregados y resta los de los
+    quitados, en ventas.total y en el resumen diario. No hace commit.
+    '''
+    bruto = descuento = Decimal(0)
+    for detalle in agregados:
+        b, d = importes(detalle)
+        bruto += b
+        descuento += d
+    for detalle in quitados:
+        b, d = importes(detalle)
+        bruto -= b
+        descuento -= d
+    if not bruto and not descuento:
+        return
+
+    db.execute(text("""
+        UPDATE ventas
+        SET total = total + :delta
+        WHERE id_venta = :id_venta
+    """), {"delta": bruto - descuento, "id_venta": id_venta})
+    sumar_resumen(db, id_venta, bruto=bruto, descuento=descuento)
+
+
+def _anotar_resumen(db: Session, consulta, params: dict) -> None:
+    '''
+    Anota en la sesion los cambios del resumen que devuelve la consulta (columnas
+    CLAVE_RESUMEN + COLUMNAS_RESUMEN). Se aplican cuando la sesion hace commit.
+    '''
+    pendientes = db.info.setdefault(RESUMEN_SESION, {})
+    for fila in db.execute(consulta, params).mappings():
+        clave = tuple(str(fila[columna]) if columna == "dia" else fila[columna] for columna in CLAVE_RESUMEN)
+        actual = pendientes.setdefault(clave, {"cantidad_ventas": 0, "bruto": Decimal(0), "descuento": Decimal(0), "neto": Decimal(0)})
+        actual["cantidad_ventas"] += int(fila["cantidad_ventas"] or 0)
+        for columna in ("bruto", "descuento", "neto"):
+            actual[columna] += Decimal(str(fila[columna] or 0))
+
+
+@event.listens_for(Session, "after_commit")
+def _aplicar_resumen(session):
+    pendientes = session.info.pop(RESUMEN_SESION, None)
+    if not pendientes:
+        return
+    filas = [{**dict(zip(CLAVE_RESUMEN, clave)), **valores}
+             for clave, valores in sorted(pendientes.items()) if any(valores.values())]
+    if not filas:
+        return
+    db = Session(bind=session.get_bind())
+    try:
+        db.execute(text(f"""
+            INSERT INTO ventas_resumen_diario (dia, tipo_pago, id_usuario, cantidad_ventas, bruto, descuento, neto)
+            VALUES (:dia, :tipo_pago, :id_usuario, :cantidad_ventas, :bruto, :descuento, :neto)
+            {upsert_sumando(db, CLAVE_RESUMEN, COLUMNAS_RESUMEN)}
+        """), filas)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.error(f"No se pudo ajustar el resumen diario {filas}: {e}")
+    finally:
+        db.close()
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _descartar_resumen(session, transaction):
+    if transaction.parent is None:
+        session.info.pop(RESUMEN_SESION, None)
+
+
+def sumar_resumen(db: Session, id_venta: int, ventas: int = 0, bruto=0, descuento=0) -> None:
+    '''
+    Suma al resumen diario (dia, tipo_pago y usuario de la venta) la cantidad
+    de ventas y los importes dados, que pueden ser negativos. No hace commit.
+    '''
+    if not (ventas or bruto or descuento):
+        return
+    _anotar_resumen(db, text("""
+        SELECT DATE(fecha_hora) AS dia, tipo_pago, id_usuario,
+               :ventas AS cantidad_ventas, :bruto AS bruto, :descuento AS descuento, :neto AS neto
+        FROM ventas
+        WHERE id_venta = :id_venta
+    """), {"id_venta": id_venta, "ventas": ventas, "bruto": bruto, "descuento": descuento, "neto": bruto - descuento})
+
+
+def mover_venta_resumen(db: Session, id_venta: int, signo: int) -> None:
+    '''
+    Suma (signo=1) o resta (signo=-1) el aporte completo de la venta al resumen.
+    Se usa antes y despues de cambiar una columna de la clave (tipo_pago). No hace commit.
+    '''
+    _anotar_resumen(db, text(f"""
+        SELECT DATE(fecha_hora) AS dia, tipo_pago, id_usuario,
+               :signo * estado AS cantidad_ventas,
+               :signo * ({BRUTO_DESDE_DETALLES}) AS bruto,
+               :signo * ({DESCUENTO_DESDE_DETALLES}) AS descuento,
+               :signo * total AS neto
+        FROM ventas
+        WHERE id_venta = :id_venta
+    """), {"id_venta": id_venta, "signo": signo})
+
+
+def restar_ventas_resumen(db: Session, ids_venta: List[int]) -> None:
+    '''
+    Resta del resumen diario las ventas dadas (que dejan de estar activas),
+    agrupadas por dia, tipo_pago y usuario. No hace commit.
+    '''
+    _anotar_resumen(db, text("""
+        SELECT DATE(fecha_hora) AS dia, tipo_pago, id_usuario,
+               -COUNT(*) AS cantidad_ventas, 0 AS bruto, 0 AS descuento, 0 AS neto
+        FROM ventas
+        WHERE id_venta IN :ids
+        GROUP BY DATE(fecha_hora), tipo_pago, id_usuario
+    """).bindparams(bindparam("ids", expanding=True)), {"ids": ids_venta})
+
+
+def quitar_detalles_de_totales(db: Session, tabla_detalle: str, ids_venta: List[int]) -> None:
+    '''
+    Resta de ventas.total y del resumen diario los importes de todos los detalles
+    de tabla_detalle de las ventas dadas; se llama antes de borrarlos. No hace commit.
+    '''
+    ids = bindparam("ids", expanding=True)
+    db.execute(text(f"""
+        UPDATE ventas
+        SET total = total - COALESCE((
+            SELECT SUM((precio_venta - valor_descuento) * cantidad)
+            FROM {tabla_detalle}
+            WHERE {tabla_detalle}.id_venta = ventas.id_venta
+        ), 0)
+        WHERE id_venta IN :ids
+    """).bindparams(ids), {"ids": ids_venta})
+    _anotar_resumen(db, text(f"""
+        SELECT DATE(ventas.fecha_hora) AS dia, ventas.tipo_pago, ventas.id_usuario, 0 AS cantidad_ventas,
+               -SUM(detalle.precio_venta * detalle.cantidad) AS bruto,
+               -SUM(detalle.valor_descuento * detalle.cantidad) AS descuento,
+               -SUM((detalle.precio_venta - detalle.valor_descuento) * detalle.cantidad) AS neto
+        FROM ventas
+        INNER JOIN {tabla_detalle} AS detalle ON detalle.id_venta = ventas.id_venta
+        WHERE ventas.id_venta IN :ids
+        GROUP BY DATE(ventas.fecha_hora), ventas.tipo_pago, ventas.id_usuario
+    """).bindparams(ids), {"ids": ids_venta})
+
+
+def recalcular_totales(db: Session, desde: int, hasta: int) -> int:
+    '''
+    Recalcula ventas.total desde los detalles para id_venta entre desde y hasta.
+    Devuelve las filas corregidas. No hace commit.
+    '''
+    result = db.execute(text(f"""
+        UPDATE ventas
+        SET total = {TOTAL_DESDE_DETALLES}
+        WHERE id_venta BETWEEN :desde AND :hasta
+          AND total <> {TOTAL_DESDE_DETALLES}
+    """), {"desde": desde, "hasta": hasta})
+    return result.rowcount
+
+
+def contar_totales_incorrectos(db: Session, desde: int, hasta: int) -> int:
+    return db.execute(text(f"""
+        SELECT COUNT(*)
+        FROM ventas
+        WHERE id_venta BETWEEN :desde AND :hasta
+          AND total <> {TOTAL_DESDE_DETALLES}
+    """), {"desde": desde, "hasta": hasta}).scalar()
+
+
+def recalcular_resumen(db: Session, desde: date, hasta: date) -> int:
+    '''
+    Reconstruye el resumen diario de los dias entre desde (incluido) y hasta
+    (excluido) a partir de ventas y sus detalles. Devuelve las filas escritas.
+    No hace commit.
+    '''
+    params = {"desde": desde, "hasta": hasta}
+    db.execute(text("""
+        DELETE FROM ventas_resumen_diario
+        WHERE dia >= :desde AND dia < :hasta
+    """), params)
+    result = db.execute(text(f"""
+        INSERT INTO ventas_resumen_diario (dia, tipo_pago, id_usuario, cantidad_ventas, bruto, descuento, neto)
+        SELECT dia, tipo_pago, id_usuario, SUM(estado), SUM(bruto), SUM(descuento), SUM(bruto) - SUM(descuento)
+        FROM (
+            SELECT DATE(fecha_hora) AS dia, tipo_pago, id_usuario, estado,
+                   {BRUTO_DESDE_DETALLES} AS bruto,
+                   {DESCUENTO_DESDE_DETALLES} AS descuento
+            FROM ventas
+            WHERE fecha_hora >= :desde AND fecha_hora < :hasta
+        ) AS por_venta
+        GROUP BY dia, tipo_pago, id_usuario
+    """), params)
+    return result.rowcount
@@ -3,7 +3,7 @@ from sqlalchemy import text
 from typing import Optional
 from sqlalchemy.exc import SQLAlchemyError
 import logging
-from core.security import get_hashed_password
+from core.security import get_hashed_password, revocar_tokens_usuario
 from app.schemas.users import UserCreate, UserUpdate
 from fastapi import HTTPException
 
@@ -123,6 +123,9 @@ def update_user_by_id(db: Session, user_id: int, user: UserUpdate) -> Optional[b
 
         result = db.execute(sentencia, user_data)
         db.commit()
+        if "email" in user_data:
+            # Los tokens emitidos llevan el email anterior en sus claims
+            revocar_tokens_usuario(user_id)
 
         return result.rowcount > 0
     except SQLAlchemyError as e:
@@ -211,6 +214,7 @@ def change_user_status(db: Session, id_usuario: int, nuevo_estado: bool) -> bool
         """)
         result = db.execute(sentencia, {"estado": nuevo_estado, "id_usuario": id_usuario})
         db.commit()
+        revocar_tokens_usuario(id_usuario)
 
         return result.rowcount > 0
 
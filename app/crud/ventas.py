@@ -1,17 +1,129 @@
 from fastapi import HTTPException
 from sqlalchemy.orm import Session
-from sqlalchemy import text
-from typing import Dict, Optional
+from sqlalchemy import bindparam, text
+from typing import Dict, Iterable, List, Optional
 import logging
-from app.schemas.ventas import VentaCreate, VentaUpdate, VentaEstado
+from app.schemas.ventas import VentaCheckout, VentaCreate, VentaUpdate, VentaEstado
 from sqlalchemy.exc import SQLAlchemyError, IntegrityError
 from datetime import datetime, timezone
-from datetime import date
-from app.crud.detalle_huevos import delete_all_detalle_huevos_by_id_venta           
-from app.crud.detalle_salvamento import delete_all_detalle_salvamento_by_id_venta   
+from datetime import date, timedelta
+from app.crud.detalle_huevos import delete_all_detalle_huevos_by_id_venta, delete_all_detalle_huevos_by_ids_venta
+from app.crud.detalle_salvamento import delete_all_detalle_salvamento_by_id_venta, delete_all_detalle_salvamento_by_ids_venta
+from core.dialect import concat, inicio_periodo
+from core.paginacion import recortar_pagina
+from app.crud.conteos import EXACTO, contar_segun_modo, invalidar_conteos
+from app.crud.stock import producto_sin_existencias, registrar_movimientos_de_ventas, reservar_existencias_lote
+from app.crud.totales_venta import TOTAL_DESDE_DETALLES, ajustar_total_venta, mover_venta_resumen, restar_ventas_resumen, sumar_resumen
+from core.config import settings
 
 logger = logging.getLogger(__name__)
 
+# Columnas que forman la posicion del cursor en las consultas paginadas
+CLAVE_VENTAS = {"id_venta": int}
+CLAVE_VENTAS_FECHA = {"fecha_hora": datetime, "id_venta": int}
+
+ORDEN_ID = "ventas.id_venta"
+ORDEN_FECHA = "ventas.fecha_hora, ventas.id_venta"
+FILTRO_RANGO_FECHAS = "ventas.fecha_hora >= :fecha_inicio AND ventas.fecha_hora < :fecha_fin"
+
+# Formas de obtener el total de cada venta en los listados:
+# - materializado:  la columna ventas.total (la mantienen los CRUD de detalles)
+# - agregado:       join con los detalles agregados por id_venta, una vez por pagina
+# - correlacionado: dos subconsultas por fila (plan anterior, se conserva para comparar)
+TOTAL_MATERIALIZADO = "materializado"
+TOTAL_AGREGADO = "agregado"
+TOTAL_CORRELACIONADO = "correlacionado"
+
+
+def _total_por_defecto() -> str:
+    return TOTAL_MATERIALIZADO if settings.VENTAS_TOTAL_MATERIALIZADO else TOTAL_AGREGADO
+
+
+def consulta_ventas(filtros: Iterable[str] = (), orden: str = ORDEN_ID, paginar: bool = False, total: Optional[str] = None) -> str:
+    '''
+    SELECT de ventas con el usuario, el metodo de pago y el total, comun a todos los listados.
+    filtros: condiciones sobre ventas que se unen con AND (las vacias se ignoran).
+    paginar: agrega LIMIT :limit OFFSET :skip.
+    total: una de las constantes TOTAL_*; por defecto segun VENTAS_TOTAL_MATERIALIZADO.
+    '''
+    filtros = [filtro for filtro in filtros if filtro]
+    where = ("WHERE " + " AND ".join(filtros)) if filtros else ""
+    pagina = "LIMIT :limit OFFSET :skip" if paginar else ""
+    total = total or _total_por_defecto()
+
+    joins = ""
+    if total == TOTAL_MATERIALIZADO:
+        columna_total = "ventas.total"
+    elif total == TOTAL_CORRELACIONADO:
+        columna_total = TOTAL_DESDE_DETALLES
+    else:
+        # Los detalles se agregan solo para las ventas de la pagina (o del filtro).
+        # MySQL no admite LIMIT dentro de IN (...), por eso la pagina va en una tabla derivada.
+        if paginar:
+            ids = f"SELECT id_venta FROM (SELECT ventas.id_venta FROM ventas {where} ORDER BY {orden} {pagina}) AS ids_pagina"
+        else:
+            ids = f"SELECT ventas.id_venta FROM ventas {where}"
+        restriccion = f"WHERE id_venta IN ({ids})" if (paginar or filtros) else ""
+        for tabla in ("detalle_huevos", "detalle_salvamento"):
+            joins += f"""
+            LEFT JOIN (
+                SELECT id_venta, SUM((precio_venta - valor_descuento) * cantidad) AS total
+                FROM {tabla}
+                {restriccion}
+                GROUP BY id_venta
+            ) AS total_{tabla} ON total_{tabla}.id_venta = ventas.id_venta"""
+        columna_total = "COALESCE(total_detalle_huevos.total, 0) + COALESCE(total_detalle_salvamento.total, 0)"
+
+    return f"""
+        SELECT 
+            ventas.id_usuario,
+            usuarios.nombre AS nombre_usuario, 
+            ventas.tipo_pago,
+            metodo_pago.nombre AS metodo_pago,
+            ventas.id_venta, 
+            ventas.fecha_hora,
+            {columna_total} AS total,
+            ventas.estado
+        FROM ventas
+        LEFT JOIN usuarios ON usuarios.id_usuario = ventas.id_usuario
+        LEFT JOIN metodo_pago ON metodo_pago.id_tipo = ventas.tipo_pago{joins}
+        {where}
+        ORDER BY {orden}
+        {pagina}
+    """
+
+
+def _filtro_cursor(despues_de: Optional[dict]) -> str:
+    '''
+    Condicion keyset para continuar despues de la posicion del cursor.
+    Con (fecha_hora, id_venta) se escribe de forma que use el indice por fecha_hora.
+    '''
+    if not despues_de:
+        return ""
+    if "fecha_hora" in despues_de:
+        return """
+            ventas.fecha_hora >= :cursor_fecha_hora
+            AND (ventas.fecha_hora > :cursor_fecha_hora OR ventas.id_venta > :cursor_id_venta)
+        """
+    return "ventas.id_venta > :cursor_id_venta"
+
+
+def _rango_fechas(fecha_inicio: str, fecha_fin: str) -> dict:
+    '''
+    Convierte las fechas YYYY-MM-DD (ambas incluidas) en el rango semiabierto
+    [fecha_inicio 00:00, fecha_fin + 1 dia 00:00) para filtrar fecha_hora sin
+    aplicarle funciones, de modo que pueda usar el indice.
+    Lanza ValueError si alguna fecha no tiene el formato esperado.
+    '''
+    inicio = datetime.combine(date.fromisoformat(fecha_inicio), datetime.min.time())
+    fin = datetime.combine(date.fromisoformat(fecha_fin) + timedelta(days=1), datetime.min.time())
+    return {"fecha_inicio": inicio, "fecha_fin": fin}
+
+
+def _parametros_cursor(despues_de: Optional[dict]) -> dict:
+    return {f"cursor_{campo}": valor for campo, valor in (despues_de or {}).items()}
+
+
 def create_venta(db: Session, venta: VentaCreate) -> Optional[Dict]:
     '''
         Crea una venta en la base de datos y devuelve la venta completa
@@ -21,10 +133,10 @@ def create_venta(db: Session, venta: VentaCreate) -> Optional[Dict]:
         sentencia = text("""
             INSERT INTO ventas (
                 fecha_hora, id_usuario,
-                tipo_pago
+                tipo_pago, total
             ) VALUES (
                 :fecha_hora, :id_usuario,
-                :tipo_pago
+                :tipo_pago, 0
             )
         """)
         
@@ -32,12 +144,16 @@ def create_venta(db: Session, venta: VentaCreate) -> Optional[Dict]:
         venta_data['tipo_pago'] = 1  # SE CREA CON VALOR POR DEFECTO 1 (DEBE EXISTIR EN BASE DE DATOS UN REGISTRO CON ID=1 "COMO EFECTIVO" EN LA TABLA METODO_PAGO )
         
         resultado = db.execute(sentencia, venta_data)
-        db.commit()
-        
         id_venta_creada = resultado.lastrowid
         if id_venta_creada is None:
+            db.rollback()
             logger.warning(f"No se pudo recuperar el id de la venta")
             return None
+
+        # la venta cuenta en el resumen diario desde que se crea (aun sin detalles)
+        sumar_resumen(db, id_venta_creada, ventas=1)
+        db.commit()
+        invalidar_conteos("ventas")
         
         consulta = text("""
             SELECT 
@@ -70,33 +186,98 @@ def create_venta(db: Session, venta: VentaCreate) -> Optional[Dict]:
         logger.error(f"Error al crear venta: {e}")
         raise
        
+# Tabla de detalle de cada tipo de linea del checkout
+TABLAS_CHECKOUT = {"huevos": "detalle_huevos", "salvamento": "detalle_salvamento"}
+
+
+def _cantidades_por_producto(lineas: list) -> Dict[int, int]:
+    cantidades = {}
+    for linea in lineas:
+        cantidades[linea["id_producto"]] = cantidades.get(linea["id_producto"], 0) + linea["cantidad"]
+    return cantidades
+
+
+def metodo_pago_activo(db: Session, tipo_pago: int) -> bool:
+    '''
+    Indica si el metodo de pago existe y esta activo.
+    '''
+    estado = db.execute(text("""
+        SELECT estado
+        FROM metodo_pago
+        WHERE id_tipo = :tipo_pago"""), {"tipo_pago": tipo_pago}).scalar()
+    return bool(estado)
+
+
+def checkout_venta(db: Session, checkout: VentaCheckout) -> int:
+    '''
+    Crea la venta con todas sus lineas de huevos y salvamento en una transaccion:
+    reserva las existencias con un UPDATE condicionado por tabla, inserta los detalles
+    con executemany y hace un solo commit.
+    Devuelve el id de la venta creada.
+    '''
+    lineas = {
+        "huevos": [linea.model_dump() for linea in checkout.huevos],
+        "salvamento": [linea.model_dump() for linea in checkout.salvamento],
+    }
+    cantidades = {tipo: _cantidades_por_producto(filas) for tipo, filas in lineas.items() if filas}
+    try:
+        if not metodo_pago_activo(db, checkout.tipo_pago):
+            db.rollback()
+            raise HTTPException(status_code=400, detail="Metodo de pago inexistente o inactivo")
+
+        # Reservar el stock de todos los productos antes de escribir la venta;
+        # solo si no alcanza se consulta (ya sin la reserva parcial) cual producto fallo
+        for tipo, por_producto in cantidades.items():
+            if not reservar_existencias_lote(db, TABLAS_CHECKOUT[tipo], por_producto):
+                db.rollback()
+                faltante = producto_sin_existencias(db, TABLAS_CHECKOUT[tipo], por_producto)
+                db.rollback()
+                raise HTTPException(status_code=400, detail=f"Stock insuficiente para el producto {faltante} de {tipo}")
+
+        resultado = db.execute(text("""
+            INSERT INTO ventas (
+                fecha_hora, id_usuario,
+                tipo_pago, total
+            ) VALUES (
+                :fecha_hora, :id_usuario,
+                :tipo_pago, 0
+            )
+        """), {"fecha_hora": checkout.fecha_hora, "id_usuario": checkout.id_usuario, "tipo_pago": checkout.tipo_pago})
+        id_venta = resultado.lastrowid
+
+        detalles = []
+        for tipo in cantidades:
+            filas = [{**linea, "id_venta": id_venta} for linea in lineas[tipo]]
+            db.execute(text(f"""
+                INSERT INTO {TABLAS_CHECKOUT[tipo]}(
+                    id_producto, cantidad, id_venta,
+                    valor_descuento, precio_venta
+                ) VALUES (
+                    :id_producto, :cantidad, :id_venta,
+                    :valor_descuento, :precio_venta
+                )
+            """), filas)
+            registrar_movimientos_de_ventas(db, TABLAS_CHECKOUT[tipo], [id_venta], -1, "venta")
+            detalles += filas
+
+        sumar_resumen(db, id_venta, ventas=1)
+        ajustar_total_venta(db, id_venta, agregados=detalles)
+        db.commit()
+        invalidar_conteos("ventas")
+        return id_venta
+    except IntegrityError as e:
+        db.rollback()
+        logger.error(f"Error de integridad en el checkout: {e}")
+        raise
+    except SQLAlchemyError as e:
+        db.rollback()
+        logger.error(f"Error al registrar el checkout: {e}")
+        raise
+
 
 def get_all_ventas(db: Session):
     try:
-        query = text("""
-                    SELECT 
-                        ventas.id_usuario,
-                        usuarios.nombre AS nombre_usuario, 
-                        ventas.tipo_pago,
-                        metodo_pago.nombre AS metodo_pago,
-                        ventas.id_venta, 
-                        ventas.fecha_hora,
-                        COALESCE((
-                            SELECT SUM((precio_venta - valor_descuento) * cantidad) 
-                            FROM detalle_huevos 
-                            WHERE detalle_huevos.id_venta = ventas.id_venta
-                        ), 0)
-                        +
-                        COALESCE((
-                            SELECT SUM((precio_venta - valor_descuento) * cantidad)
-                            FROM detalle_salvamento 
-                            WHERE detalle_salvamento.id_venta = ventas.id_venta
-                        ), 0) AS total,
-                        ventas.estado
-                    FROM ventas
-                    LEFT JOIN usuarios ON usuarios.id_usuario = ventas.id_usuario
-                    LEFT JOIN metodo_pago ON metodo_pago.id_tipo = ventas.tipo_pago
-                """)
+        query = text(consulta_ventas())
         result = db.execute(query).mappings().all()
         return result
     except SQLAlchemyError as e:
@@ -106,36 +287,8 @@ def get_all_ventas(db: Session):
 
 def get_ventas_by_date_range(db: Session, fecha_inicio: str, fecha_fin: str):
     try:
-        query = text("""
-            SELECT 
-                ventas.id_usuario,
-                usuarios.nombre AS nombre_usuario, 
-                ventas.tipo_pago,
-                metodo_pago.nombre AS metodo_pago,
-                ventas.id_venta, 
-                ventas.fecha_hora,
-                COALESCE((
-                    SELECT SUM((precio_venta - valor_descuento) * cantidad) 
-                    FROM detalle_huevos 
-                    WHERE detalle_huevos.id_venta = ventas.id_venta
-                ), 0)
-                +
-                COALESCE((
-                    SELECT SUM((precio_venta - valor_descuento) * cantidad)
-                    FROM detalle_salvamento 
-                    WHERE detalle_salvamento.id_venta = ventas.id_venta
-                ), 0) AS total,
-                ventas.estado
-            FROM ventas
-            LEFT JOIN usuarios ON usuarios.id_usuario = ventas.id_usuario
-            LEFT JOIN metodo_pago ON metodo_pago.id_tipo = ventas.tipo_pago
-            WHERE DATE(fecha_hora) BETWEEN :fecha_inicio AND :fecha_fin
-            ORDER BY fecha_hora ASC, id_venta
-        """)
-        result = db.execute(query, {
-            "fecha_inicio": fecha_inicio,
-            "fecha_fin": fecha_fin
-        }).mappings().all()
+        query = text(consulta_ventas([FILTRO_RANGO_FECHAS], orden=ORDEN_FECHA))
+        result = db.execute(query, _rango_fechas(fecha_inicio, fecha_fin)).mappings().all()
         return result
 
     except SQLAlchemyError as e:
@@ -143,57 +296,65 @@ def get_ventas_by_date_range(db: Session, fecha_inicio: str, fecha_fin: str):
         raise Exception("Error de base de datos al obtener la venta")
 
 
+def exportar_ventas(db: Session, fecha_inicio: Optional[str] = None, fecha_fin: Optional[str] = None, lote: int = 1000):
+    '''
+    Generador con las ventas (opcionalmente en un rango de fechas) leidas con un
+    cursor del lado del servidor: en memoria solo hay un lote de filas a la vez.
+    La sesion queda ocupada hasta terminar de recorrer el generador.
+    '''
+    filtros = []
+    params = {}
+    if fecha_inicio:
+        filtros.append("ventas.fecha_hora >= :fecha_inicio")
+        params["fecha_inicio"] = _rango_fechas(fecha_inicio, fecha_inicio)["fecha_inicio"]
+    if fecha_fin:
+        filtros.append("ventas.fecha_hora < :fecha_fin")
+        params["fecha_fin"] = _rango_fechas(fecha_fin, fecha_fin)["fecha_fin"]
+    orden = ORDEN_FECHA if filtros else ORDEN_ID
+    query = text(consulta_ventas(filtros, orden=orden))
+    try:
+        result = db.execute(query, params, execution_options={"stream_results": True, "yield_per": lote})
+        for row in result.mappings():
+            yield dict(row)
+    except SQLAlchemyError as e:
+        logger.error(f"Error al exportar las ventas: {e}")
+        raise Exception("Error de base de datos al exportar las ventas")
+
+
 # OFFSET :skip salta un numero de filas (por ejemplo, los usuarios ya mostrados).
 # FETCH NEXT :limit ROWS ONLY obtiene solo las filas de esa "pagina".
 # Usamos parametros :skip y :limit para evitar inyeccion SQL.
-def get_all_ventas_pag(db: Session, skip: int = 0, limit: int = 10):
+def get_all_ventas_pag(db: Session, skip: int = 0, limit: int = 10, despues_de: Optional[dict] = None, conteo: str = EXACTO):
 
     '''
     Obtiene las ventas con paginacion.
+    Con despues_de (posicion de un cursor) se ignora skip y se continua por id_venta.
     '''
 
     try:
         # 1. contar ventas
-        count_query = text("""
+        total_result = contar_segun_modo(db, conteo, "ventas", """
             SELECT COUNT(id_venta) AS total
             FROM ventas
         """)
-        total_result = db.execute(count_query).scalar()
 
         # 2. Consultar ventas paginadas
-        data_query = text("""
-            SELECT 
-                ventas.id_usuario,
-                usuarios.nombre AS nombre_usuario, 
-                ventas.tipo_pago,
-                metodo_pago.nombre AS metodo_pago,
-                ventas.id_venta, 
-                ventas.fecha_hora,
-                COALESCE((
-                    SELECT SUM((precio_venta - valor_descuento) * cantidad) 
-                    FROM detalle_huevos 
-                    WHERE detalle_huevos.id_venta = ventas.id_venta
-                ), 0)
-                +
-                COALESCE((
-                    SELECT SUM((precio_venta - valor_descuento) * cantidad)
-                    FROM detalle_salvamento 
-                    WHERE detalle_salvamento.id_venta = ventas.id_venta
-                ), 0) AS total,
-                ventas.estado
-            FROM ventas
-            LEFT JOIN usuarios ON usuarios.id_usuario = ventas.id_usuario
-            LEFT JOIN metodo_pago ON metodo_pago.id_tipo = ventas.tipo_pago
-            ORDER BY id_venta
-            LIMIT :limit OFFSET :skip              
-        """)
+        data_query = text(consulta_ventas([_filtro_cursor(despues_de)], paginar=True))
 
-        result = db.execute(data_query, {"skip": skip, "limit": limit}).mappings().all()
+        if despues_de:
+            skip = 0
+        result = db.execute(data_query, {
+            "skip": skip,
+            "limit": limit + 1,
+            **_parametros_cursor(despues_de)
+        }).mappings().all()
+        ventas, siguiente = recortar_pagina([dict(row) for row in result], limit, CLAVE_VENTAS)
 
         # 3. Retornar resultados
         return {
-            "cant_ventas": total_result or 0,
-            "ventas": [dict(row) for row in result]
+            "cant_ventas": total_result,
+            "ventas": ventas,
+            "siguiente": siguiente
         }
     
     except SQLAlchemyError as e:
@@ -201,62 +362,40 @@ def get_all_ventas_pag(db: Session, skip: int = 0, limit: int = 10):
         raise Exception ("Error de base de datos al obtener ventas")
     
     
-def get_ventas_by_date_range_pag(db: Session, fecha_inicio: str, fecha_fin: str, skip: int = 0, limit: int = 10):
+def get_ventas_by_date_range_pag(db: Session, fecha_inicio: str, fecha_fin: str, skip: int = 0, limit: int = 10, despues_de: Optional[dict] = None, conteo: str = EXACTO):
     
     '''
     Obtiene las ventas por rango de fechas y paginacion
+    Con despues_de (posicion de un cursor) se ignora skip y se continua por (fecha_hora, id_venta).
     '''
 
     try:
         # 1. contar ventas
-        count_query = text("""
+        rango = _rango_fechas(fecha_inicio, fecha_fin)
+        total_result = contar_segun_modo(db, conteo, "ventas", f"""
             SELECT COUNT(id_venta) AS total
             FROM ventas
-            WHERE DATE(fecha_hora) BETWEEN :fecha_inicio AND :fecha_fin
-        """)
-        total_result = db.execute(count_query, {"fecha_inicio": fecha_inicio, "fecha_fin": fecha_fin}).scalar()
+            WHERE {FILTRO_RANGO_FECHAS}
+        """, rango, filtrado=True)
         
         # 2. Consultar ventas paginadas
-        data_query = text("""
-            SELECT 
-                ventas.id_usuario,
-                usuarios.nombre AS nombre_usuario, 
-                ventas.tipo_pago,
-                metodo_pago.nombre AS metodo_pago,
-                ventas.id_venta, 
-                ventas.fecha_hora,
-                COALESCE((
-                    SELECT SUM((precio_venta - valor_descuento) * cantidad) 
-                    FROM detalle_huevos 
-                    WHERE detalle_huevos.id_venta = ventas.id_venta
-                ), 0)
-                +
-                COALESCE((
-                    SELECT SUM((precio_venta - valor_descuento) * cantidad)
-                    FROM detalle_salvamento 
-                    WHERE detalle_salvamento.id_venta = ventas.id_venta
-                ), 0) AS total,
-                ventas.estado
-            FROM ventas
-            LEFT JOIN usuarios ON usuarios.id_usuario = ventas.id_usuario
-            LEFT JOIN metodo_pago ON metodo_pago.id_tipo = ventas.tipo_pago
-            WHERE DATE(fecha_hora) BETWEEN :fecha_inicio AND :fecha_fin
-            ORDER BY fecha_hora ASC, id_venta
-            LIMIT :limit OFFSET :skip
-        """)
-        
+        data_query = text(consulta_ventas([FILTRO_RANGO_FECHAS, _filtro_cursor(despues_de)], orden=ORDEN_FECHA, paginar=True))
         
+        if despues_de:
+            skip = 0
         result = db.execute(data_query, {
-            "fecha_inicio": fecha_inicio,
-            "fecha_fin": fecha_fin,
+            **rango,
             "skip": skip,
-            "limit": limit
+            "limit": limit + 1,
+            **_parametros_cursor(despues_de)
         }).mappings().all()
+        ventas, siguiente = recortar_pagina([dict(row) for row in result], limit, CLAVE_VENTAS_FECHA)
         
         # 3. Retornar resultados
         return {
-            "cant_ventas": total_result or 0,
-            "ventas": [dict(row) for row in result]
+            "cant_ventas": total_result,
+            "ventas": ventas,
+            "siguiente": siguiente
         }
         
     except SQLAlchemyError as e:
@@ -264,56 +403,39 @@ def get_ventas_by_date_range_pag(db: Session, fecha_inicio: str, fecha_fin: str,
         raise Exception("Error de base de datos al obtener la venta")
 
 
-def get_ventas_by_usuario_pag(db: Session, usuario_id: int, skip: int = 0, limit: int = 10):
+def get_ventas_by_usuario_pag(db: Session, usuario_id: int, skip: int = 0, limit: int = 10, despues_de: Optional[dict] = None, conteo: str = EXACTO):
 
     '''
     Obtiene las ventas que ha registrado un usuario con paginacion.
+    Con despues_de (posicion de un cursor) se ignora skip y se continua por id_venta.
     '''
 
     try:
         # 1. contar ventas
-        count_query = text("""
+        total_result = contar_segun_modo(db, conteo, "ventas", """
             SELECT COUNT(id_venta) AS total
             FROM ventas
             WHERE id_usuario = :usuario_id
-        """)
-        total_result = db.execute(count_query, {"usuario_id": usuario_id}).scalar()
+        """, {"usuario_id": usuario_id}, filtrado=True)
 
         # 2. Consultar ventas paginadas
-        data_query = text("""
-            SELECT 
-                ventas.id_usuario,
-                usuarios.nombre AS nombre_usuario, 
-                ventas.tipo_pago,
-                metodo_pago.nombre AS metodo_pago,
-                ventas.id_venta, 
-                ventas.fecha_hora,
-                COALESCE((
-                    SELECT SUM((precio_venta - valor_descuento) * cantidad) 
-                    FROM detalle_huevos 
-                    WHERE detalle_huevos.id_venta = ventas.id_venta
-                ), 0)
-                +
-                COALESCE((
-                    SELECT SUM((precio_venta - valor_descuento) * cantidad)
-                    FROM detalle_salvamento 
-                    WHERE detalle_salvamento.id_venta = ventas.id_venta
-                ), 0) AS total,
-                ventas.estado
-            FROM ventas
-            LEFT JOIN usuarios ON usuarios.id_usuario = ventas.id_usuario
-            LEFT JOIN metodo_pago ON metodo_pago.id_tipo = ventas.tipo_pago
-            WHERE id_usuario = :usuario_id
-            ORDER BY id_venta
-            LIMIT :limit OFFSET :skip              
-        """)
+        data_query = text(consulta_ventas(["ventas.id_usuario = :usuario_id", _filtro_cursor(despues_de)], paginar=True))
 
-        result = db.execute(data_query, {"usuario_id": usuario_id, "skip": skip, "limit": limit}).mappings().all()
+        if despues_de:
+            skip = 0
+        result = db.execute(data_query, {
+            "usuario_id": usuario_id,
+            "skip": skip,
+            "limit": limit + 1,
+            **_parametros_cursor(despues_de)
+        }).mappings().all()
+        ventas, siguiente = recortar_pagina([dict(row) for row in result], limit, CLAVE_VENTAS)
 
         # 3. Retornar resultados
         return {
-            "cant_ventas": total_result or 0,
-            "ventas": [dict(row) for row in result]
+            "cant_ventas": total_result,
+            "ventas": ventas,
+            "siguiente": siguiente
         }
     
     except SQLAlchemyError as e:
@@ -321,55 +443,38 @@ def get_ventas_by_usuario_pag(db: Session, usuario_id: int, skip: int = 0, limit
         raise Exception ("Error de base de datos al obtener ventas")    
    
     
-def get_ventas_by_tipo_pago_pag(db: Session, tipo_id: int, skip: int = 0, limit: int = 10):
+def get_ventas_by_tipo_pago_pag(db: Session, tipo_id: int, skip: int = 0, limit: int = 10, despues_de: Optional[dict] = None, conteo: str = EXACTO):
 
     '''
     Obtiene las ventas que ha registrado un usuario con paginacion.
+    Con despues_de (posicion de un cursor) se ignora skip y se continua por id_venta.
     '''
 
     try:
         # 1. contar ventas
-        count_query = text("""
+        total_result = contar_segun_modo(db, conteo, "ventas", """
             SELECT COUNT(id_venta) AS total
             FROM ventas
             WHERE tipo_pago = :tipo_id
-        """)
-        total_result = db.execute(count_query, {"tipo_id": tipo_id}).scalar()
+        """, {"tipo_id": tipo_id}, filtrado=True)
 
         # 2. Consultar ventas paginadas
-        data_query = text("""
-            SELECT 
-                ventas.id_usuario,
-                usuarios.nombre AS nombre_usuario, 
-                ventas.tipo_pago,
-                metodo_pago.nombre AS metodo_pago,
-                ventas.id_venta, 
-                ventas.fecha_hora,
-                COALESCE((
-                    SELECT SUM((precio_venta - valor_descuento) * cantidad) 
-                    FROM detalle_huevos 
-                    WHERE detalle_huevos.id_venta = ventas.id_venta
-                ), 0)
-                +
-                COALESCE((
-                    SELECT SUM((precio_venta - valor_descuento) * cantidad)
-                    FROM detalle_salvamento 
-                    WHERE detalle_salvamento.id_venta = ventas.id_venta
-                ), 0) AS total,
-                ventas.estado
-            FROM ventas
-            LEFT JOIN usuarios ON usuarios.id_usuario = ventas.id_usuario
-            LEFT JOIN metodo_pago ON metodo_pago.id_tipo = ventas.tipo_pago
-            WHERE tipo_pago = :tipo_id
-            ORDER BY id_venta
-            LIMIT :limit OFFSET :skip              
-        """)
-        result = db.execute(data_query, {"tipo_id": tipo_id, "skip": skip, "limit": limit}).mappings().all()
+        data_query = text(consulta_ventas(["ventas.tipo_pago = :tipo_id", _filtro_cursor(despues_de)], paginar=True))
+        if despues_de:
+            skip = 0
+        result = db.execute(data_query, {
+            "tipo_id": tipo_id,
+            "skip": skip,
+            "limit": limit + 1,
+            **_parametros_cursor(despues_de)
+        }).mappings().all()
+        ventas, siguiente = recortar_pagina([dict(row) for row in result], limit, CLAVE_VENTAS)
         
         # 3. Retornar resultados
         return {
-            "cant_ventas": total_result or 0,
-            "ventas": [dict(row) for row in result]
+            "cant_ventas": total_result,
+            "ventas": ventas,
+            "siguiente": siguiente
         }
         
     except SQLAlchemyError as e:
@@ -377,33 +482,44 @@ def get_ventas_by_tipo_pago_pag(db: Session, tipo_id: int, skip: int = 0, limit:
         raise Exception ("Error de base de datos al obtener ventas")    
 
     
+def get_resumen_ventas(db: Session, agrupacion: str, fecha_inicio: str, fecha_fin: str,
+                       tipo_pago: Optional[int] = None, id_usuario: Optional[int] = None):
+    '''
+    Cantidad de ventas e importes por dia, semana o mes, leidos de ventas_resumen_diario
+    (sin recorrer ventas ni detalles).
+    '''
+    try:
+        periodo = inicio_periodo(db, "dia", agrupacion)
+        filtros = ["dia >= :fecha_inicio", "dia <= :fecha_fin"]
+        params = {"fecha_inicio": date.fromisoformat(fecha_inicio), "fecha_fin": date.fromisoformat(fecha_fin)}
+        if tipo_pago is not None:
+            filtros.append("tipo_pago = :tipo_pago")
+            params["tipo_pago"] = tipo_pago
+        if id_usuario is not None:
+            filtros.append("id_usuario = :id_usuario")
+            params["id_usuario"] = id_usuario
+
+        query = text(f"""
+            SELECT 
+                {periodo} AS periodo,
+                SUM(cantidad_ventas) AS cantidad_ventas,
+                SUM(bruto) AS bruto,
+                SUM(descuento) AS descuento,
+                SUM(neto) AS neto
+            FROM ventas_resumen_diario
+            WHERE {" AND ".join(filtros)}
+            GROUP BY {periodo}
+            ORDER BY periodo
+        """)
+        return db.execute(query, params).mappings().all()
+    except SQLAlchemyError as e:
+        logger.error(f"Error al obtener el resumen de ventas: {e}")
+        raise Exception("Error de base de datos al obtener el resumen de ventas")
+
+
 def get_venta_by_id(db: Session, venta_id: int):
     try:
-        query = text("""
-                SELECT 
-                    ventas.id_usuario,
-                    usuarios.nombre AS nombre_usuario, 
-                    ventas.tipo_pago,
-                    metodo_pago.nombre AS metodo_pago,
-                    ventas.id_venta, 
-                    ventas.fecha_hora,
-                    COALESCE((
-                        SELECT SUM((precio_venta - valor_descuento) * cantidad) 
-                        FROM detalle_huevos 
-                        WHERE detalle_huevos.id_venta = ventas.id_venta
-                    ), 0)
-                    +
-                    COALESCE((
-                        SELECT SUM((precio_venta - valor_descuento) * cantidad)
-                        FROM detalle_salvamento 
-                        WHERE detalle_salvamento.id_venta = ventas.id_venta
-                    ), 0) AS total,
-                    ventas.estado
-                FROM ventas
-                LEFT JOIN usuarios ON usuarios.id_usuario = ventas.id_usuario
-                LEFT JOIN metodo_pago ON metodo_pago.id_tipo = ventas.tipo_pago
-                WHERE ventas.id_venta = :venta_id
-                """)
+        query = text(consulta_ventas(["ventas.id_venta = :venta_id"]))
         result = db.execute(query, {"venta_id": venta_id}).mappings().first()
         return result
     except SQLAlchemyError as e:
@@ -428,21 +544,17 @@ def update_venta_by_id(db: Session, venta_id: int, venta: VentaUpdate) -> Option
         venta_data["id_venta"] = venta_id
         tipo_pago = venta_data["tipo_pago"]
         
-        consulta_metodo_pago = db.execute(text("""
-            SELECT estado 
-            FROM metodo_pago 
-            WHERE id_tipo = :tipo_pago"""), {"tipo_pago": tipo_pago}).mappings().first()
-        
-        # si metodo_pago no existe
-        if consulta_metodo_pago is None:
-            return False
-        
-        # si metodo pago es inactivo
-        if not consulta_metodo_pago["estado"]:
+        # si metodo_pago no existe o es inactivo
+        if not metodo_pago_activo(db, tipo_pago):
             return False
 
+        # el tipo de pago es parte de la clave del resumen diario: se mueve el aporte de la venta
+        mover_venta_resumen(db, venta_id, -1)
         result = db.execute(sentencia, venta_data)
+        mover_venta_resumen(db, venta_id, 1)
         db.commit()
+        # cambia el tipo de pago: afecta el conteo de by-tipo_pago
+        invalidar_conteos("ventas")
 
         # devuelve true si la operacion afecto mas de 0 registros en la bd
         return result.rowcount > 0
@@ -490,6 +602,9 @@ def cambiar_venta_estado(db: Session, id_venta: int, nuevo_estado: bool) -> bool
             if result.rowcount == 0:
                 logger.warning(f"No se pudo actualizar el estado de la venta {id_venta}.")
                 return False
+
+            # deja de contar como venta activa; los importes se restan al borrar los detalles
+            sumar_resumen(db, id_venta, ventas=-1)
             
             success_detalle_huevos = delete_all_detalle_huevos_by_id_venta(db, id_venta)
             success_detalle_salvamento = delete_all_detalle_salvamento_by_id_venta(db, id_venta)
@@ -508,6 +623,49 @@ def cambiar_venta_estado(db: Session, id_venta: int, nuevo_estado: bool) -> bool
         raise
     
     
+def cancelar_ventas(db: Session, ids_venta: List[int]) -> Dict[str, List[int]]:
+    '''
+    Cancela varias ventas en una sola transaccion (por ejemplo, las anulaciones del cierre del dia):
+    marca las activas como canceladas, devuelve las existencias y borra sus detalles
+    con sentencias por conjunto. Las ya canceladas o inexistentes se informan sin cambios.
+    '''
+    ids = bindparam("ids", expanding=True)
+    try:
+        filas = db.execute(text("""
+            SELECT id_venta, estado
+            FROM ventas
+            WHERE id_venta IN :ids
+        """).bindparams(ids), {"ids": ids_venta}).mappings().all()
+        estados = {fila["id_venta"]: bool(fila["estado"]) for fila in filas}
+        activas = [id_venta for id_venta in ids_venta if estados.get(id_venta)]
+
+        if activas:
+            result = db.execute(text("""
+                UPDATE ventas
+                SET estado = 0
+                WHERE id_venta IN :ids AND estado = 1
+            """).bindparams(ids), {"ids": activas})
+            if result.rowcount != len(activas):
+                # Otra transaccion cancelo alguna de las ventas entre la consulta y el UPDATE
+                db.rollback()
+                raise HTTPException(status_code=409, detail="Algunas ventas cambiaron de estado, intente de nuevo")
+
+            restar_ventas_resumen(db, activas)
+            delete_all_detalle_huevos_by_ids_venta(db, activas)
+            delete_all_detalle_salvamento_by_ids_venta(db, activas)
+        db.commit()
+
+        return {
+            "canceladas": activas,
+            "ya_canceladas": [id_venta for id_venta in ids_venta if estados.get(id_venta) is False],
+            "no_encontradas": [id_venta for id_venta in ids_venta if id_venta not in estados],
+        }
+    except SQLAlchemyError as e:
+        db.rollback()
+        logger.error(f"Error al cancelar las ventas {ids_venta}: {e}")
+        raise
+
+
 def delete_venta_by_id(db: Session, venta_id: int) -> Optional[bool]:
     '''
     Solo se puede eliminar despues de cancelada
@@ -559,6 +717,7 @@ def delete_venta_by_id(db: Session, venta_id: int) -> Optional[bool]:
             return False
 
         db.commit()
+        invalidar_conteos("ventas")
         return True
     except SQLAlchemyError as e:
         db.rollback()
@@ -566,46 +725,71 @@ def delete_venta_by_id(db: Session, venta_id: int) -> Optional[bool]:
         return False
        
 
+def _consulta_detalles(db: Session, filtro_id_venta: str):
+    '''
+    UNION ALL de los detalles de huevos y de salvamento con su descripcion;
+    filtro_id_venta se aplica a id_venta en ambas tablas (por ejemplo "= :venta_id").
+    '''
+    descripcion_huevo = concat(db, "'Huevo '", "tipo_huevos.color", "' '", "tipo_huevos.tamaño", "' - '", "stock.unidad_medida")
+    descripcion_gallina = concat(db, "'Gallina '", "tipo_gallinas.raza")
+    return text(f"""
+        SELECT 
+            'huevos' AS tipo, 
+            detalle_huevos.id_detalle, 
+            detalle_huevos.id_producto, 
+            {descripcion_huevo} AS descripcion, 
+            detalle_huevos.cantidad, 
+            detalle_huevos.id_venta, 
+            detalle_huevos.valor_descuento, 
+            detalle_huevos.precio_venta
+        FROM detalle_huevos
+        INNER JOIN stock 
+            ON detalle_huevos.id_producto = stock.id_producto
+        INNER JOIN tipo_huevos 
+            ON stock.tipo = tipo_huevos.id_tipo_huevo
+        WHERE detalle_huevos.id_venta {filtro_id_venta}
+
+        UNION ALL
+
+        SELECT 
+            'salvamento' AS tipo, 
+            detalle_salvamento.id_detalle, 
+            detalle_salvamento.id_producto, 
+            {descripcion_gallina} AS descripcion, 
+            detalle_salvamento.cantidad, 
+            detalle_salvamento.id_venta, 
+            detalle_salvamento.valor_descuento, 
+            detalle_salvamento.precio_venta
+        FROM detalle_salvamento
+        INNER JOIN salvamento
+            ON detalle_salvamento.id_producto = salvamento.id_salvamento
+        INNER JOIN tipo_gallinas
+            ON salvamento.id_tipo_gallina = tipo_gallinas.id_tipo_gallinas
+        WHERE detalle_salvamento.id_venta {filtro_id_venta}
+    """)
+
+
 def get_all_detalle_by_id_venta(db: Session, venta_id: int):
     try:
-        sentencia = text("""
-            SELECT 
-                'huevos' AS tipo, 
-                detalle_huevos.id_detalle, 
-                detalle_huevos.id_producto, 
-                CONCAT('Huevo ', tipo_huevos.color, ' ', tipo_huevos.tamaño, ' - ', stock.unidad_medida) COLLATE utf8mb4_general_ci AS descripcion, 
-                detalle_huevos.cantidad, 
-                detalle_huevos.id_venta, 
-                detalle_huevos.valor_descuento, 
-                detalle_huevos.precio_venta
-            FROM detalle_huevos
-            INNER JOIN stock 
-                ON detalle_huevos.id_producto = stock.id_producto
-            INNER JOIN tipo_huevos 
-                ON stock.tipo = tipo_huevos.id_tipo_huevo
-            WHERE id_venta = :venta_id
-
-            UNION ALL
-
-            SELECT 
-                'salvamento' AS tipo, 
-                detalle_salvamento.id_detalle, 
-                detalle_salvamento.id_producto, 
-                CONCAT('Gallina ', tipo_gallinas.raza) COLLATE utf8mb4_general_ci AS descripcion, 
-                detalle_salvamento.cantidad, 
-                detalle_salvamento.id_venta, 
-                detalle_salvamento.valor_descuento, 
-                detalle_salvamento.precio_venta
-            FROM detalle_salvamento
-            INNER JOIN salvamento
-                ON detalle_salvamento.id_producto = salvamento.id_salvamento
-            INNER JOIN tipo_gallinas
-                ON salvamento.id_tipo_gallina = tipo_gallinas.id_tipo_gallinas
-            WHERE id_venta = :venta_id;           
-        """)
-    
+        sentencia = _consulta_detalles(db, "= :venta_id")
         result = db.execute(sentencia, {"venta_id": venta_id}).mappings().all()
         return result
     except SQLAlchemyError as e:
         logger.error(f"Error al obtener detalles de la venta: {e}")
         raise Exception("Error de base de datos al obtener detalles de la venta")
+
+
+def get_detalles_by_ids_venta(db: Session, ids_venta: List[int]) -> Dict[int, list]:
+    '''
+    Detalles de varias ventas con una sola consulta (un IN por tabla),
+    agrupados por id_venta. Las ventas sin detalles quedan con lista vacia.
+    '''
+    try:
+        sentencia = _consulta_detalles(db, "IN :ids").bindparams(bindparam("ids", expanding=True))
+        agrupados = {id_venta: [] for id_venta in ids_venta}
+        for fila in db.execute(sentencia, {"ids": list(agrupados)}).mappings():
+            agrupados[fila["id_venta"]].append(dict(fila))
+        return agrupados
+    except SQLAlchemyError as e:
+        logger.error(f"Error al obtener detalles de las ventas: {e}")
+        raise Exception("Error de base de datos al obtener detalles de las ventas")
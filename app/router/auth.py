@@ -1,8 +1,11 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from typing import Annotated
 from fastapi import APIRouter, Depends,HTTPException
 from sqlalchemy.orm import Session
-from app.router.dependencies import authenticate_user
+from app.router.dependencies import authenticate_user, build_token_claims
 from app.schemas.auth import ResponseLoggin
+from core.config import settings
 from core.security import create_access_token
 from core.database import get_db
 from fastapi.security import OAuth2PasswordRequestForm
@@ -10,12 +13,33 @@ from fastapi.security import OAuth2PasswordRequestForm
 
 router = APIRouter()
 
+# La consulta del usuario y bcrypt son bloqueantes: se ejecutan en un pool de
+# hilos acotado para no detener el event loop, y el semaforo limita cuantos
+# inicios de sesion se procesan a la vez.
+_login_executor = ThreadPoolExecutor(max_workers=settings.LOGIN_MAX_CONCURRENCY, thread_name_prefix="login")
+_login_semaphore = asyncio.Semaphore(settings.LOGIN_MAX_CONCURRENCY)
+
 @router.post("/token", response_model=ResponseLoggin)
 async def login_for_access_token(
     form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
     db: Session = Depends(get_db)
 ):
-    user = authenticate_user(form_data.username, form_data.password, db)
+    try:
+        await asyncio.wait_for(_login_semaphore.acquire(), timeout=settings.LOGIN_QUEUE_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise HTTPException(
+            status_code=503,
+            detail="Demasiados inicios de sesion simultaneos, intente de nuevo",
+            headers={"Retry-After": "1"},
+        )
+    try:
+        loop = asyncio.get_running_loop()
+        user = await loop.run_in_executor(
+            _login_executor, authenticate_user, form_data.username, form_data.password, db
+        )
+    finally:
+        _login_semaphore.release()
+
     if not user:
         raise HTTPException(
             status_code=401,
@@ -23,11 +47,11 @@ async def login_for_access_token(
             headers={"WWW-Authenticate": "Bearer"},
         )
         
-    data={"sub": str(user.id_usuario), "rol":user.id_rol}
+    data = build_token_claims(user)
     
     access_token = create_access_token(data)
 
     return ResponseLoggin(
         user=user,
         access_token=access_token
-    )
\ No newline at end of file
+    )
@@ -1,21 +1,77 @@
+from typing import Optional
 from app.crud.users import get_user_by_email_for_login, get_user_by_id
+from app.crud.permisos import ACCIONES, get_user_with_permission, verify_permissions
+from app.schemas.auth import TokenPrincipal
 from fastapi import Depends, HTTPException
 from sqlalchemy.orm import Session
-from core.security import verify_password, verify_token
+from core.config import settings
+from core.security import verify_password, decode_token, token_revocado
 from core.database import get_db
 from fastapi.security import OAuth2PasswordBearer
 
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/access/token")
 
+def build_token_claims(user) -> dict:
+    '''
+    Claims que se incluyen en el token de acceso para poder reconstruir
+    el usuario sin consultar la base de datos.
+    '''
+    return {
+        "sub": str(user.id_usuario),
+        "rol": user.id_rol,
+        "email": user.email,
+        "estado": bool(user.estado),
+        "pv": settings.jwt_principal_version,
+    }
+
+
+def principal_from_token(payload: dict) -> Optional[TokenPrincipal]:
+    '''
+    Devuelve el usuario descrito por los claims del token o None si los claims
+    no son confiables (token antiguo, otra version o revocado).
+    '''
+    if payload.get("pv") != settings.jwt_principal_version:
+        return None
+    if any(payload.get(claim) is None for claim in ("sub", "rol", "email", "estado")):
+        return None
+    if token_revocado(payload):
+        return None
+    return TokenPrincipal(
+        id_usuario=int(payload["sub"]),
+        id_rol=payload["rol"],
+        email=payload["email"],
+        estado=payload["estado"],
+    )
+
+
+def _decode_payload(token: str) -> dict:
+    payload = decode_token(token)
+    if payload is None or payload.get("sub") is None:
+        raise HTTPException(status_code=401, detail="Token Invalido")
+    return payload
+
+
+def _stateless_principal(payload: dict) -> Optional[TokenPrincipal]:
+    if not settings.jwt_stateless:
+        return None
+    principal = principal_from_token(payload)
+    if principal is not None and not principal.estado:
+        raise HTTPException(status_code=403, detail="Usuario inactivo. No autorizado")
+    return principal
+
+
 def get_current_user(
         token: str = Depends(oauth2_scheme),
         db: Session = Depends(get_db)
 ):
-    user = verify_token(token)
-    if user is None:
-        raise HTTPException(status_code=401, detail="Token Invalido")
-    user_db = get_user_by_id(db, user)
+    payload = _decode_payload(token)
+
+    principal = _stateless_principal(payload)
+    if principal is not None:
+        return principal
+
+    user_db = get_user_by_id(db, int(payload["sub"]))
     if user_db is None:
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
     if not user_db.estado:
@@ -23,10 +79,53 @@ def get_current_user(
     return user_db
 
 
+def require_permission(modulo: int, accion: str):
+    '''
+    Crea una dependencia que autentica al usuario y verifica que su rol
+    tenga permiso para `accion` sobre `modulo`, devolviendo el usuario.
+
+    En modo JWT_STATELESS se resuelve con los claims del token y la matriz de
+    permisos en memoria; en otro caso con una unica consulta que trae usuario,
+    estado del rol y permisos del modulo.
+
+    Example:
+        ```python
+        @router.get("/all-ventas")
+        def get_all_ventas(user_token: UserOut = Depends(require_permission(5, 'seleccionar'))):
+            ...
+        ```
+    '''
+    if accion not in ACCIONES:
+        raise ValueError(f"Accion de permiso desconocida: {accion}")
+
+    def dependency(
+            token: str = Depends(oauth2_scheme),
+            db: Session = Depends(get_db)
+    ):
+        payload = _decode_payload(token)
+
+        principal = _stateless_principal(payload)
+        if principal is not None:
+            if not verify_permissions(db, principal.id_rol, modulo, accion):
+                raise HTTPException(status_code=401, detail="Usuario no autorizado")
+            return principal
+
+        user_db = get_user_with_permission(db, int(payload["sub"]), modulo)
+        if user_db is None:
+            raise HTTPException(status_code=404, detail="Usuario no encontrado")
+        if not user_db.estado:
+            raise HTTPException(status_code=403, detail="Usuario inactivo. No autorizado")
+        if not user_db.estado_rol or not user_db[accion]:
+            raise HTTPException(status_code=401, detail="Usuario no autorizado")
+        return user_db
+
+    return dependency
+
+
 def authenticate_user(username: str, password: str, db: Session):
     user = get_user_by_email_for_login(db, username)
     if not user:
         return False
     if not verify_password(password, user.pass_hash):
         return False
-    return user
\ No newline at end of file
+    return user
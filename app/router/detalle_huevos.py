@@ -1,31 +1,29 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import List, Literal, Optional
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import SQLAlchemyError
-from app.crud.permisos import verify_permissions
-from app.router.dependencies import get_current_user
+from app.router.dependencies import require_permission
 from core.database import get_db
-from app.schemas.detalle_huevos import DetalleHuevosCreate, DetalleHuevosOut, DetalleHuevosUpdate, StockProductosOut
+from app.schemas.detalle_huevos import DetalleHuevosCreate, DetalleHuevosOut, DetalleHuevosUpdate, StockProductosOut, DisponibilidadHuevosOut
+from app.schemas.movimientos_stock import ConciliacionHuevosOut, ExistenciasAFechaOut
 from app.crud import detalle_huevos as crud_detalles_huevos
+from app.crud import movimientos_stock as crud_movimientos
+from app.crud import disponibilidad_huevos as crud_disponibilidad
 
 
 from app.schemas.users import UserOut
 
 router = APIRouter()
+modulo = 7
 
 @router.post("/crear", status_code=status.HTTP_201_CREATED)
 def create_detalle_huevos(
     detalle_huevos: DetalleHuevosCreate,
     db: Session = Depends(get_db),
-    user_token: UserOut = Depends(get_current_user)
+    user_token: UserOut = Depends(require_permission(modulo, 'insertar'))
 ):
     try:
-        id_rol = user_token.id_rol
-        modulo=7
-        
-        if not verify_permissions(db, id_rol, modulo, 'insertar'):
-            raise HTTPException(status_code=401, detail="usuario no autorizado")
-
         nuevo_detalle = crud_detalles_huevos.create_detalle_huevos(db, detalle_huevos)
         return nuevo_detalle
     except SQLAlchemyError as e:
@@ -37,14 +35,9 @@ def update_detalle_huevos(
     detalle_id: int,
     detalle_huevos: DetalleHuevosUpdate,
     db: Session = Depends(get_db),
-    user_token: UserOut = Depends(get_current_user)
+    user_token: UserOut = Depends(require_permission(modulo, 'actualizar'))
 ):
     try:
-        id_rol = user_token.id_rol
-        modulo=7
-        if not verify_permissions(db, id_rol, modulo, 'actualizar'):
-            raise HTTPException(status_code=401, detail="usuario no autorizado")
-        
         success = crud_detalles_huevos.update_detalle_huevos_by_id(db, detalle_id, detalle_huevos)
         if not success:
             raise HTTPException(status_code=400, detail="No se pudo actualizar el detalle de huevos")
@@ -57,14 +50,9 @@ def update_detalle_huevos(
 def get_detalle_huevos(
     id_venta: int,
     db: Session = Depends(get_db),
-    user_token: UserOut = Depends(get_current_user)
+    user_token: UserOut = Depends(require_permission(modulo, 'seleccionar'))
 ):
     try:
-        id_rol=user_token.id_rol
-        modulo=7
-        if not verify_permissions(db, id_rol, modulo, 'seleccionar'):
-            raise HTTPException(status_code=401, detail="usuario no autorizado")
-
         detalle_huevos = crud_detalles_huevos.get_detalle_huevos_by_id_venta(db, id_venta)
         if not detalle_huevos:
             raise HTTPException(status_code=404, detail="Detalle de huevos no encontrado")
@@ -76,14 +64,9 @@ def get_detalle_huevos(
 def get_detalle_huevos(
     id_detalle: int,
     db: Session = Depends(get_db),
-    user_token: UserOut = Depends(get_current_user)
+    user_token: UserOut = Depends(require_permission(modulo, 'seleccionar'))
 ):
     try:
-        id_rol = user_token.id_rol   
-        modulo = 7  
-        if not verify_permissions(db, id_rol, modulo, 'seleccionar'):
-            raise HTTPException(status_code=401, detail="Usuario no autorizado para ver detalle salvamento")
-
         detalle_huevos = crud_detalles_huevos.get_detalle_huevos_by_id(db, id_detalle)
         if not detalle_huevos:
             raise HTTPException(status_code=404, detail="Detalle huevos no encontrado")
@@ -94,14 +77,9 @@ def get_detalle_huevos(
 @router.get("/all-products-stock", response_model=list[StockProductosOut])
 def get_detalle_huevos(
     db: Session = Depends(get_db),
-    user_token: UserOut = Depends(get_current_user)
+    user_token: UserOut = Depends(require_permission(modulo, 'seleccionar'))
 ):
     try:
-        id_rol = user_token.id_rol   
-        modulo = 7  
-        if not verify_permissions(db, id_rol, modulo, 'seleccionar'):
-            raise HTTPException(status_code=401, detail="Usuario no autorizado para todos los productos")
-
         detalle_huevos = crud_detalles_huevos.get_all_products_stock(db)
         if not detalle_huevos:
             raise HTTPException(status_code=404, detail="Detalle de huevos no encontrado")
@@ -109,21 +87,56 @@ def get_detalle_huevos(
     except SQLAlchemyError as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/disponibilidad", response_model=List[DisponibilidadHuevosOut])
+def get_disponibilidad_huevos(
+    unidad_medida: Literal["unidad", "docena", "medio_panal", "panal"] = Query("unidad", description="empaque en que se expresan los totales"),
+    tipo: Optional[int] = Query(None, description="id_tipo_huevo (por defecto, todos)"),
+    db: Session = Depends(get_db),
+    user_token: UserOut = Depends(require_permission(modulo, 'seleccionar'))
+):
+    '''
+    Huevos disponibles por tipo, sumando todos los empaques del stock, y cuantos
+    empaques de unidad_medida completan. Se lee de disponibilidad_huevos (una fila por tipo).
+    '''
+    try:
+        return crud_disponibilidad.get_disponibilidad(db, unidad_medida, tipo)
+    except SQLAlchemyError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/stock-a-fecha", response_model=ExistenciasAFechaOut)
+def get_stock_a_fecha(
+    fecha_hora: Optional[datetime] = Query(None, description="momento a consultar (por defecto, ahora)"),
+    db: Session = Depends(get_db),
+    user_token: UserOut = Depends(require_permission(modulo, 'seleccionar'))
+):
+    try:
+        return crud_movimientos.existencias_a_fecha(db, "detalle_huevos", fecha_hora or datetime.now())
+    except SQLAlchemyError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/conciliacion-stock", response_model=ConciliacionHuevosOut)
+def get_conciliacion_stock(
+    db: Session = Depends(get_db),
+    user_token: UserOut = Depends(require_permission(modulo, 'seleccionar'))
+):
+    try:
+        return {
+            **crud_movimientos.conciliar_existencias(db, "detalle_huevos"),
+            "disponibilidad": crud_disponibilidad.diferencias_disponibilidad(db),
+        }
+    except SQLAlchemyError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.delete("/by-id/{detalle_id}")
 def delete_detalle_huevos(
     detalle_id: int,
     db: Session = Depends(get_db),
-    user_token: UserOut = Depends(get_current_user)
+    user_token: UserOut = Depends(require_permission(modulo, 'actualizar'))
 ):
     try:
-        id_rol = user_token.id_rol
-        modulo=7
-        if not verify_permissions(db, id_rol, modulo, 'actualizar'):
-            raise HTTPException(status_code=401, detail="usuario no autorizado")
-
         success = crud_detalles_huevos.delete_detalle_huevos_by_id(db, detalle_id)
         if not success:
-            raise HTTPException(status_code=400, detail="No se pudo eliminar el detalle de huevos")
+            raise HTTPException(status_code=404, detail="Detalle de huevos no encontrado")
         return {"message": "Detalle de huevos eliminado correctamente"}
     except SQLAlchemyError as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -1,30 +1,30 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session
-from app.crud.permisos import verify_permissions
-from app.router.dependencies import get_current_user
+from app.router.dependencies import require_permission
 from core.database import get_db
 from app.schemas.detalle_salvamento import CreateDetalleSalvamento, DetalleSalvamentoOut, DetalleSalvamentoUpdate, salvamentoProductosOut
 from app.schemas.users import UserOut
+from app.schemas.movimientos_stock import ConciliacionExistenciasOut, ExistenciasAFechaOut
 from app.crud import detalle_salvamento as crud_detalle_salvamento
+from app.crud import movimientos_stock as crud_movimientos
 from sqlalchemy.exc import SQLAlchemyError
-from typing import List
+from typing import List, Optional
+from datetime import datetime
 
 router = APIRouter()
+modulo = 9
 
 @router.post("/crear", status_code=status.HTTP_201_CREATED)
 def create_detalle_salvamento(
     detalle_salvamento: CreateDetalleSalvamento, 
     db: Session = Depends(get_db), 
-    user_token: UserOut = Depends(get_current_user)
+    user_token: UserOut = Depends(require_permission(modulo, 'insertar'))
 ):
     try:
-        id_rol = user_token.id_rol
-        modulo = 9     
-        if not verify_permissions(db, id_rol, modulo, 'insertar'):
-            raise HTTPException(status_code=401, detail="Usuario no autorizado para ingresar detalles salvamento")
-        
         nuevo_detalle = crud_detalle_salvamento.create_detalle_salvamento(db, detalle_salvamento)
         return nuevo_detalle
+    except HTTPException:
+        raise  # cantidad insuficiente (400)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     
@@ -33,14 +33,9 @@ def create_detalle_salvamento(
 def get_detalle_salvamento(
     id_detalle: int,
     db: Session = Depends(get_db),
-    user_token: UserOut = Depends(get_current_user)
+    user_token: UserOut = Depends(require_permission(modulo, 'seleccionar'))
 ):
     try:
-        id_rol = user_token.id_rol   
-        modulo = 9   
-        if not verify_permissions(db, id_rol, modulo, 'seleccionar'):
-            raise HTTPException(status_code=401, detail="Usuario no autorizado para ver detalle salvamento")
-
         detalle_salvamento = crud_detalle_salvamento.get_detalle_by_id(db, id_detalle)
         if not detalle_salvamento:
             raise HTTPException(status_code=404, detail="Detalle Salvamento no encontrado")
@@ -52,14 +47,9 @@ def get_detalle_salvamento(
 def get_detalles_por_venta(
     id_venta: int,
     db: Session = Depends(get_db),
-    user_token: UserOut = Depends(get_current_user)
+    user_token: UserOut = Depends(require_permission(modulo, 'seleccionar'))
 ):
     try:
-        id_rol = user_token.id_rol 
-        modulo = 9     
-        if not verify_permissions(db, id_rol, modulo, 'seleccionar'):
-            raise HTTPException(status_code=401, detail="Usuario no autorizado para ver detalle salvamento")
-
         detalles_venta_salvamento = crud_detalle_salvamento. get_detalle_by_id_venta(db, id_venta)        
         if not detalles_venta_salvamento:  # "falsy" en Python
             raise HTTPException(
@@ -77,14 +67,9 @@ def update_detalle_salvamento(
     id_detalle: int,
     detalle_salvamento: DetalleSalvamentoUpdate,
     db: Session = Depends(get_db),
-    user_token: UserOut = Depends(get_current_user)
+    user_token: UserOut = Depends(require_permission(modulo, 'actualizar'))
 ):
     try:
-        id_rol = user_token.id_rol 
-        modulo = 9     
-        if not verify_permissions(db, id_rol, modulo, 'actualizar'):
-            raise HTTPException(status_code=401, detail="Usuario no autorizado para actualizar detalle salvamento")
-        
         success = crud_detalle_salvamento.update_detalle_salvamento_by_id(db, id_detalle, detalle_salvamento)
         if not success:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, 
@@ -98,14 +83,9 @@ def update_detalle_salvamento(
 def delete_detalle_salvamento(
     id_detalle: int,
     db: Session = Depends(get_db),
-    user_token: UserOut = Depends(get_current_user)
+    user_token: UserOut = Depends(require_permission(modulo, 'borrar'))
 ):
     try:
-        id_rol = user_token.id_rol 
-        modulo = 9     
-        if not verify_permissions(db, id_rol, modulo, 'borrar'):
-            raise HTTPException(status_code=401, detail="Usuario no autorizado para eliminar detalle salvamento")
-        
         success = crud_detalle_salvamento.delete_detalle_salvamento_by_id(db, id_detalle)
         if not success:
             raise HTTPException(
@@ -143,17 +123,33 @@ def delete_detalle_salvamento(
 @router.get("/all-products-salvamento", response_model=list[salvamentoProductosOut])
 def get_detalle_salvamento(
     db: Session = Depends(get_db),
-    user_token: UserOut = Depends(get_current_user)
+    user_token: UserOut = Depends(require_permission(modulo, 'seleccionar'))
 ):
     try:
-        id_rol = user_token.id_rol 
-        modulo = 9     
-        if not verify_permissions(db, id_rol, modulo, 'seleccionar'):
-            raise HTTPException(status_code=401, detail="Usuario no autorizado para ver todos los productos en salvamento")
-        
         detalle_salvamento = crud_detalle_salvamento.get_all_products_salvamento(db)
         if not detalle_salvamento:
             raise HTTPException(status_code=404, detail="Productos de salvamento no encontrado")
         return detalle_salvamento
     except SQLAlchemyError as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/salvamento-a-fecha", response_model=ExistenciasAFechaOut)
+def get_salvamento_a_fecha(
+    fecha_hora: Optional[datetime] = Query(None, description="momento a consultar (por defecto, ahora)"),
+    db: Session = Depends(get_db),
+    user_token: UserOut = Depends(require_permission(modulo, 'seleccionar'))
+):
+    try:
+        return crud_movimientos.existencias_a_fecha(db, "detalle_salvamento", fecha_hora or datetime.now())
+    except SQLAlchemyError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/conciliacion-salvamento", response_model=ConciliacionExistenciasOut)
+def get_conciliacion_salvamento(
+    db: Session = Depends(get_db),
+    user_token: UserOut = Depends(require_permission(modulo, 'seleccionar'))
+):
+    try:
+        return crud_movimientos.conciliar_existencias(db, "detalle_salvamento")
+    except SQLAlchemyError as e:
+        raise HTTPException(status_code=500, detail=str(e))
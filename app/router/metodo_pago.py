@@ -1,8 +1,7 @@
 from typing import List
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
-from app.crud.permisos import verify_permissions
-from app.router.dependencies import get_current_user
+from app.router.dependencies import require_permission
 from core.database import get_db
 from app.schemas.metodo_pago import MetodoPagoCreate, MetodoPagoOut, MetodoPagoUpdate
 from app.schemas.users import UserOut
@@ -15,14 +14,9 @@ modulo = 8
 def create_metodoPago(    
     metodoPago: MetodoPagoCreate,
     db: Session = Depends(get_db),
-    user_token: UserOut = Depends(get_current_user)
+    user_token: UserOut = Depends(require_permission(modulo, 'insertar'))
 ):
     try:
-
-        id_rol = user_token.id_rol
-
-        if not verify_permissions(db, id_rol, modulo, 'insertar'):
-            raise HTTPException(status_code=401, detail= 'Usuario no autorizado')
         crud_metodosPago.create_metodoPago(db, metodoPago)
         return {"message": "Metodo de pago creado correctamente"}
     except SQLAlchemyError as e:
@@ -32,13 +26,8 @@ def create_metodoPago(
 def get_metodoPago(    
     metodoPago_id: int,
     db: Session = Depends(get_db),
-    user_token: UserOut = Depends(get_current_user) ):
+    user_token: UserOut = Depends(require_permission(modulo, 'seleccionar')) ):
     try:
-
-        id_rol = user_token.id_rol
-
-        if not verify_permissions(db, id_rol, modulo, 'seleccionar'):
-            raise HTTPException(status_code=401, detail= 'Usuario no autorizado')
         metodoPago = crud_metodosPago.get_metodoPago_by_id(db, metodoPago_id)
         if not metodoPago:
             raise HTTPException(status_code=404, detail="Metodo de pago no encontrado")
@@ -50,12 +39,9 @@ def get_metodoPago(
 @router.get("/all-metodosPago", response_model=List[MetodoPagoOut])
 def get_metodosPago(
     db: Session = Depends(get_db),
-    user_token: UserOut = Depends(get_current_user) 
+    user_token: UserOut = Depends(require_permission(modulo, 'seleccionar')) 
 ):
     try:
-        id_rol = user_token.id_rol
-        if not verify_permissions(db, id_rol, modulo, 'seleccionar'):
-            raise HTTPException(status_code=401, detail="Usuario no autorizado")
         users = crud_metodosPago.get_metodosPago(db)
         return users
     except SQLAlchemyError as e:
@@ -66,13 +52,9 @@ def update_metodosPago(
     metodoPago_id: int,
     metodoPago: MetodoPagoUpdate,
     db: Session = Depends(get_db),
-    user_token: UserOut = Depends(get_current_user)
+    user_token: UserOut = Depends(require_permission(modulo, 'actualizar'))
 ):
     try:
-        id_rol = user_token.id_rol
-        if not verify_permissions(db, id_rol, modulo, 'actualizar'):
-            raise HTTPException(status_code=401, detail="Usuario no autorizado")
-        
         success = crud_metodosPago.update_metodoPago_by_id(db, metodoPago_id, metodoPago)
         if not success:
             raise HTTPException(status_code=400, detail="No se pudo actualizar el metodo de pago")
@@ -86,13 +68,9 @@ def change_metodoPago_status(
     metodoPago_id: int,
     nuevo_estado: bool,
     db: Session = Depends(get_db),
-    user_token: UserOut = Depends(get_current_user)
+    user_token: UserOut = Depends(require_permission(modulo, 'actualizar'))
 ):
     try:
-        id_rol = user_token.id_rol
-        if not verify_permissions(db, id_rol, modulo, 'actualizar'):
-            raise HTTPException(status_code=401, detail="Usuario no autorizado")
-        
         success = crud_metodosPago.change_metodoPago_status(db, metodoPago_id, nuevo_estado)
         if not success:
             raise HTTPException(status_code=400, detail="No se pudo cambiar el estado del metodo de pago")
@@ -3,8 +3,7 @@ from app.schemas.users import UserOut
 from app.crud import modulos as crud_modulos
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
-from app.crud.permisos import verify_permissions
-from app.router.dependencies import get_current_user
+from app.router.dependencies import require_permission
 from core.database import get_db
 from app.schemas.users import UserOut
 from sqlalchemy.exc import SQLAlchemyError
@@ -18,13 +17,9 @@ modulo = 1  # ID del módulo
 @router.get("/todas", response_model=List[ModuloOut])
 def get_all_modulos(
     db: Session = Depends(get_db),
-    user_token: UserOut = Depends(get_current_user)
+    user_token: UserOut = Depends(require_permission(modulo, 'seleccionar'))
 ):
     try:
-        id_rol = user_token.id_rol
-        if not verify_permissions(db, id_rol, modulo, 'seleccionar'):
-            raise HTTPException(status_code=401, detail="Usuario no autorizado para ver módulos")
-
         modulos = crud_modulos.get_all_modulos(db)
         return modulos
     except SQLAlchemyError as e:
@@ -35,13 +30,9 @@ def get_all_modulos(
 def create_modulo(
     modulo_data: ModuloCreate,
     db: Session = Depends(get_db),
-    user_token: UserOut = Depends(get_current_user)
+    user_token: UserOut = Depends(require_permission(modulo, 'insertar'))
 ):
     try:
-        id_rol = user_token.id_rol
-        if not verify_permissions(db, id_rol, modulo, 'insertar'):
-            raise HTTPException(status_code=401, detail="Usuario no autorizado para crear módulos")
-
         crud_modulos.create_modulo(db, modulo_data)
         return {"message": "Módulo creado correctamente"}
     except SQLAlchemyError as e:
@@ -52,13 +43,9 @@ def create_modulo(
 def get_modulo_by_id(
     id_modulo: int,
     db: Session = Depends(get_db),
-    user_token: UserOut = Depends(get_current_user)
+    user_token: UserOut = Depends(require_permission(modulo, 'seleccionar'))
 ):
     try:
-        id_rol = user_token.id_rol
-        if not verify_permissions(db, id_rol, modulo, 'seleccionar'):
-            raise HTTPException(status_code=401, detail="Usuario no autorizado")
-
         modulo_data = crud_modulos.get_modulo_by_id(db, id_modulo)
         if not modulo_data:
             raise HTTPException(status_code=404, detail="Módulo no encontrado")
@@ -72,13 +59,9 @@ def update_modulo(
     id_modulo: int,
     modulo_data: ModuloUpdate,
     db: Session = Depends(get_db),
-    user_token: UserOut = Depends(get_current_user)
+    user_token: UserOut = Depends(require_permission(modulo, 'actualizar'))
 ):
     try:
-        id_rol = user_token.id_rol
-        if not verify_permissions(db, id_rol, modulo, 'actualizar'):
-            raise HTTPException(status_code=401, detail="Usuario no autorizado para editar módulos")
-
         success = crud_modulos.update_modulo(db, id_modulo, modulo_data)
         if not success:
             raise HTTPException(status_code=404, detail="No se encontró el módulo")
@@ -91,13 +74,9 @@ def change_module_status(
     modulo_id: int,
     activo: bool,
     db: Session = Depends(get_db),
-    user_token: UserOut = Depends(get_current_user)
+    user_token: UserOut = Depends(require_permission(modulo, 'actualizar'))
 ):
     try:
-        id_rol = user_token.id_rol
-        if not verify_permissions(db, id_rol, modulo, 'actualizar'):
-            raise HTTPException(status_code=401, detail="Usuario no autorizado")
-
         success = crud_modulos.change_modulo_status(db, modulo_id, activo)
         if not success:
             raise HTTPException(status_code=404, detail="Módulo no encontrado")
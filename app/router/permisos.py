@@ -6,8 +6,7 @@ from typing import List
 from app.schemas.permisos import PermisoCreate, PermisoOut, PermisoUpdate
 from app.schemas.users import UserOut
 from app.crud import modulo_permisos as modulo_permisos
-from app.crud.permisos import verify_permissions  # tu función actual de verificación
-from app.router.dependencies import get_current_user
+from app.router.dependencies import require_permission
 from core.database import get_db
 
 router = APIRouter()
@@ -17,11 +16,8 @@ modulo = 2  # ID asignados
 @router.get("/todas", response_model=List[PermisoOut])
 def get_all_permisos(
     db: Session = Depends(get_db),
-    user_token: UserOut = Depends(get_current_user)
+    user_token: UserOut = Depends(require_permission(modulo, 'seleccionar'))
 ):
-    id_rol = user_token.id_rol
-    if not verify_permissions(db, id_rol, modulo, 'seleccionar'):
-        raise HTTPException(status_code=401, detail="Usuario no autorizado para ver permisos")
     try:
         permisos = modulo_permisos.get_all_permisos(db)
         return permisos
@@ -33,11 +29,8 @@ def get_all_permisos(
 def create_permiso(
     permiso_data: PermisoCreate,
     db: Session = Depends(get_db),
-    user_token: UserOut = Depends(get_current_user)
+    user_token: UserOut = Depends(require_permission(modulo, 'insertar'))
 ):
-    id_rol = user_token.id_rol
-    if not verify_permissions(db, id_rol, modulo, 'insertar'):
-        raise HTTPException(status_code=401, detail="Usuario no autorizado para crear permisos")
     try:
         modulo_permisos.create_permiso(db, permiso_data)
         return {"message": "Permiso creado correctamente"}
@@ -50,11 +43,8 @@ def get_permiso_by_ids(
     id_modulo: int,
     id_rol: int,
     db: Session = Depends(get_db),
-    user_token: UserOut = Depends(get_current_user)
+    user_token: UserOut = Depends(require_permission(modulo, 'seleccionar'))
 ):
-    id_rol_user = user_token.id_rol
-    if not verify_permissions(db, id_rol_user, modulo, 'seleccionar'):
-        raise HTTPException(status_code=401, detail="Usuario no autorizado para ver permisos")
     try:
         permiso = modulo_permisos.get_permiso_by_ids(db, id_modulo, id_rol)
         if not permiso:
@@ -70,11 +60,8 @@ def update_permiso(
     id_rol: int,
     permiso_data: PermisoUpdate,
     db: Session = Depends(get_db),
-    user_token: UserOut = Depends(get_current_user)
+    user_token: UserOut = Depends(require_permission(modulo, 'actualizar'))
 ):
-    id_rol_user = user_token.id_rol
-    if not verify_permissions(db, id_rol_user, modulo, 'actualizar'):
-        raise HTTPException(status_code=401, detail="Usuario no autorizado para actualizar permisos")
     try:
         success = modulo_permisos.update_permiso(db, id_modulo, id_rol, permiso_data)
         if not success:
@@ -2,11 +2,11 @@ from typing import List
 from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session
 from core.database import get_db
-from app.router.dependencies import get_current_user
-from app.crud.permisos import verify_permissions
+from app.router.dependencies import require_permission
 from app.schemas.roles import RolCreate, RolOut, RolUpdate, RolPag
 from app.schemas.users import UserOut
 from app.crud import roles as crud_roles
+from app.crud.conteos import DESCRIPCION_ESTIMATED_TOTAL, DESCRIPCION_INCLUDE_TOTAL, modo_conteo, total_paginas
 from sqlalchemy.exc import SQLAlchemyError
 
 router = APIRouter()
@@ -17,13 +17,9 @@ modulo = 3
 def create_rol(    
     rol: RolCreate,
     db: Session = Depends(get_db),
-    user_token: UserOut = Depends(get_current_user)
+    user_token: UserOut = Depends(require_permission(modulo, 'insertar'))
 ):
     try:
-        id_rol = user_token.id_rol
-
-        if not verify_permissions(db, id_rol, modulo, 'insertar'):
-            raise HTTPException(status_code=401, detail= 'Usuario no autorizado')
         crud_roles.create_rol(db, rol)
         return {"message": "Rol creado correctamente"}
     except SQLAlchemyError as e:
@@ -34,13 +30,8 @@ def create_rol(
 def get_rol_by_nombre(    
     nombre_rol: str,
     db: Session = Depends(get_db),
-    user_token: UserOut = Depends(get_current_user) ):
+    user_token: UserOut = Depends(require_permission(modulo, 'seleccionar')) ):
     try:
-
-        id_rol = user_token.id_rol
-
-        if not verify_permissions(db, id_rol, modulo, 'seleccionar'):
-            raise HTTPException(status_code=401, detail= 'Usuario no autorizado')
         rol = crud_roles.get_rol_by_nombre(db, nombre_rol)
         if not rol:
             raise HTTPException(status_code=404, detail="rol no encontrado")
@@ -53,13 +44,8 @@ def get_rol_by_nombre(
 def get_rol_by_id(    
     rol_id: int,
     db: Session = Depends(get_db),
-    user_token: UserOut = Depends(get_current_user)):
+    user_token: UserOut = Depends(require_permission(modulo, 'seleccionar'))):
     try:
-
-        id_rol = user_token.id_rol
-
-        if not verify_permissions(db, id_rol, modulo, 'seleccionar'):
-            raise HTTPException(status_code=401, detail= 'Usuario no autorizado')
         rol = crud_roles.get_rol_by_id(db, rol_id)
         if not rol:
             raise HTTPException(status_code=404, detail="Rol no encontrado")
@@ -73,15 +59,14 @@ def get_roles(
     db: Session = Depends(get_db),
     page: int = Query(1, ge=1),
     page_size: int = Query(10, ge=1, le=100),
-    user_token: UserOut = Depends(get_current_user) 
+    include_total: bool = Query(True, description=DESCRIPCION_INCLUDE_TOTAL),
+    estimated_total: bool = Query(False, description=DESCRIPCION_ESTIMATED_TOTAL),
+    user_token: UserOut = Depends(require_permission(modulo, 'seleccionar')) 
 ):
     try:
-        id_rol = user_token.id_rol
-        if not verify_permissions(db, id_rol, modulo, 'seleccionar'):
-            raise HTTPException(status_code=401, detail="Usuario no autorizado")
-        
         skip = (page - 1) * page_size
-        data = crud_roles.get_all_roles_pag(db, skip=skip, limit=page_size)
+        conteo = modo_conteo(include_total, estimated_total)
+        data = crud_roles.get_all_roles_pag(db, skip=skip, limit=page_size, conteo=conteo)
         
         total = data["cant_roles"]
         roles = data["roles"]
@@ -90,7 +75,7 @@ def get_roles(
             "page": page,
             "page_size": page_size,
             "total_roles": total,
-            "total_pages": (total + page_size - 1) // page_size,
+            "total_pages": total_paginas(total, page_size),
             "roles": roles
         }
     except SQLAlchemyError as e:
@@ -102,13 +87,9 @@ def update_rol_by_id(
     rol_id: int,
     rol: RolUpdate,
     db: Session = Depends(get_db),
-    user_token: UserOut = Depends(get_current_user)
+    user_token: UserOut = Depends(require_permission(modulo, 'actualizar'))
 ):
     try:
-        id_rol = user_token.id_rol
-
-        if not verify_permissions(db, id_rol, modulo, 'actualizar'):
-            raise HTTPException(status_code=401, detail= 'Usuario no autorizado')
         success = crud_roles.update_rol_by_id(db, rol_id, rol)
         if not success:
             raise HTTPException(status_code=400, detail="No se pudo actualizar el rol")
@@ -122,14 +103,9 @@ def cambiar_rol_estado(
     rol_id: int,
     nuevo_estado: bool,
     db: Session = Depends(get_db),
-    user_token: UserOut = Depends(get_current_user)
+    user_token: UserOut = Depends(require_permission(modulo, 'actualizar'))
 ):
     try:
-        # Verificar permisos del usuario
-        id_rol = user_token.id_rol
-        if not verify_permissions(db, id_rol, modulo, 'actualizar'):
-            raise HTTPException(status_code=401, detail="Usuario no autorizado")
-
         success = crud_roles.cambiar_rol_estado(db, rol_id, nuevo_estado)
         if not success:
             raise HTTPException(status_code=400, detail="No se puedo actualizar el estado del rol")
@@ -5,12 +5,13 @@ from sqlalchemy.orm import Session
 from sqlalchemy.exc import SQLAlchemyError
 
 from app.crud.permisos import verify_permissions
-from app.router.dependencies import get_current_user
-from core.database import get_db
+from app.router.dependencies import get_current_user, require_permission
+from core.database import get_db, get_read_db
 
 from app.schemas.tareas import TareaCreate, TareaOut, TareaUpdate
 from app.schemas.users import UserOut
 from app.crud import tareas as crud_tareas
+from app.crud.conteos import DESCRIPCION_ESTIMATED_TOTAL, DESCRIPCION_INCLUDE_TOTAL, modo_conteo, total_paginas
 from fastapi import Query
 from typing import Optional
 from datetime import date
@@ -28,20 +29,16 @@ def get_tareas_pag(
     page_size: int = Query(10, ge=1, le=200),
     fecha_inicio: Optional[date] = Query(None, description="Filtrar desde esta fecha"),
     fecha_fin: Optional[date] = Query(None, description="Filtrar hasta esta fecha"),
-    db: Session = Depends(get_db),
-    user_token: UserOut = Depends(get_current_user)
+    include_total: bool = Query(True, description=DESCRIPCION_INCLUDE_TOTAL),
+    estimated_total: bool = Query(False, description=DESCRIPCION_ESTIMATED_TOTAL),
+    db: Session = Depends(get_read_db),
+    user_token: UserOut = Depends(require_permission(modulo, 'seleccionar'))
 ):
     """
     Obtiene las tareas paginadas y opcionalmente filtradas por fecha.
-    (Solo se ejecuta si el usuario ya pasó verify_permissions con permisos de selección)
+    (Solo se ejecuta si el usuario ya pasó require_permission con permisos de selección)
     """
     try:
-        id_rol = user_token.id_rol
-
-        # Validar permisos del usuario para ver tareas
-        if not verify_permissions(db, id_rol, modulo, 'seleccionar'):
-            raise HTTPException(status_code=401, detail="Usuario no autorizado")
-
         skip = (page - 1) * page_size
 
         data = crud_tareas.get_tareas_pag(
@@ -49,7 +46,8 @@ def get_tareas_pag(
             skip=skip,
             limit=page_size,
             fecha_inicio=fecha_inicio,
-            fecha_fin=fecha_fin
+            fecha_fin=fecha_fin,
+            conteo=modo_conteo(include_total, estimated_total)
         )
 
         total = data["total"]
@@ -59,7 +57,7 @@ def get_tareas_pag(
             "page": page,
             "page_size": page_size,
             "total_tareas": total,
-            "total_pages": (total + page_size - 1) // page_size,
+            "total_pages": total_paginas(total, page_size),
             "tareas": tareas
         }
 
@@ -72,14 +70,9 @@ def get_tareas_pag(
 def create_tarea(
     tarea: TareaCreate,
     db: Session = Depends(get_db),
-    user_token: UserOut = Depends(get_current_user)
+    user_token: UserOut = Depends(require_permission(modulo, 'insertar'))
 ):
     try:
-        id_rol = user_token.id_rol
-        # Validar permiso
-        if not verify_permissions(db, id_rol, modulo, 'insertar'):
-            raise HTTPException(status_code=401, detail="Usuario no autorizado para crear tareas")
-
         crud_tareas.create_tarea(db, tarea)
         return {"message": "Tarea creada correctamente"}
     except SQLAlchemyError as e:
@@ -122,13 +115,9 @@ def update_tarea_usuario(
     id_usuario: int,
     tarea: TareaUpdate,
     db: Session = Depends(get_db),
-    user_token: UserOut = Depends(get_current_user)
+    user_token: UserOut = Depends(require_permission(modulo, 'actualizar'))
 ):
     try:
-        id_rol = user_token.id_rol
-        if not verify_permissions(db, id_rol, modulo, 'actualizar'):
-            raise HTTPException(status_code=401, detail="Usuario no autorizado para editar tareas")
-
         success = crud_tareas.update_tarea_by_user(db, id_usuario, tarea)
         if not success:
             raise HTTPException(status_code=404, detail="No se encontró ninguna tarea asociada al usuario")
@@ -143,13 +132,9 @@ def update_tarea(
     id_tarea: int,
     tarea: TareaUpdate,
     db: Session = Depends(get_db),
-    user_token: UserOut = Depends(get_current_user)
+    user_token: UserOut = Depends(require_permission(modulo, 'actualizar'))
 ):
     try:
-        id_rol = user_token.id_rol
-        if not verify_permissions(db, id_rol, modulo, 'actualizar'):
-            raise HTTPException(status_code=401, detail="Usuario no autorizado para editar tareas")
-
         success = crud_tareas.update_tarea(db, id_tarea, tarea)
         if not success:
             raise HTTPException(status_code=404, detail="No se encontró la tarea")
@@ -2,8 +2,8 @@ from typing import List
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from app.crud.permisos import verify_permissions
-from app.router.dependencies import get_current_user
-from core.database import get_db
+from app.router.dependencies import get_current_user, require_permission
+from core.database import get_db, get_read_db
 from app.schemas.users import UserCreate, UserOut, UserUpdate
 from app.crud import users as crud_users
 from sqlalchemy.exc import SQLAlchemyError
@@ -44,14 +44,13 @@ def get_user(
     db: Session = Depends(get_db),
     user_token: UserOut = Depends(get_current_user) ):
     try:
-
         id_rol = user_token.id_rol
 
-        if not email == user_token.email:
+        # Sin permiso de consulta solo se puede ver el propio usuario (por id, no por el email del token)
+        user = crud_users.get_user_by_email(db, email)
+        if not user or user["id_usuario"] != user_token.id_usuario:
             if not verify_permissions(db, id_rol, modulo, 'seleccionar'):
                 raise HTTPException(status_code=401, detail= 'Usuario no autorizado')
-            
-        user = crud_users.get_user_by_email(db, email)
         if not user:
             raise HTTPException(status_code=404, detail="Usuario no encontrado")
         return user
@@ -62,13 +61,10 @@ def get_user(
     
 @router.get("/all-except-admins", response_model=List[UserOut])
 def get_users(
-    db: Session = Depends(get_db),
-    user_token: UserOut = Depends(get_current_user) 
+    db: Session = Depends(get_read_db),
+    user_token: UserOut = Depends(require_permission(modulo, 'seleccionar')) 
 ):
     try:
-        id_rol = user_token.id_rol
-        if not verify_permissions(db, id_rol, modulo, 'seleccionar'):
-            raise HTTPException(status_code=401, detail="Usuario no autorizado")
         users = crud_users.get_all_user_except_admins(db)
         return users
     except SQLAlchemyError as e:
@@ -79,14 +75,9 @@ def update_user(
     user_id: int,
     user: UserUpdate,
     db: Session = Depends(get_db),
-    user_token: UserOut = Depends(get_current_user)
+    user_token: UserOut = Depends(require_permission(modulo, 'actualizar'))
 ):
     try:
-
-        id_rol = user_token.id_rol
-        if not verify_permissions(db, id_rol, modulo, 'actualizar'):
-            raise HTTPException(status_code=401, detail="Usuario no autorizado")
-        
         success = crud_users.update_user_by_id(db, user_id, user)
         if not success:
             raise HTTPException(status_code=400, detail="No se pudo actualizar el usuario")
@@ -98,14 +89,9 @@ def update_user(
 def get_user(
     document: str,
     db: Session = Depends(get_db),
-    user_token: UserOut = Depends(get_current_user)
+    user_token: UserOut = Depends(require_permission(modulo, 'seleccionar'))
 ):
     try:
-        id_rol=user_token.id_rol
-
-        if not verify_permissions(db, id_rol, modulo, 'seleccionar'):
-            raise HTTPException(status_code=401, detail="usuario no autorizado")
-
         user = crud_users.get_user_by_document_number(db, document)
         if not user:
             raise HTTPException(status_code=404, detail="Usuario no encontrado")
@@ -116,15 +102,10 @@ def get_user(
 @router.get("/by-role", response_model=List[UserOut])
 def get_user(
     role: str,
-    db: Session = Depends(get_db),
-    user_token: UserOut = Depends(get_current_user)
+    db: Session = Depends(get_read_db),
+    user_token: UserOut = Depends(require_permission(modulo, 'seleccionar'))
 ):
     try:
-        id_rol=user_token.id_rol
-
-        if not verify_permissions(db, id_rol, modulo, 'seleccionar'):
-            raise HTTPException(status_code=401, detail="usuario no autorizado")
-
         user = crud_users.get_user_by_role(db, role)
         if not user:
             raise HTTPException(status_code=404, detail="Usuario no encontrado")
@@ -137,14 +118,9 @@ def change_user_status(
     user_id: int,
     nuevo_estado: bool,
     db: Session = Depends(get_db),
-    user_token: UserOut = Depends(get_current_user)
+    user_token: UserOut = Depends(require_permission(modulo, 'actualizar'))
 ):
     try:
-        # Verificar permisos del usuario
-        id_rol = user_token.id_rol
-        if not verify_permissions(db, id_rol, modulo, 'actualizar'):
-            raise HTTPException(status_code=401, detail="Usuario no autorizado")
-
         success = crud_users.change_user_status(db, user_id, nuevo_estado)
         if not success:
             raise HTTPException(status_code=404, detail="Usuario no encontrado")
@@ -159,15 +135,10 @@ def change_user_status(
 
 @router.get("/all-users-except-superadmins", response_model=List[UserOut])
 def get_users_except_superadmins(
-    db: Session = Depends(get_db),
-    user_token: UserOut = Depends(get_current_user) 
+    db: Session = Depends(get_read_db),
+    user_token: UserOut = Depends(require_permission(10, 'seleccionar')) 
 ):
     try:
-        id_rol = user_token.id_rol
-
-        modulo = 10
-        if not verify_permissions(db, id_rol, modulo, 'seleccionar'):
-            raise HTTPException(status_code=401, detail="Usuario no autorizado")
         users = crud_users.get_all_user_except_superadmins(db)
         return users
     except SQLAlchemyError as e:
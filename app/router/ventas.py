@@ -1,30 +1,40 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from core.database import get_db
-from app.router.dependencies import get_current_user
-from app.crud.permisos import verify_permissions
-from app.schemas.ventas import VentaCreate, VentaOut, VentaUpdate, ventaPag, VentaCreateResponse, DetalleVenta
+from core.database import get_db, get_read_db, abrir_sesion_lectura
+from core.exportacion import comprimir_gzip, en_bloques, lineas_csv, lineas_ndjson
+from app.router.dependencies import require_permission
+from app.schemas.ventas import VentaCreate, VentaOut, VentaUpdate, ventaPag, VentaCreateResponse, DetalleVenta, ResumenVentasOut, VentaCheckout, VentaCheckoutResponse, DetallesLoteRequest, DetallesPorVenta, CancelarLoteRequest, CancelarLoteResponse, CatalogoOut
 from app.schemas.users import UserOut
 from app.crud import ventas as crud_ventas
+from app.crud import catalogo as crud_catalogo
+from core.paginacion import codificar_cursor, decodificar_cursor
+from app.crud.conteos import DESCRIPCION_ESTIMATED_TOTAL, DESCRIPCION_INCLUDE_TOTAL, modo_conteo, total_paginas
 from sqlalchemy.exc import SQLAlchemyError, IntegrityError
 from datetime import date
 
 router = APIRouter()
 modulo = 5
 
+DESCRIPCION_CURSOR = "Valor de next_cursor de la respuesta anterior; si se envia, se ignora page"
+
+
+def _posicion_cursor(cursor: Optional[str], campos) -> Optional[dict]:
+    if not cursor:
+        return None
+    try:
+        return decodificar_cursor(cursor, campos)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Cursor invalido")
+
 @router.post("/crear", response_model=VentaCreateResponse, status_code=status.HTTP_201_CREATED)
 def create_venta(    
     venta: VentaCreate,
     db: Session = Depends(get_db),
-    user_token: UserOut = Depends(get_current_user)
+    user_token: UserOut = Depends(require_permission(modulo, 'insertar'))
 ):
     try:
-        id_rol = user_token.id_rol
-
-        if not verify_permissions(db, id_rol, modulo, 'insertar'):
-            raise HTTPException(status_code=401, detail= 'Usuario no autorizado')
-        
         venta_creada = crud_ventas.create_venta(db, venta)
         if not venta_creada:
             raise HTTPException(status_code=400, detail="No se pudo recuperar datos de la venta")
@@ -45,15 +55,66 @@ def create_venta(
         raise HTTPException(status_code=500, detail="Error interno en la base de datos")
     
 
-@router.get("/all-ventas", response_model=List[VentaOut])
-def get_all_ventas( 
+@router.post("/checkout", response_model=VentaCheckoutResponse, status_code=status.HTTP_201_CREATED)
+def checkout_venta(
+    checkout: VentaCheckout,
+    db: Session = Depends(get_db),
+    user_token: UserOut = Depends(require_permission(modulo, 'insertar'))
+):
+    '''
+    Registra la venta con todas sus lineas de huevos y salvamento en una sola transaccion.
+    '''
+    if not checkout.huevos and not checkout.salvamento:
+        raise HTTPException(status_code=400, detail="La venta debe tener al menos una linea")
+    try:
+        id_venta = crud_ventas.checkout_venta(db, checkout)
+        return {
+            "message": "Venta registrada correctamente",
+            "data_venta": crud_ventas.get_venta_by_id(db, id_venta),
+            "detalles": crud_ventas.get_all_detalle_by_id_venta(db, id_venta)
+        }
+
+    except IntegrityError as e:
+        if "foreign key" in str(e.orig).lower():
+            raise HTTPException(status_code=409, detail="Clave foranea inexistente")
+        else:
+            raise HTTPException(status_code=400, detail="Error de integridad en la base de datos")
+
+    except SQLAlchemyError as e:
+        raise HTTPException(status_code=500, detail="Error interno en la base de datos")
+
+
+@router.get("/catalogo", response_model=CatalogoOut)
+def get_catalogo(
+    request: Request,
+    response: Response,
+    since: Optional[str] = Query(None, description="version de una respuesta anterior: solo se devuelven los productos que cambiaron despues"),
     db: Session = Depends(get_db),
-    user_token: UserOut = Depends(get_current_user) ):
+    user_token: UserOut = Depends(require_permission(modulo, 'seleccionar'))
+):
+    '''
+    Productos que se pueden vender (huevos y salvamento) con su disponibilidad.
+    El catalogo completo lleva ETag: con If-None-Match y sin cambios responde 304.
+    '''
     try:
-        id_rol = user_token.id_rol
+        catalogo = crud_catalogo.obtener_catalogo(db, since)
+    except SQLAlchemyError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    if catalogo["completo"]:
+        etag = f'"catalogo-{catalogo["version"]}"'
+        enviados = [valor.strip().removeprefix("W/") for valor in request.headers.get("if-none-match", "").split(",")]
+        if etag in enviados or "*" in enviados:
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+        response.headers["ETag"] = etag
+    return catalogo
+
 
-        if not verify_permissions(db, id_rol, modulo, 'seleccionar'):
-            raise HTTPException(status_code=401, detail= 'Usuario no autorizado')
+@router.get("/all-ventas", response_model=List[VentaOut])
+def get_all_ventas( 
+    db: Session = Depends(get_read_db),
+    user_token: UserOut = Depends(require_permission(modulo, 'seleccionar')) ):
+    try:
         venta = crud_ventas.get_all_ventas(db)
         if not venta:
             raise HTTPException(status_code=404, detail="Venta no encontrada")
@@ -66,38 +127,94 @@ def get_all_ventas(
 def get_ventas_by_date_range_sin_pag(
     fecha_inicio: str = Query(..., description="Fecha inicial en formato YYYY-MM-DD"),
     fecha_fin: str = Query(..., description="Fecha final en formato YYYY-MM-DD"),
-    db: Session = Depends(get_db),
-    user_token: UserOut = Depends(get_current_user)
+    db: Session = Depends(get_read_db),
+    user_token: UserOut = Depends(require_permission(modulo, 'seleccionar'))
 ):
     try:
-        id_rol = user_token.id_rol
-
-        if not verify_permissions(db, id_rol, modulo, 'seleccionar'):
-            raise HTTPException(status_code=401, detail="Usuario no autorizado")
-
         ventas = crud_ventas.get_ventas_by_date_range(db, fecha_inicio, fecha_fin)
         if not ventas:
             raise HTTPException(status_code=404, detail="No hay ventas en ese rango de fechas")
         return ventas
 
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Formato de fecha invalido, use YYYY-MM-DD")
     except SQLAlchemyError as e:
         raise HTTPException(status_code=500, detail=f"Error al obtener las ventas: {e}")      
 
+
+
+@router.get("/resumen", response_model=List[ResumenVentasOut])
+def get_resumen_ventas(
+    fecha_inicio: str = Query(..., description="Fecha inicial en formato YYYY-MM-DD"),
+    fecha_fin: str = Query(..., description="Fecha final en formato YYYY-MM-DD"),
+    agrupacion: str = Query("dia", pattern="^(dia|semana|mes)$", description="dia, semana (desde el lunes) o mes"),
+    tipo_pago: Optional[int] = Query(None, description="Filtrar por metodo de pago"),
+    id_usuario: Optional[int] = Query(None, description="Filtrar por usuario que registro la venta"),
+    db: Session = Depends(get_read_db),
+    user_token: UserOut = Depends(require_permission(modulo, 'seleccionar'))
+):
+    try:
+        return crud_ventas.get_resumen_ventas(db, agrupacion, fecha_inicio, fecha_fin, tipo_pago, id_usuario)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Formato de fecha invalido, use YYYY-MM-DD")
+    except SQLAlchemyError as e:
+        raise HTTPException(status_code=500, detail=f"Error al obtener el resumen de ventas: {e}")
+
+
+@router.get("/export")
+def exportar_ventas(
+    formato: str = Query("ndjson", pattern="^(ndjson|csv)$", description="ndjson (una venta JSON por linea) o csv"),
+    fecha_inicio: Optional[date] = Query(None, description="Fecha inicial en formato YYYY-MM-DD (opcional)"),
+    fecha_fin: Optional[date] = Query(None, description="Fecha final en formato YYYY-MM-DD (opcional)"),
+    gzip: bool = Query(False, description="Comprimir el archivo con gzip"),
+    user_token: UserOut = Depends(require_permission(modulo, 'seleccionar'))
+):
+    '''
+    Exporta las ventas fila a fila en memoria constante, para descargas grandes
+    (por ejemplo un año completo). La consulta se lee con un cursor del servidor
+    en una sesion propia, que se cierra al terminar la descarga.
+    '''
+    if fecha_inicio and fecha_fin and fecha_inicio > fecha_fin:
+        raise HTTPException(status_code=400, detail="fecha_inicio no puede ser mayor que fecha_fin")
+
+    def contenido():
+        db = abrir_sesion_lectura()
+        try:
+            filas = crud_ventas.exportar_ventas(
+                db,
+                fecha_inicio=fecha_inicio.isoformat() if fecha_inicio else None,
+                fecha_fin=fecha_fin.isoformat() if fecha_fin else None
+            )
+            lineas = lineas_csv(filas, VentaOut) if formato == "csv" else lineas_ndjson(filas, VentaOut)
+            bloques = en_bloques(lineas)
+            yield from (comprimir_gzip(bloques) if gzip else bloques)
+        finally:
+            db.close()
+
+    nombre = f"ventas.{formato}" + (".gz" if gzip else "")
+    tipo = "application/gzip" if gzip else ("text/csv" if formato == "csv" else "application/x-ndjson")
+    return StreamingResponse(
+        contenido(),
+        media_type=tipo,
+        headers={"Content-Disposition": f'attachment; filename="{nombre}"'}
+    )
+
         
 @router.get("/all-ventas-pag", response_model=ventaPag)
 def get_ventas(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     page: int = Query(1, ge=1),
     page_size: int = Query(10, ge=1, le=100),
-    user_token: UserOut = Depends(get_current_user) 
+    cursor: Optional[str] = Query(None, description=DESCRIPCION_CURSOR),
+    include_total: bool = Query(True, description=DESCRIPCION_INCLUDE_TOTAL),
+    estimated_total: bool = Query(False, description=DESCRIPCION_ESTIMATED_TOTAL),
+    user_token: UserOut = Depends(require_permission(modulo, 'seleccionar')) 
 ):
     try:
-        id_rol = user_token.id_rol
-        if not verify_permissions(db, id_rol, modulo, 'seleccionar'):
-            raise HTTPException(status_code=401, detail="Usuario no autorizado")
-        
         skip = (page - 1) * page_size
-        data = crud_ventas.get_all_ventas_pag(db, skip=skip, limit=page_size)
+        posicion = _posicion_cursor(cursor, crud_ventas.CLAVE_VENTAS)
+        conteo = modo_conteo(include_total, estimated_total)
+        data = crud_ventas.get_all_ventas_pag(db, skip=skip, limit=page_size, despues_de=posicion, conteo=conteo)
         
         total = data["cant_ventas"]
         ventas = data["ventas"]
@@ -106,8 +223,9 @@ def get_ventas(
             "page": page,
             "page_size": page_size,
             "total_ventas": total,
-            "total_pages": (total + page_size - 1) // page_size,
-            "ventas": ventas
+            "total_pages": total_paginas(total, page_size),
+            "ventas": ventas,
+            "next_cursor": codificar_cursor(data["siguiente"]) if data["siguiente"] else None
         }
     except SQLAlchemyError as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -119,17 +237,16 @@ def get_ventas_by_date_range(
     fecha_fin: str = Query(..., description="Fecha final en formato YYYY-MM-DD"),
     page: int = Query(1, ge=1),
     page_size: int = Query(10, ge=1, le=100),
-    db: Session = Depends(get_db),
-    user_token: UserOut = Depends(get_current_user)
+    cursor: Optional[str] = Query(None, description=DESCRIPCION_CURSOR),
+    include_total: bool = Query(True, description=DESCRIPCION_INCLUDE_TOTAL),
+    db: Session = Depends(get_read_db),
+    user_token: UserOut = Depends(require_permission(modulo, 'seleccionar'))
 ):
     try:
-        id_rol = user_token.id_rol
-
-        if not verify_permissions(db, id_rol, modulo, 'seleccionar'):
-            raise HTTPException(status_code=401, detail="Usuario no autorizado")
-
         skip = (page - 1) * page_size
-        data = crud_ventas.get_ventas_by_date_range_pag(db, fecha_inicio=fecha_inicio, fecha_fin=fecha_fin, skip=skip, limit=page_size)
+        posicion = _posicion_cursor(cursor, crud_ventas.CLAVE_VENTAS_FECHA)
+        conteo = modo_conteo(include_total, False)
+        data = crud_ventas.get_ventas_by_date_range_pag(db, fecha_inicio=fecha_inicio, fecha_fin=fecha_fin, skip=skip, limit=page_size, despues_de=posicion, conteo=conteo)
 
         total = data["cant_ventas"]
         ventas = data["ventas"]
@@ -138,9 +255,12 @@ def get_ventas_by_date_range(
             "page": page,
             "page_size": page_size,
             "total_ventas": total,
-            "total_pages": (total + page_size - 1) // page_size,
-            "ventas": ventas
+            "total_pages": total_paginas(total, page_size),
+            "ventas": ventas,
+            "next_cursor": codificar_cursor(data["siguiente"]) if data["siguiente"] else None
         }
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Formato de fecha invalido, use YYYY-MM-DD")
     except SQLAlchemyError as e:
         raise HTTPException(status_code=500, detail=f"Error al obtener las ventas: {e}")
     
@@ -150,17 +270,16 @@ def get_ventas_by_usuario_pag(
     usuario_id: int,
     page: int = Query(1, ge=1),
     page_size: int = Query(10, ge=1, le=100),
-    db: Session = Depends(get_db),
-    user_token: UserOut = Depends(get_current_user)
+    cursor: Optional[str] = Query(None, description=DESCRIPCION_CURSOR),
+    include_total: bool = Query(True, description=DESCRIPCION_INCLUDE_TOTAL),
+    db: Session = Depends(get_read_db),
+    user_token: UserOut = Depends(require_permission(modulo, 'seleccionar'))
 ):
     try:
-        id_rol = user_token.id_rol
-
-        if not verify_permissions(db, id_rol, modulo, 'seleccionar'):
-            raise HTTPException(status_code=401, detail= 'Usuario no autorizado')
-        
         skip = (page - 1) * page_size
-        data = crud_ventas.get_ventas_by_usuario_pag(db, usuario_id=usuario_id, skip=skip, limit=page_size)
+        posicion = _posicion_cursor(cursor, crud_ventas.CLAVE_VENTAS)
+        conteo = modo_conteo(include_total, False)
+        data = crud_ventas.get_ventas_by_usuario_pag(db, usuario_id=usuario_id, skip=skip, limit=page_size, despues_de=posicion, conteo=conteo)
         
         total = data["cant_ventas"]
         ventas = data["ventas"]
@@ -169,8 +288,9 @@ def get_ventas_by_usuario_pag(
             "page": page,
             "page_size": page_size,
             "total_ventas": total,
-            "total_pages": (total + page_size - 1) // page_size,
-            "ventas": ventas
+            "total_pages": total_paginas(total, page_size),
+            "ventas": ventas,
+            "next_cursor": codificar_cursor(data["siguiente"]) if data["siguiente"] else None
         }
     except SQLAlchemyError as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -179,18 +299,18 @@ def get_ventas_by_usuario_pag(
 @router.get("/by-tipo_pago-pag", response_model=ventaPag)
 def get_ventas_by_tipo_pago_pag(
     tipo_id = int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     page: int = Query(1, ge=1),
     page_size: int = Query(10, ge=1, le=100),
-    user_token: UserOut = Depends(get_current_user) 
+    cursor: Optional[str] = Query(None, description=DESCRIPCION_CURSOR),
+    include_total: bool = Query(True, description=DESCRIPCION_INCLUDE_TOTAL),
+    user_token: UserOut = Depends(require_permission(modulo, 'seleccionar')) 
 ):
     try:
-        id_rol = user_token.id_rol
-        if not verify_permissions(db, id_rol, modulo, 'seleccionar'):
-            raise HTTPException(status_code=401, detail="Usuario no autorizado")
-        
         skip = (page - 1) * page_size
-        data = crud_ventas.get_ventas_by_tipo_pago_pag(db, tipo_id=tipo_id, skip=skip, limit=page_size)
+        posicion = _posicion_cursor(cursor, crud_ventas.CLAVE_VENTAS)
+        conteo = modo_conteo(include_total, False)
+        data = crud_ventas.get_ventas_by_tipo_pago_pag(db, tipo_id=tipo_id, skip=skip, limit=page_size, despues_de=posicion, conteo=conteo)
         
         total = data["cant_ventas"]
         ventas = data["ventas"]
@@ -199,8 +319,9 @@ def get_ventas_by_tipo_pago_pag(
             "page": page,
             "page_size": page_size,
             "total_ventas": total,
-            "total_pages": (total + page_size - 1) // page_size,
-            "ventas": ventas
+            "total_pages": total_paginas(total, page_size),
+            "ventas": ventas,
+            "next_cursor": codificar_cursor(data["siguiente"]) if data["siguiente"] else None
         }
     except SQLAlchemyError as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -210,12 +331,8 @@ def get_ventas_by_tipo_pago_pag(
 def get_venta_by_id(    
     venta_id: int,
     db: Session = Depends(get_db),
-    user_token: UserOut = Depends(get_current_user) ):
+    user_token: UserOut = Depends(require_permission(modulo, 'seleccionar')) ):
     try:
-        id_rol = user_token.id_rol
-
-        if not verify_permissions(db, id_rol, modulo, 'seleccionar'):
-            raise HTTPException(status_code=401, detail= 'Usuario no autorizado')
         venta = crud_ventas.get_venta_by_id(db, venta_id)
         if not venta:
             raise HTTPException(status_code=404, detail="Venta no encontrada")
@@ -229,13 +346,9 @@ def update_venta_by_id(
     venta_id: int,
     venta: VentaUpdate,
     db: Session = Depends(get_db),
-    user_token: UserOut = Depends(get_current_user)
+    user_token: UserOut = Depends(require_permission(modulo, 'actualizar'))
 ):
     try:
-        id_rol = user_token.id_rol
-
-        if not verify_permissions(db, id_rol, modulo, 'actualizar'):
-            raise HTTPException(status_code=401, detail= 'Usuario no autorizado')
         success = crud_ventas.update_venta_by_id(db, venta_id, venta)
         if not success:
             raise HTTPException(status_code=400, detail="No se pudo actualizar la venta")
@@ -256,13 +369,9 @@ def cambiar_venta_estado(
     venta_id: int,
     nuevo_estado: bool,
     db: Session = Depends(get_db),
-    user_token: UserOut = Depends(get_current_user)
+    user_token: UserOut = Depends(require_permission(modulo, 'actualizar'))
 ):
     try:
-        id_rol = user_token.id_rol
-        if not verify_permissions(db, id_rol, modulo, 'actualizar'):
-            raise HTTPException(status_code=401, detail="Usuario no autorizado")
-
         success = crud_ventas.cambiar_venta_estado(db, venta_id, nuevo_estado)
         if not success:
             raise HTTPException(status_code=404, detail="Venta no encontrada")
@@ -272,17 +381,28 @@ def cambiar_venta_estado(
         raise HTTPException(status_code=500, detail="Error de base de datos al cambiar el estado de la venta")
     
 
+@router.put("/cancelar-lote", response_model=CancelarLoteResponse)
+def cancelar_ventas(
+    lote: CancelarLoteRequest,
+    db: Session = Depends(get_db),
+    user_token: UserOut = Depends(require_permission(modulo, 'actualizar'))
+):
+    '''
+    Cancela varias ventas en una sola transaccion y devuelve su stock.
+    '''
+    try:
+        return crud_ventas.cancelar_ventas(db, list(dict.fromkeys(lote.ids_venta)))
+    except SQLAlchemyError as e:
+        raise HTTPException(status_code=500, detail="Error de base de datos al cancelar las ventas")
+
+
 @router.delete("/by-id/{venta_id}")
 def delete_venta_by_id(
     venta_id: int,
     db: Session = Depends(get_db),
-    user_token: UserOut = Depends(get_current_user)
+    user_token: UserOut = Depends(require_permission(modulo, 'borrar'))
 ):
     try:
-        id_rol = user_token.id_rol
-
-        if not verify_permissions(db, id_rol, modulo, 'borrar'):
-            raise HTTPException(status_code=401, detail= 'Usuario no autorizado')
         success = crud_ventas.delete_venta_by_id(db, venta_id)
         if not success:
             raise HTTPException(status_code=400, detail="No se pudo eliminar la venta")
@@ -294,15 +414,10 @@ def delete_venta_by_id(
 @router.get("/all-detalles-by-id", response_model=List[DetalleVenta])  
 def get_all_detalle_by_id_venta(
     venta_id: int,
-    db: Session = Depends(get_db),
-    user_token: UserOut = Depends(get_current_user)
+    db: Session = Depends(get_read_db),
+    user_token: UserOut = Depends(require_permission(modulo, 'seleccionar'))
 ):
     try:
-        id_rol = user_token.id_rol  
-        
-        if not verify_permissions(db, id_rol, modulo, 'seleccionar'):
-            raise HTTPException(status_code=401, detail="Usuario no autorizado")
-        
         detalles_venta = crud_ventas.get_all_detalle_by_id_venta(db, venta_id)
 
         if not detalles_venta:
@@ -310,3 +425,20 @@ def get_all_detalle_by_id_venta(
         return detalles_venta
     except SQLAlchemyError as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/detalles-lote", response_model=List[DetallesPorVenta])
+def get_detalles_by_ids_venta(
+    lote: DetallesLoteRequest,
+    db: Session = Depends(get_read_db),
+    user_token: UserOut = Depends(require_permission(modulo, 'seleccionar'))
+):
+    '''
+    Detalles de varias ventas en una sola llamada, agrupados por venta
+    en el orden de ids_venta (sin repetidos).
+    '''
+    try:
+        agrupados = crud_ventas.get_detalles_by_ids_venta(db, list(dict.fromkeys(lote.ids_venta)))
+        return [{"id_venta": id_venta, "detalles": detalles} for id_venta, detalles in agrupados.items()]
+    except SQLAlchemyError as e:
+        raise HTTPException(status_code=500, detail=str(e))
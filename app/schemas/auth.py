@@ -4,4 +4,11 @@ from typing import Optional
 
 class ResponseLoggin(BaseModel):
     user: UserOut
-    access_token: str
\ No newline at end of file
+    access_token: str
+
+# Usuario reconstruido a partir de los claims del token (modo JWT_STATELESS)
+class TokenPrincipal(BaseModel):
+    id_usuario: int
+    id_rol: int
+    email: str
+    estado: bool
@@ -29,3 +29,13 @@ class StockProductosOut(BaseModel):
     color: str
     tamanio: str
 
+class DisponibilidadHuevosOut(BaseModel):
+    tipo: int
+    color: str
+    tamanio: str
+    # total del tipo en huevos sueltos
+    huevos: int
+    unidad_medida: str
+    # empaques completos de unidad_medida y huevos que sobran
+    cantidad: int
+    sobrante: int
@@ -0,0 +1,41 @@
+from pydantic import BaseModel
+from typing import List, Optional
+from datetime import date, datetime
+
+
+class ExistenciaProducto(BaseModel):
+    id_producto: int
+    cantidad: int
+
+
+class ExistenciasAFechaOut(BaseModel):
+    fecha_hora: datetime
+    # dia de la foto de la que se partio (None si no habia ninguna anterior)
+    snapshot: Optional[date]
+    existencias: List[ExistenciaProducto]
+
+
+class DiferenciaExistencias(BaseModel):
+    id_producto: int
+    # ultima foto mas los movimientos posteriores
+    esperado: int
+    actual: int
+    diferencia: int
+
+
+class ConciliacionExistenciasOut(BaseModel):
+    snapshot: Optional[date]
+    diferencias: List[DiferenciaExistencias]
+
+
+class DiferenciaDisponibilidad(BaseModel):
+    tipo: int
+    # huevos recalculados desde stock
+    esperado: int
+    actual: int
+    diferencia: int
+
+
+class ConciliacionHuevosOut(ConciliacionExistenciasOut):
+    # tipos con disponibilidad_huevos desfasada (scripts.reconstruir_disponibilidad la corrige)
+    disponibilidad: List[DiferenciaDisponibilidad]
@@ -27,6 +27,7 @@ class RolOut(RolBase):
 class RolPag(BaseModel):
     page: int
     page_size: int
-    total_roles: int
-    total_pages: int
+    # null cuando se pide include_total=false
+    total_roles: Optional[int]
+    total_pages: Optional[int]
     roles: List[RolOut]
\ No newline at end of file
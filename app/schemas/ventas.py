@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field
 from typing import Any, Dict, List, Optional
-from datetime import datetime
+from datetime import date, datetime
 from decimal import Decimal
 
 class VentaBase(BaseModel):
@@ -24,16 +24,19 @@ class VentaOut(VentaBase):
     nombre_usuario: str
     tipo_pago: int
     metodo_pago: str
-    # este campo es calculado
+    # materializado: lo mantienen los CRUD de detalles (ver app/crud/totales_venta.py)
     total: Decimal
     estado: bool
     
 class ventaPag(BaseModel):
     page: int
     page_size: int
-    total_ventas: int
-    total_pages: int
+    # null cuando se pide include_total=false
+    total_ventas: Optional[int]
+    total_pages: Optional[int]
     ventas: List[VentaOut]
+    # posicion para pedir la pagina siguiente con ?cursor=; None en la ultima pagina
+    next_cursor: Optional[str] = None
     
 
 class DatosVentaCreate(BaseModel):
@@ -61,3 +64,87 @@ class DetalleVenta(BaseModel):
     valor_descuento: Decimal
     precio_venta: Decimal
     
+
+
+# Ventas por peticion en /ventas/detalles-lote
+MAX_VENTAS_DETALLES_LOTE = 500
+
+
+class DetallesLoteRequest(BaseModel):
+    ids_venta: List[int] = Field(min_length=1, max_length=MAX_VENTAS_DETALLES_LOTE)
+
+
+class DetallesPorVenta(BaseModel):
+    id_venta: int
+    detalles: List[DetalleVenta]
+
+
+# Ventas por peticion en /ventas/cancelar-lote
+MAX_VENTAS_CANCELAR_LOTE = 500
+
+
+class CancelarLoteRequest(BaseModel):
+    ids_venta: List[int] = Field(min_length=1, max_length=MAX_VENTAS_CANCELAR_LOTE)
+
+
+class CancelarLoteResponse(BaseModel):
+    canceladas: List[int]
+    ya_canceladas: List[int]
+    no_encontradas: List[int]
+
+
+class LineaCheckout(BaseModel):
+    id_producto: int = Field(gt=0)
+    cantidad: int = Field(gt=0)
+    valor_descuento: Decimal = Field(default=Decimal(0), ge=0)
+    precio_venta: Decimal = Field(ge=0)
+
+
+class VentaCheckout(VentaBase):
+    tipo_pago: int = Field(default=1, gt=0)
+    # id_producto de huevos es stock.id_producto; el de salvamento, salvamento.id_salvamento
+    huevos: List[LineaCheckout] = Field(default_factory=list)
+    salvamento: List[LineaCheckout] = Field(default_factory=list)
+
+
+class VentaCheckoutResponse(BaseModel):
+    message: str
+    data_venta: VentaOut
+    detalles: List[DetalleVenta]
+
+
+class ResumenVentasOut(BaseModel):
+    # primer dia del periodo (el lunes en agrupacion por semana)
+    periodo: date
+    cantidad_ventas: int
+    bruto: Decimal
+    descuento: Decimal
+    neto: Decimal
+
+
+class ProductoHuevosCatalogo(BaseModel):
+    id_producto: int
+    unidad_medida: str
+    color: str
+    tamanio: str
+    disponible: int
+    # version del catalogo en que cambio por ultima vez
+    version: str
+
+
+class ProductoSalvamentoCatalogo(BaseModel):
+    id_salvamento: int
+    raza: str
+    descripcion: str
+    disponible: int
+    version: str
+
+
+class CatalogoOut(BaseModel):
+    version: str
+    # False si solo trae los productos que cambiaron despues de since
+    completo: bool
+    huevos: List[ProductoHuevosCatalogo]
+    salvamento: List[ProductoSalvamentoCatalogo]
+    # productos que dejaron de existir despues de since
+    eliminados: Dict[str, List[int]]
@@ -0,0 +1,348 @@
+"""
+Prueba de carga HTTP de la API: clientes autenticados concurrentes ejecutan una
+mezcla ponderada de escenarios y se mide throughput y latencia p50/p95/p99 por ruta.
+
+Por defecto corre en el mismo proceso con httpx.ASGITransport sobre main:app.
+Con --url se apunta a un servidor ya levantado y con --uvicorn se lanza uno.
+La base es la de DATABASE_URL; para datos de volumen usar scripts.generar_datos.
+
+Uso:
+    DATABASE_URL=sqlite:///avisena.db python -m bench.carga --duracion 30 --clientes 16
+    python -m bench.carga --uvicorn --workers 4 --salida bench/resultados/base.json
+    python -m bench.carga --url http://127.0.0.1:8000 --pesos login=1,ventas_pag=10
+    python -m bench.carga --pesos login=1 --clientes 32     # rafaga de logins
+    python -m bench.carga --uvicorn --clientes 8 --rafaga-login 32   # mixto: rutas normales durante la rafaga
+"""
+from collections import defaultdict
+from datetime import datetime
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+
+os.environ.setdefault("JWT_SECRET", "bench-secret")
+
+import httpx
+
+# Escenario -> peso en la mezcla por defecto
+PESOS = {
+    "login": 2,
+    "crear_venta": 10,
+    "ventas_pag": 30,
+    "ventas_rango": 10,
+    "venta_detalles": 8,
+    "tareas_pag": 15,
+    "stock": 25,
+}
+
+
+def percentil(valores_ordenados, p: float) -> float:
+    '''Percentil por rango mas cercano sobre una lista ya ordenada.'''
+    if not valores_ordenados:
+        return 0.0
+    indice = max(0, min(len(valores_ordenados) - 1, int(round(p / 100 * len(valores_ordenados) + 0.5)) - 1))
+    return valores_ordenados[indice]
+
+
+class Medidor:
+    def __init__(self):
+        self.latencias = defaultdict(list)
+        self.errores = defaultdict(int)
+        self.estados = defaultdict(lambda: defaultdict(int))
+
+    async def pedir(self, cliente: httpx.AsyncClient, ruta: str, metodo: str, url: str, **kwargs):
+        inicio = time.perf_counter()
+        try:
+            respuesta = await cliente.request(metodo, url, **kwargs)
+        except httpx.HTTPError:
+            self.latencias[ruta].append(time.perf_counter() - inicio)
+            self.errores[ruta] += 1
+            self.estados[ruta]["error"] += 1
+            return None
+        self.latencias[ruta].append(time.perf_counter() - inicio)
+        self.estados[ruta][str(respuesta.status_code)] += 1
+        if respuesta.status_code >= 400:
+            self.errores[ruta] += 1
+        return respuesta
+
+    def resumen(self, duracion: float) -> dict:
+        rutas = {}
+        for ruta, valores in sorted(self.latencias.items()):
+            valores = sorted(valores)
+            rutas[ruta] = {
+                "peticiones": len(valores),
+                "errores": self.errores[ruta],
+                "rps": round(len(valores) / duracion, 2),
+                "p50_ms": round(percentil(valores, 50) * 1000, 2),
+                "p95_ms": round(percentil(valores, 95) * 1000, 2),
+                "p99_ms": round(percentil(valores, 99) * 1000, 2),
+                "max_ms": round(valores[-1] * 1000, 2),
+                "estados": dict(self.estados[ruta]),
+            }
+        total = sum(r["peticiones"] for r in rutas.values())
+        return {
+            "peticiones": total,
+            "errores": sum(r["errores"] for r in rutas.values()),
+            "rps": round(total / duracion, 2),
+            "rutas": rutas,
+        }
+
+
+class Contexto:
+    '''Datos descubiertos antes de medir (token, usuario, productos, paginas).'''
+    def __init__(self, args):
+        self.args = args
+        self.token = None
+        self.id_usuario = None
+        self.productos = []
+        self.paginas_ventas = 1
+        self.ventas_creadas = []
+
+
+async def login(cliente, medidor, args):
+    respuesta = await medidor.pedir(
+        cliente, "POST /access/token", "POST", "/access/token",
+        data={"username": args.email, "password": args.password},
+    )
+    if respuesta is None or respuesta.status_code != 200:
+        return None
+    return respuesta.json()
+
+
+async def preparar(cliente, args) -> Contexto:
+    contexto = Contexto(args)
+    datos = await login(cliente, Medidor(), args)
+    if not datos:
+        raise SystemExit(f"No fue posible iniciar sesion con {args.email}")
+    contexto.token = datos["access_token"]
+    contexto.id_usuario = datos["user"]["id_usuario"]
+    cabeceras = {"Authorization": f"Bearer {contexto.token}"}
+
+    productos = await cliente.get("/detalle_huevos/all-products-stock", headers=cabeceras)
+    if productos.status_code == 200:
+        contexto.productos = [p["id_producto"] for p in productos.json()]
+    ventas = await cliente.get("/ventas/all-ventas-pag", params={"page_size": args.page_size}, headers=cabeceras)
+    if ventas.status_code == 200:
+        contexto.paginas_ventas = max(1, min(ventas.json()["total_pages"], args.pagina_max))
+    return contexto
+
+
+async def escenario(nombre, cliente, medidor, contexto, rnd):
+    args = contexto.args
+    cabeceras = {"Authorization": f"Bearer {contexto.token}"}
+
+    if nombre == "login":
+        await login(cliente, medidor, args)
+
+    elif nombre == "crear_venta":
+        if not contexto.productos:
+            return
+        respuesta = await medidor.pedir(
+            cliente, "POST /ventas/crear", "POST", "/ventas/crear", headers=cabeceras,
+            json={"id_usuario": contexto.id_usuario, "fecha_hora": datetime.now().isoformat(timespec="seconds")},
+        )
+        if respuesta is None or respuesta.status_code != 201:
+            return
+        id_venta = respuesta.json()["data_venta"]["id_venta"]
+        contexto.ventas_creadas.append(id_venta)
+        for _ in range(rnd.randint(1, 3)):
+            await medidor.pedir(
+                cliente, "POST /detalle_huevos/crear", "POST", "/detalle_huevos/crear", headers=cabeceras,
+                json={"id_producto": rnd.choice(contexto.productos), "cantidad": rnd.randint(1, 5),
+                      "id_venta": id_venta, "valor_descuento": 0, "precio_venta": 7000},
+            )
+
+    elif nombre == "ventas_pag":
+        await medidor.pedir(
+            cliente, "GET /ventas/all-ventas-pag", "GET", "/ventas/all-ventas-pag", headers=cabeceras,
+            params={"page": rnd.randint(1, contexto.paginas_ventas), "page_size": args.page_size},
+        )
+
+    elif nombre == "ventas_rango":
+        dias = rnd.randint(1, 30)
+        fin = datetime.now().date().toordinal() - rnd.randint(0, 300)
+        await medidor.pedir(
+            cliente, "GET /ventas/all-rango-fechas-pag", "GET", "/ventas/all-rango-fechas-pag", headers=cabeceras,
+            params={"fecha_inicio": datetime.fromordinal(fin - dias).date().isoformat(),
+                    "fecha_fin": datetime.fromordinal(fin).date().isoformat(),
+                    "page": rnd.randint(1, 5), "page_size": args.page_size},
+        )
+
+    elif nombre == "venta_detalles":
+        if contexto.ventas_creadas and rnd.random() < 0.5:
+            id_venta = rnd.choice(contexto.ventas_creadas)
+        else:
+            id_venta = rnd.randint(1, contexto.paginas_ventas * args.page_size)
+        await medidor.pedir(
+            cliente, "GET /ventas/all-detalles-by-id", "GET", "/ventas/all-detalles-by-id",
+            headers=cabeceras, params={"venta_id": id_venta},
+        )
+
+    elif nombre == "tareas_pag":
+        await medidor.pedir(
+            cliente, "GET /tareas/pag", "GET", "/tareas/pag", headers=cabeceras,
+            params={"page": rnd.randint(1, 20), "page_size": args.page_size},
+        )
+
+    elif nombre == "stock":
+        await medidor.pedir(cliente, "GET /detalle_huevos/all-products-stock", "GET",
+                            "/detalle_huevos/all-products-stock", headers=cabeceras)
+
+
+async def cliente_virtual(numero, cliente, medidor, contexto, nombres, pesos, fin):
+    rnd = random.Random(contexto.args.semilla + numero)
+    while time.perf_counter() < fin:
+        await escenario(rnd.choices(nombres, weights=pesos)[0], cliente, medidor, contexto, rnd)
+
+
+async def cliente_login(cliente, medidor, contexto, fin):
+    '''Cliente de la rafaga: solo inicia sesion, una vez tras otra.'''
+    while time.perf_counter() < fin:
+        await login(cliente, medidor, contexto.args)
+
+
+def clientes(cliente, medidor, contexto, nombres, pesos, fin):
+    '''Clientes de la mezcla normal mas los de la rafaga de logins (--rafaga-login).'''
+    args = contexto.args
+    return [cliente_virtual(i, cliente, medidor, contexto, nombres, pesos, fin) for i in range(args.clientes)] + \
+        [cliente_login(cliente, medidor, contexto, fin) for _ in range(args.rafaga_login)]
+
+
+async def ejecutar(args, base_url: str, transporte=None) -> dict:
+    pesos = dict(PESOS)
+    if args.pesos:
+        pesos = {nombre: 0 for nombre in PESOS}
+        for par in args.pesos.split(","):
+            nombre, peso = par.split("=")
+            if nombre not in PESOS:
+                raise SystemExit(f"Escenario desconocido: {nombre} (opciones: {', '.join(PESOS)})")
+            pesos[nombre] = float(peso)
+    nombres = [n for n in pesos if pesos[n] > 0]
+
+    conexiones = args.clientes + args.rafaga_login
+    limites = httpx.Limits(max_connections=conexiones, max_keepalive_connections=conexiones)
+    async with httpx.AsyncClient(base_url=base_url, transport=transporte, limits=limites, timeout=60) as cliente:
+        contexto = await preparar(cliente, args)
+        medidor = Medidor()
+
+        # Calentamiento: no se mide
+        if args.calentamiento:
+            fin = time.perf_counter() + args.calentamiento
+            await asyncio.gather(*clientes(cliente, Medidor(), contexto, nombres, [pesos[n] for n in nombres], fin))
+
+        inicio = time.perf_counter()
+        fin = inicio + args.duracion
+        await asyncio.gather(*clientes(cliente, medidor, contexto, nombres, [pesos[n] for n in nombres], fin))
+        duracion = time.perf_counter() - inicio
+
+        metricas = await cliente.get("/metrics", headers={"Authorization": f"Bearer {contexto.token}"})
+    resultado = medidor.resumen(duracion)
+    resultado["pesos"] = {n: pesos[n] for n in nombres}
+    resultado["metricas_servidor"] = metricas.json() if metricas.status_code == 200 else None
+    return resultado
+
+
+def _puerto_libre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _lanzar_uvicorn(args):
+    puerto = _puerto_libre()
+    proceso = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(puerto),
+         "--workers", str(args.workers), "--log-level", "warning"],
+        env=os.environ.copy(),
+    )
+    limite = time.time() + 30
+    while time.time() < limite:
+        try:
+            with socket.create_connection(("127.0.0.1", puerto), timeout=0.5):
+                return proceso, f"http://127.0.0.1:{puerto}"
+        except OSError:
+            time.sleep(0.2)
+    proceso.terminate()
+    raise SystemExit("uvicorn no inicio a tiempo")
+
+
+def _commit_actual() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="servidor ya levantado; por defecto se usa ASGITransport en proceso")
+    parser.add_argument("--uvicorn", action="store_true", help="lanzar uvicorn main:app en un puerto libre")
+    parser.add_argument("--workers", type=int, default=1, help="procesos de uvicorn con --uvicorn")
+    parser.add_argument("--clientes", type=int, default=8, help="clientes concurrentes")
+    parser.add_argument("--rafaga-login", type=int, default=0,
+                        help="clientes extra que solo piden /access/token mientras los demas siguen la mezcla")
+    parser.add_argument("--duracion", type=float, default=20, help="segundos medidos")
+    parser.add_argument("--calentamiento", type=float, default=2, help="segundos sin medir antes de empezar")
+    parser.add_argument("--pesos", help="mezcla de escenarios, p. ej. login=1,ventas_pag=5 (%s)" % ", ".join(PESOS))
+    parser.add_argument("--page-size", type=int, default=20)
+    parser.add_argument("--pagina-max", type=int, default=500, help="pagina mas profunda pedida en ventas_pag")
+    parser.add_argument("--email", default="admin@avisena.co")
+    parser.add_argument("--password", default="avisena123")
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--salida", help="archivo JSON con los resultados")
+    parser.add_argument("--log-consultas", action="store_true", help="mostrar avisos de consultas lentas y N+1")
+    args = parser.parse_args()
+
+    if not args.log_consultas:
+        # Los avisos se siguen contando en /metrics; aqui solo ensucian la salida
+        logging.getLogger("core.instrumentation").setLevel(logging.ERROR)
+
+    proceso = None
+    if args.uvicorn:
+        proceso, base_url = _lanzar_uvicorn(args)
+        modo, transporte = "uvicorn", None
+    elif args.url:
+        base_url, modo, transporte = args.url, "url", None
+    else:
+        from main import app
+        base_url, modo, transporte = "http://avisena.test", "asgi", httpx.ASGITransport(app=app)
+
+    try:
+        resultado = asyncio.run(ejecutar(args, base_url, transporte))
+    finally:
+        if proceso:
+            proceso.terminate()
+            proceso.wait()
+
+    resultado = {
+        "commit": _commit_actual(),
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "modo": modo,
+        "base_url": base_url,
+        "clientes": args.clientes,
+        "rafaga_login": args.rafaga_login,
+        "duracion_s": args.duracion,
+        **resultado,
+    }
+
+    print(f"{'ruta':42} {'n':>7} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'err':>5}")
+    for ruta, datos in resultado["rutas"].items():
+        print(f"{ruta:42} {datos['peticiones']:>7} {datos['rps']:>8} {datos['p50_ms']:>8} "
+              f"{datos['p95_ms']:>8} {datos['p99_ms']:>8} {datos['errores']:>5}")
+    print(f"{'TOTAL':42} {resultado['peticiones']:>7} {resultado['rps']:>8}")
+
+    if args.salida:
+        os.makedirs(os.path.dirname(args.salida) or ".", exist_ok=True)
+        with open(args.salida, "w", encoding="utf-8") as archivo:
+            json.dump(resultado, archivo, indent=2)
+        print(f"Resultados en {args.salida}")
+
+
+if __name__ == "__main__":
+    main()
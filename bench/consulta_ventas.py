@@ -0,0 +1,92 @@
+"""
+Compara los planes del total en los listados de ventas (app.crud.ventas.consulta_ventas):
+- correlacionado: dos subconsultas por fila sobre los detalles (plan anterior)
+- agregado:       join con los detalles agregados por id_venta, una vez por pagina
+- materializado:  columna ventas.total
+
+Usa la base de DATABASE_URL. Para medir sobre 1M de ventas, cargar antes los datos:
+    python -m scripts.generar_datos --ventas 1000000
+
+Uso:
+    python -m bench.consulta_ventas --repeticiones 5 --limit 50
+"""
+import argparse
+import json
+import os
+import time
+
+os.environ.setdefault("JWT_SECRET", "bench-secret")
+
+from sqlalchemy import text
+
+from core.database import SessionLocal
+from app.crud.ventas import (
+    FILTRO_RANGO_FECHAS, ORDEN_FECHA, TOTAL_AGREGADO, TOTAL_CORRELACIONADO,
+    TOTAL_MATERIALIZADO, _rango_fechas, consulta_ventas,
+)
+
+PLANES = (TOTAL_CORRELACIONADO, TOTAL_AGREGADO, TOTAL_MATERIALIZADO)
+
+
+def casos(db, limit: int) -> list:
+    '''
+    (nombre, argumentos de consulta_ventas, parametros) de las consultas de los listados,
+    con una pagina inicial y otra profunda.
+    '''
+    cantidad, id_usuario, tipo_pago, minimo, maximo = db.execute(text("""
+        SELECT COUNT(*), MAX(id_usuario), MAX(tipo_pago), MIN(fecha_hora), MAX(fecha_hora)
+        FROM ventas
+    """)).one()
+    profundo = max(cantidad - limit, 0) // 2
+    rango = _rango_fechas(str(minimo)[:10], str(maximo)[:10])
+    lista = []
+    for nombre, skip in (("inicio", 0), ("profunda", profundo)):
+        pagina = {"skip": skip, "limit": limit}
+        lista += [
+            (f"todas/{nombre}", {}, pagina),
+            (f"rango_fechas/{nombre}", {"filtros": [FILTRO_RANGO_FECHAS], "orden": ORDEN_FECHA}, {**rango, **pagina}),
+            (f"usuario/{nombre}", {"filtros": ["ventas.id_usuario = :usuario_id"]}, {"usuario_id": id_usuario, **pagina}),
+            (f"tipo_pago/{nombre}", {"filtros": ["ventas.tipo_pago = :tipo_id"]}, {"tipo_id": tipo_pago, **pagina}),
+        ]
+    return cantidad, lista
+
+
+def medir(db, consulta: str, params: dict, repeticiones: int):
+    filas = db.execute(text(consulta), params).mappings().all()  # calentar cache de la BD
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        db.execute(text(consulta), params).mappings().all()
+    return (time.perf_counter() - inicio) / repeticiones * 1000, filas
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--limit", type=int, default=50)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        cantidad, lista = casos(db, args.limit)
+        resultados = {}
+        for nombre, argumentos, params in lista:
+            tiempos = {}
+            referencia = None
+            for plan in PLANES:
+                consulta = consulta_ventas(paginar=True, total=plan, **argumentos)
+                ms, filas = medir(db, consulta, params, args.repeticiones)
+                tiempos[f"{plan}_ms"] = round(ms, 2)
+                totales = [(fila["id_venta"], int(fila["total"])) for fila in filas]
+                if referencia is None:
+                    referencia = totales
+                tiempos[f"{plan}_igual"] = totales == referencia
+            resultados[nombre] = tiempos
+    finally:
+        db.close()
+
+    print(json.dumps({"ventas": cantidad, "limit": args.limit, "repeticiones": args.repeticiones,
+                      "consultas": resultados}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
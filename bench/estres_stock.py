@@ -0,0 +1,173 @@
+"""
+Prueba de concurrencia del descuento de existencias: muchos hilos venden a la vez
+el mismo producto por la API (POST /detalle_huevos/crear o /detalle_salvamento/crear,
+con la autenticacion y la sesion de cada peticion) y al final se verifica que no se
+haya vendido mas de lo que habia:
+
+    vendidas = existencias iniciales - existencias finales = exitos * cantidad
+
+Usa la base de DATABASE_URL (MySQL para medir bloqueos reales) y un usuario activo
+con permiso de insertar en el modulo del detalle. Crea una venta de prueba, fija
+las existencias del producto y al terminar cancela y borra la venta y deja las
+existencias como estaban. Usar sobre una base de prueba.
+
+Con --ventanas-ms se repite la prueba con el descuento linea por linea (0) y con
+el coalescedor de reservas (app.crud.stock) en cada ventana dada, para comparar
+el throughput.
+
+Uso:
+    python -m bench.estres_stock --hilos 32 --intentos 50 --existencias 500
+    python -m bench.estres_stock --tabla detalle_salvamento --producto 3
+    python -m bench.estres_stock --hilos 64 --existencias 100000 --ventanas-ms 0,2,5
+"""
+from concurrent.futures import ThreadPoolExecutor
+from collections import Counter
+from datetime import datetime
+from decimal import Decimal
+from types import SimpleNamespace
+import argparse
+import json
+import os
+import threading
+import time
+
+os.environ.setdefault("JWT_SECRET", "bench-secret")
+
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+from main import app
+from core.database import SessionLocal
+from core.security import create_access_token
+from app.crud import ventas
+from app.crud.stock import INVENTARIOS, configurar_coalescedor
+from app.router import detalle_huevos, detalle_salvamento
+from app.router.dependencies import build_token_claims
+from core.config import settings
+from app.schemas.ventas import VentaCreate
+
+# Ruta de creacion y modulo de permisos de cada tabla de detalle
+CREAR_DETALLE = {
+    "detalle_huevos": ("/detalle_huevos/crear", detalle_huevos.modulo),
+    "detalle_salvamento": ("/detalle_salvamento/crear", detalle_salvamento.modulo),
+}
+
+
+def existencias(db, tabla_detalle: str, id_producto: int) -> int:
+    tabla, columna_id, columna_cantidad = INVENTARIOS[tabla_detalle]
+    return db.execute(text(f"SELECT {columna_cantidad} FROM {tabla} WHERE {columna_id} = :id"),
+                      {"id": id_producto}).scalar()
+
+
+def fijar_existencias(db, tabla_detalle: str, id_producto: int, cantidad: int) -> None:
+    tabla, columna_id, columna_cantidad = INVENTARIOS[tabla_detalle]
+    db.execute(text(f"UPDATE {tabla} SET {columna_cantidad} = :cantidad WHERE {columna_id} = :id"),
+               {"cantidad": cantidad, "id": id_producto})
+    db.commit()
+
+
+def usuario_con_permiso(db, modulo: int):
+    return db.execute(text("""
+        SELECT usuarios.id_usuario, usuarios.id_rol, usuarios.email, usuarios.estado
+        FROM usuarios
+        JOIN roles ON roles.id_rol = usuarios.id_rol AND roles.estado = 1
+        JOIN permisos ON permisos.id_rol = usuarios.id_rol AND permisos.id_modulo = :modulo AND permisos.insertar = 1
+        WHERE usuarios.estado = 1
+        ORDER BY usuarios.id_usuario
+        LIMIT 1
+    """), {"modulo": modulo}).mappings().first()
+
+
+def vendedor(cliente: TestClient, ruta: str, detalle: dict, intentos: int, inicio: threading.Barrier) -> Counter:
+    resultados = Counter()
+    inicio.wait()
+    for _ in range(intentos):
+        respuesta = cliente.post(ruta, json=detalle)
+        if respuesta.status_code == 201:
+            resultados["vendidas"] += 1
+        elif respuesta.status_code == 400:
+            resultados["sin_existencias"] += 1
+        else:
+            resultados["errores"] += 1
+    return resultados
+
+
+def correr(args, ventana_ms: float) -> dict:
+    configurar_coalescedor(ventana_ms)
+    tabla, columna_id, _ = INVENTARIOS[args.tabla]
+    ruta, modulo = CREAR_DETALLE[args.tabla]
+    db = SessionLocal()
+    try:
+        id_producto = args.producto or db.execute(text(f"SELECT MIN({columna_id}) FROM {tabla}")).scalar()
+        usuario = usuario_con_permiso(db, modulo)
+        if id_producto is None or usuario is None:
+            raise SystemExit(f"Se necesita al menos un producto en {tabla} y un usuario activo con permiso de insertar en el modulo {modulo}")
+        originales = existencias(db, args.tabla, id_producto)
+        venta = ventas.create_venta(db, VentaCreate(id_usuario=usuario["id_usuario"], fecha_hora=datetime.now()))
+        fijar_existencias(db, args.tabla, id_producto, args.existencias)
+    finally:
+        db.close()
+
+    cliente = TestClient(app)
+    cliente.headers["Authorization"] = f"Bearer {create_access_token(build_token_claims(SimpleNamespace(**usuario)))}"
+    detalle = {"id_producto": id_producto, "cantidad": args.cantidad, "id_venta": venta["id_venta"],
+               "valor_descuento": 0, "precio_venta": 1000}
+    inicio = threading.Barrier(args.hilos)
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(args.hilos) as pool:
+        parciales = list(pool.map(lambda _: vendedor(cliente, ruta, detalle, args.intentos, inicio), range(args.hilos)))
+    duracion = time.perf_counter() - t0
+    resultados = sum(parciales, Counter())
+
+    db = SessionLocal()
+    try:
+        finales = existencias(db, args.tabla, id_producto)
+        detalles = db.execute(text(f"SELECT COUNT(*) FROM {args.tabla} WHERE id_venta = :id"),
+                              {"id": venta["id_venta"]}).scalar()
+        total = db.execute(text("SELECT total FROM ventas WHERE id_venta = :id"), {"id": venta["id_venta"]}).scalar()
+
+        vendidas = args.existencias - finales
+        informe = {
+            "tabla": args.tabla,
+            "producto": id_producto,
+            "ventana_ms": ventana_ms,
+            "hilos": args.hilos,
+            "intentos": args.hilos * args.intentos,
+            "duracion_s": round(duracion, 2),
+            "ventas_por_s": round((args.hilos * args.intentos) / duracion, 1),
+            **resultados,
+            "existencias_iniciales": args.existencias,
+            "existencias_finales": finales,
+            "sin_sobreventa": finales >= 0 and vendidas == resultados["vendidas"] * args.cantidad == detalles * args.cantidad,
+            "total_consistente": Decimal(total) == Decimal(1000) * args.cantidad * detalles,
+        }
+
+        # Limpiar: cancelar la venta devuelve las existencias y borra los detalles
+        ventas.cambiar_venta_estado(db, venta["id_venta"], False)
+        ventas.delete_venta_by_id(db, venta["id_venta"])
+        fijar_existencias(db, args.tabla, id_producto, originales)
+    finally:
+        db.close()
+    return informe
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tabla", choices=list(CREAR_DETALLE), default="detalle_huevos")
+    parser.add_argument("--producto", type=int, help="id del producto (por defecto, el primero)")
+    parser.add_argument("--hilos", type=int, default=16)
+    parser.add_argument("--intentos", type=int, default=50, help="ventas que intenta cada hilo")
+    parser.add_argument("--cantidad", type=int, default=1, help="unidades por venta")
+    parser.add_argument("--existencias", type=int, default=300, help="existencias iniciales del producto")
+    parser.add_argument("--ventanas-ms", default=str(settings.STOCK_COALESCER_VENTANA_MS),
+                        help="ventanas del coalescedor separadas por coma (0 = descuento por linea)")
+    args = parser.parse_args()
+
+    informes = [correr(args, float(ventana)) for ventana in args.ventanas_ms.split(",")]
+    print(json.dumps(informes if len(informes) > 1 else informes[0], indent=2))
+    if not all(informe["sin_sobreventa"] for informe in informes):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+Micro-benchmark de verify_token: jwt.decode completo vs. acierto en la cache LRU.
+
+Uso:
+    python -m bench.tokens --iteraciones 50000
+"""
+import argparse
+import json
+import os
+import time
+
+os.environ.setdefault("JWT_SECRET", "bench-secret")
+
+from jose import jwt
+
+from core.config import settings
+from core import security
+
+
+def medir(funcion, iteraciones: int) -> float:
+    inicio = time.perf_counter()
+    for _ in range(iteraciones):
+        funcion()
+    return (time.perf_counter() - inicio) / iteraciones * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iteraciones", type=int, default=50000)
+    args = parser.parse_args()
+
+    token = security.create_access_token({"sub": "1", "rol": 1, "email": "bench@avisena.test", "estado": True})
+
+    decode_us = medir(
+        lambda: jwt.decode(token, settings.jwt_secret, algorithms=[settings.jwt_algorithm]),
+        args.iteraciones,
+    )
+    security.verify_token(token)  # calentar la cache
+    cache_us = medir(lambda: security.verify_token(token), args.iteraciones)
+
+    print(json.dumps({
+        "iteraciones": args.iteraciones,
+        "jwt_decode_us": round(decode_us, 2),
+        "cache_hit_us": round(cache_us, 2),
+        "speedup": round(decode_us / cache_us, 1),
+        "cache": security.token_cache_stats(),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
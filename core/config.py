@@ -18,11 +18,52 @@ class Settings(BaseSettings):
     DB_NAME: str = os.getenv("DB_NAME", "")
 
     DATABASE_URL: str = f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+
+    # Replica de lectura (opcional). Si no se define, las lecturas usan la base principal
+    DATABASE_READ_URL: str = os.getenv("DATABASE_READ_URL", "")
+    DB_READ_POOL_SIZE: int = int(os.getenv("DB_READ_POOL_SIZE", "10"))
+    DB_READ_MAX_OVERFLOW: int = int(os.getenv("DB_READ_MAX_OVERFLOW", "20"))
+    # Retraso maximo tolerado de la replica (segundos) y cada cuanto se revisa su estado
+    DB_READ_MAX_LAG: int = int(os.getenv("DB_READ_MAX_LAG", "30"))
+    DB_READ_CHECK_INTERVAL: int = int(os.getenv("DB_READ_CHECK_INTERVAL", "10"))
+
+    # Instrumentacion SQL
+    DB_ECHO: bool = os.getenv("DB_ECHO", "false").lower() in ("1", "true", "yes")
+    DB_SLOW_QUERY_MS: float = float(os.getenv("DB_SLOW_QUERY_MS", "200"))
+    DB_N1_THRESHOLD: int = int(os.getenv("DB_N1_THRESHOLD", "5"))
     
     # Configuración JWT
     jwt_secret: str = os.getenv("JWT_SECRET")
     jwt_algorithm: str = os.getenv("JWT_ALGORITHM", "HS256")
     jwt_access_token_expire_minutes: int = int(os.getenv("JWT_ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
+    # Si esta activo, get_current_user confia en el rol y estado del token sin consultar la BD
+    jwt_stateless: bool = os.getenv("JWT_STATELESS", "false").lower() in ("1", "true", "yes")
+    # Version de los claims; al incrementarla se ignoran los claims de todos los tokens emitidos
+    jwt_principal_version: int = int(os.getenv("JWT_PRINCIPAL_VERSION", "1"))
+    # Tokens decodificados que se mantienen en memoria (0 desactiva la cache)
+    TOKEN_CACHE_SIZE: int = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+
+    # Cache de permisos en memoria (segundos antes de recargar la matriz)
+    PERMISOS_CACHE_TTL: int = int(os.getenv("PERMISOS_CACHE_TTL", "60"))
+
+    # Cache de conteos de los listados paginados (segundos; 0 la desactiva) y entradas maximas
+    CONTEOS_CACHE_TTL: int = int(os.getenv("CONTEOS_CACHE_TTL", "30"))
+    CONTEOS_CACHE_SIZE: int = int(os.getenv("CONTEOS_CACHE_SIZE", "1000"))
+
+    # Listados de ventas: leer ventas.total (true) o calcularlo agregando los detalles de cada pagina
+    VENTAS_TOTAL_MATERIALIZADO: bool = os.getenv("VENTAS_TOTAL_MATERIALIZADO", "true").lower() in ("1", "true", "yes")
+
+    # Ventana (ms) para agrupar reservas concurrentes de un mismo producto en un solo UPDATE (0 la desactiva)
+    STOCK_COALESCER_VENTANA_MS: float = float(os.getenv("STOCK_COALESCER_VENTANA_MS", "0"))
+    # Conexiones propias del coalescedor de reservas (no compiten con las peticiones)
+    STOCK_COALESCER_POOL_SIZE: int = int(os.getenv("STOCK_COALESCER_POOL_SIZE", "5"))
+
+    # Segundos entre recargas completas del catalogo de la pantalla de venta
+    CATALOGO_CACHE_TTL: float = float(os.getenv("CATALOGO_CACHE_TTL", "60"))
+
+    # Inicios de sesion simultaneos (hilos para consulta + bcrypt) y espera maxima en cola (segundos)
+    LOGIN_MAX_CONCURRENCY: int = int(os.getenv("LOGIN_MAX_CONCURRENCY", "4"))
+    LOGIN_QUEUE_TIMEOUT: float = float(os.getenv("LOGIN_QUEUE_TIMEOUT", "10"))
 
 
     class Config:
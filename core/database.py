@@ -1,27 +1,55 @@
 from typing import Generator
 import logging
+import threading
+import time
 
 from sqlalchemy import create_engine, text, MetaData
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker, declarative_base
 from sqlalchemy.exc import SQLAlchemyError, OperationalError, DisconnectionError
-from sqlalchemy.pool import QueuePool
+from sqlalchemy.pool import QueuePool, StaticPool
 
 from core.config import settings 
+from core.instrumentation import instrumentar_engine
+from core.dialect import configurar_sqlite, es_memoria
+from core.schema import crear_esquema, esquema_vacio
 
 # Configurar el módulo de logging de Python y se usa para crear un registrador de eventos (logger)
 logger = logging.getLogger(__name__)
 
+def _crear_engine(url: str, pool_size: int, max_overflow: int):
+    '''
+    Crea un motor para MySQL o SQLite. En SQLite se usa una sola conexion
+    compartida para bases en memoria y se crea el esquema si la base esta vacia.
+    '''
+    url = make_url(url)
+    if url.get_backend_name() == "sqlite":
+        opciones = {"connect_args": {"check_same_thread": False, "timeout": 30}}
+        if es_memoria(url):
+            opciones["poolclass"] = StaticPool  # cada conexion nueva seria una base distinta
+        nuevo = create_engine(url, echo=settings.DB_ECHO, **opciones)
+        configurar_sqlite(nuevo)
+        if esquema_vacio(nuevo):
+            crear_esquema(nuevo)
+    else:
+        nuevo = create_engine(
+            url,
+            echo=settings.DB_ECHO,  # Activar o desactivar el modo debug para imprimir en consola todas las sentencias SQL
+            pool_pre_ping=True,  # Verifica que las conexiones estén activas antes de usarlas
+            pool_recycle=3600,   # Recicla conexiones después de una hora para evitar el error "connection has been closed"
+            pool_size=pool_size,        # Número máximo de conexiones permanentes en el pool
+            max_overflow=max_overflow,  # Conexiones adicionales permitidas temporalmente cuando el pool está lleno
+            pool_timeout=30,     # Tiempo máximo de espera para obtener una conexión del pool
+            poolclass=QueuePool  # Clase de pool para manejo eficiente de conexiones
+        )
+
+    # Medir cada sentencia (conteo por peticion, consultas lentas y N+1)
+    instrumentar_engine(nuevo)
+    return nuevo
+
+
 # Crear el motor de base de datos con configuraciones óptimas
-engine = create_engine(
-    settings.DATABASE_URL,
-    echo=True,           # Activar o desactivar el modo debug para imprimir en consola todas las sentencias SQL
-    pool_pre_ping=True,  # Verifica que las conexiones estén activas antes de usarlas
-    pool_recycle=3600,   # Recicla conexiones después de una hora para evitar el error "connection has been closed"
-    pool_size=10,        # Número máximo de conexiones permanentes en el pool
-    max_overflow=20,     # Conexiones adicionales permitidas temporalmente cuando el pool está lleno
-    pool_timeout=30,     # Tiempo máximo de espera para obtener una conexión del pool
-    poolclass=QueuePool  # Clase de pool para manejo eficiente de conexiones
-)
+engine = _crear_engine(settings.DATABASE_URL, pool_size=10, max_overflow=20)
 
 # Crear la fábrica de sesiones
 # - autocommit=False: Los cambios solo se guardan cuando se hace commit explícitamente
@@ -29,6 +57,35 @@ engine = create_engine(
 # - bind=engine: Vincula la sesión al motor creado anteriormente
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Motor de la replica de lectura (opcional), con su propio pool de conexiones
+read_engine = None
+ReadSessionLocal = None
+if settings.DATABASE_READ_URL:
+    read_engine = _crear_engine(
+        settings.DATABASE_READ_URL,
+        pool_size=settings.DB_READ_POOL_SIZE,
+        max_overflow=settings.DB_READ_MAX_OVERFLOW
+    )
+    ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+
+
+def crear_sesiones_dedicadas(pool_size: int) -> sessionmaker:
+    '''
+    Fabrica de sesiones sobre la base principal con su propio pool de conexiones,
+    para trabajos que no deben competir por conexiones con las peticiones
+    (p. ej. el coalescedor de reservas de app/crud/stock.py). Con SQLite en
+    memoria devuelve SessionLocal: otra conexion seria otra base.
+    '''
+    if es_memoria(make_url(settings.DATABASE_URL)):
+        return SessionLocal
+    dedicado = _crear_engine(settings.DATABASE_URL, pool_size=pool_size, max_overflow=0)
+    return sessionmaker(autocommit=False, autoflush=False, bind=dedicado)
+
+# Estado de la replica: se revisa como maximo cada DB_READ_CHECK_INTERVAL segundos
+_replica_lock = threading.Lock()
+_replica_ok = False
+_replica_revisada_en = 0.0
+
 # Declarar la base para los modelos ORM
 Base = declarative_base()
 
@@ -64,6 +121,112 @@ def get_db() -> Generator:
         # Esto es esencial para evitar fugas de memoria y conexiones abiertas.
 
 
+def _retraso_replica(connection):
+    '''
+    Segundos de retraso de la replica respecto a la principal.
+    Devuelve 0 si el motor no es una replica (p. ej. una base local usada en su lugar)
+    y None si la replicacion esta detenida.
+    '''
+    if connection.dialect.name != "mysql":
+        return 0
+    try:
+        fila = connection.exec_driver_sql("SHOW REPLICA STATUS").mappings().first()
+        columna = "Seconds_Behind_Source"
+    except SQLAlchemyError:
+        # MySQL < 8.0.22 y MariaDB solo conocen la sintaxis anterior
+        fila = connection.exec_driver_sql("SHOW SLAVE STATUS").mappings().first()
+        columna = "Seconds_Behind_Master"
+    if not fila:
+        return 0
+    return fila.get(columna)
+
+
+def replica_disponible() -> bool:
+    '''
+    Indica si la replica de lectura esta accesible y dentro del retraso permitido.
+    El resultado se guarda durante DB_READ_CHECK_INTERVAL segundos.
+    '''
+    global _replica_ok, _replica_revisada_en
+    if read_engine is None:
+        return False
+    ahora = time.monotonic()
+    if ahora - _replica_revisada_en < settings.DB_READ_CHECK_INTERVAL:
+        return _replica_ok
+    with _replica_lock:
+        if ahora - _replica_revisada_en < settings.DB_READ_CHECK_INTERVAL:
+            return _replica_ok
+        try:
+            with read_engine.connect() as connection:
+                connection.execute(text("SELECT 1"))
+                retraso = _retraso_replica(connection)
+            ok = retraso is not None and retraso <= settings.DB_READ_MAX_LAG
+            if not ok:
+                logger.warning(f"Replica de lectura atrasada o detenida (retraso={retraso}), se usa la principal")
+        except SQLAlchemyError as e:
+            logger.error(f"Replica de lectura no disponible, se usa la principal: {str(e)}")
+            ok = False
+        _replica_ok = ok
+        _replica_revisada_en = ahora
+        return ok
+
+
+def _marcar_replica_caida() -> None:
+    '''Fuerza el uso de la principal hasta la siguiente revision.'''
+    global _replica_ok, _replica_revisada_en
+    with _replica_lock:
+        _replica_ok = False
+        _replica_revisada_en = time.monotonic()
+
+
+def _sesion_lectura():
+    '''
+    Sesión sobre la réplica si está disponible, o sobre la principal.
+    La conexión a la réplica se toma aquí mismo: si falla, se marca caída y se
+    usa la principal. Más adelante no se podría reconocer la caída, porque los
+    CRUD envuelven los errores de base de datos en otras excepciones.
+    '''
+    if replica_disponible():
+        db = ReadSessionLocal()
+        try:
+            db.connection()
+            return db
+        except (OperationalError, DisconnectionError) as e:
+            db.close()
+            _marcar_replica_caida()
+            logger.error(f"Replica de lectura no disponible, se usa la principal: {str(e)}")
+    return SessionLocal()
+
+
+def get_read_db() -> Generator:
+    """
+    Dependencia para endpoints de solo lectura.
+
+    Entrega una sesión sobre la réplica de lectura si está configurada,
+    accesible y sin demasiado retraso; en otro caso usa la base principal.
+    Las lecturas que deben ver escrituras recientes (autenticación, permisos,
+    lecturas tras un commit) deben seguir usando get_db.
+    """
+    db = _sesion_lectura()
+    try:
+        yield db
+    except SQLAlchemyError as e:
+        db.rollback()
+        logger.error(f"Error de base de datos: {str(e)}")
+        raise
+    finally:
+        db.close()
+
+
+def abrir_sesion_lectura():
+    """
+    Sesión de solo lectura para usar fuera de una dependencia, por ejemplo
+    dentro del generador de un StreamingResponse, que sigue leyendo después
+    de que el endpoint retornó. Usa la réplica si está disponible.
+    Quien la abre debe cerrarla.
+    """
+    return _sesion_lectura()
+
+
 def check_database_connection() -> bool:
     """
     Verifica la conexión a la base de datos.
@@ -0,0 +1,95 @@
+from datetime import date, datetime
+from decimal import Decimal
+import sqlite3
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+# Diferencias entre MySQL/MariaDB y SQLite que necesita el SQL crudo de app/crud.
+# Todo lo demas (LIMIT/OFFSET, DATE(), COALESCE, subconsultas) es comun a ambos.
+
+
+def nombre_dialecto(db) -> str:
+    '''
+    Nombre del dialecto ("mysql", "sqlite") de una sesion, conexion o motor.
+    '''
+    if isinstance(db, Session):
+        db = db.get_bind()
+    return db.dialect.name
+
+
+def es_sqlite(db) -> bool:
+    return nombre_dialecto(db) == "sqlite"
+
+
+def concat(db, *partes: str) -> str:
+    '''
+    Fragmento SQL que concatena las expresiones dadas.
+    En MySQL se fuerza la collation para poder unirlo con UNION ALL.
+    '''
+    if es_sqlite(db):
+        return "(" + " || ".join(partes) + ")"
+    return f"CONCAT({', '.join(partes)}) COLLATE utf8mb4_general_ci"
+
+
+def es_memoria(url) -> bool:
+    '''Indica si una URL SQLite apunta a una base en memoria.'''
+    return url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")
+
+
+def configurar_sqlite(engine: Engine) -> None:
+    '''
+    Ajusta un motor SQLite para que se comporte como la base MySQL:
+    claves foraneas activas, parametros Decimal/fecha aceptados y WAL
+    para que lectores y escritores concurrentes no se bloqueen entre si.
+    '''
+    sqlite3.register_adapter(Decimal, str)
+    sqlite3.register_adapter(datetime, lambda valor: valor.isoformat(" "))
+    sqlite3.register_adapter(date, lambda valor: valor.isoformat())
+
+    @event.listens_for(engine, "connect")
+    def _al_conectar(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.close()
+
+
+def upsert_sumando(db, claves, columnas) -> str:
+    '''
+    Clausula para INSERT que, si ya existe una fila con la misma clave,
+    suma los valores nuevos a los existentes en las columnas indicadas.
+    '''
+    if es_sqlite(db):
+        asignaciones = ", ".join(f"{columna} = {columna} + excluded.{columna}" for columna in columnas)
+        return f"ON CONFLICT ({', '.join(claves)}) DO UPDATE SET {asignaciones}"
+    asignaciones = ", ".join(f"{columna} = {columna} + VALUES({columna})" for columna in columnas)
+    return f"ON DUPLICATE KEY UPDATE {asignaciones}"
+
+
+def inicio_periodo(db, columna: str, agrupacion: str) -> str:
+    '''
+    Expresion SQL con la fecha en que empieza el dia, la semana (lunes) o el mes
+    de una columna DATE.
+    '''
+    if agrupacion == "dia":
+        return columna
+    if es_sqlite(db):
+        if agrupacion == "semana":
+            return f"DATE({columna}, '-' || ((CAST(strftime('%w', {columna}) AS INTEGER) + 6) % 7) || ' days')"
+        return f"strftime('%Y-%m-01', {columna})"
+    if agrupacion == "semana":
+        return f"DATE_SUB({columna}, INTERVAL WEEKDAY({columna}) DAY)"
+    return f"DATE_FORMAT({columna}, '%Y-%m-01')"
+
+
+def update_desde(db, tabla: str, subconsulta: str, alias: str, condicion: str, asignaciones: str) -> str:
+    '''
+    UPDATE de tabla con los valores de una subconsulta (tabla derivada alias) unida por condicion.
+    En MySQL es UPDATE ... JOIN; en SQLite (3.33+), UPDATE ... FROM.
+    Las columnas de tabla en asignaciones van sin calificar.
+    '''
+    if es_sqlite(db):
+        return f"UPDATE {tabla} SET {asignaciones} FROM ({subconsulta}) AS {alias} WHERE {condicion}"
+    return f"UPDATE {tabla} JOIN ({subconsulta}) AS {alias} ON {condicion} SET {asignaciones}"
@@ -0,0 +1,57 @@
+import csv
+import io
+import zlib
+from typing import Iterable, Iterator, Type
+
+from pydantic import BaseModel
+
+# Serializacion fila a fila para respuestas en streaming: cada fila se valida con
+# el mismo esquema de salida del endpoint JSON (mismos tipos en MySQL y SQLite)
+# y se escribe en bloques de bytes, sin acumular el resultado completo.
+
+FILAS_POR_BLOQUE = 500
+
+
+def lineas_ndjson(filas: Iterable[dict], modelo: Type[BaseModel]) -> Iterator[str]:
+    for fila in filas:
+        yield modelo.model_validate(fila).model_dump_json() + "\n"
+
+
+def lineas_csv(filas: Iterable[dict], modelo: Type[BaseModel]) -> Iterator[str]:
+    columnas = list(modelo.model_fields)
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+
+    escritor.writerow(columnas)
+    for fila in filas:
+        datos = modelo.model_validate(fila).model_dump(mode="json")
+        escritor.writerow([datos[columna] for columna in columnas])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+    if buffer.tell():
+        # Solo el encabezado (sin filas)
+        yield buffer.getvalue()
+
+
+def en_bloques(lineas: Iterable[str], lineas_por_bloque: int = FILAS_POR_BLOQUE) -> Iterator[bytes]:
+    '''
+    Agrupa las lineas para no enviar un fragmento HTTP por fila.
+    '''
+    bloque = []
+    for linea in lineas:
+        bloque.append(linea)
+        if len(bloque) >= lineas_por_bloque:
+            yield "".join(bloque).encode()
+            bloque = []
+    if bloque:
+        yield "".join(bloque).encode()
+
+
+def comprimir_gzip(bloques: Iterable[bytes]) -> Iterator[bytes]:
+    compresor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)  # formato gzip
+    for bloque in bloques:
+        comprimido = compresor.compress(bloque)
+        if comprimido:
+            yield comprimido
+    yield compresor.flush()
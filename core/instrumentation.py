@@ -0,0 +1,109 @@
+from collections import Counter
+from contextvars import ContextVar
+from typing import Optional
+import logging
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class EstadisticasPeticion:
+    '''
+    Consultas ejecutadas durante una peticion HTTP.
+    '''
+    def __init__(self):
+        self.consultas = 0
+        self.tiempo_db = 0.0  # segundos
+        self.sentencias = Counter()
+
+
+# Estadisticas de la peticion en curso (None fuera de una peticion)
+_peticion_actual: ContextVar[Optional[EstadisticasPeticion]] = ContextVar("peticion_sql", default=None)
+
+# Totales del proceso, expuestos por el endpoint de metricas
+_metricas_lock = threading.Lock()
+_metricas = {
+    "consultas": 0,
+    "tiempo_db_ms": 0.0,
+    "consultas_lentas": 0,
+    "peticiones": 0,
+    "peticiones_n_mas_1": 0,
+}
+
+
+def _antes_de_ejecutar(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("inicio_consulta", []).append(time.perf_counter())
+
+
+def _despues_de_ejecutar(conn, cursor, statement, parameters, context, executemany):
+    duracion = time.perf_counter() - conn.info["inicio_consulta"].pop()
+
+    estadisticas = _peticion_actual.get()
+    if estadisticas is not None:
+        estadisticas.consultas += 1
+        estadisticas.tiempo_db += duracion
+        estadisticas.sentencias[statement] += 1
+
+    lenta = duracion * 1000 >= settings.DB_SLOW_QUERY_MS
+    with _metricas_lock:
+        _metricas["consultas"] += 1
+        _metricas["tiempo_db_ms"] += duracion * 1000
+        if lenta:
+            _metricas["consultas_lentas"] += 1
+
+    if lenta:
+        logger.warning(f"Consulta lenta ({duracion * 1000:.1f} ms): {' '.join(statement.split())}")
+
+
+def instrumentar_engine(engine: Engine):
+    '''
+    Registra los eventos que miden cada sentencia ejecutada por el motor.
+    '''
+    event.listen(engine, "before_cursor_execute", _antes_de_ejecutar)
+    event.listen(engine, "after_cursor_execute", _despues_de_ejecutar)
+
+
+def iniciar_peticion():
+    '''
+    Empieza a acumular las consultas de la peticion actual.
+    Devuelve las estadisticas y el token para finalizar_peticion.
+    '''
+    estadisticas = EstadisticasPeticion()
+    return estadisticas, _peticion_actual.set(estadisticas)
+
+
+def finalizar_peticion(token, ruta: str) -> EstadisticasPeticion:
+    '''
+    Deja de acumular consultas y revisa si se repitio la misma sentencia
+    demasiadas veces (patron N+1).
+    '''
+    estadisticas = _peticion_actual.get()
+    _peticion_actual.reset(token)
+
+    repetidas = [
+        (sentencia, veces) for sentencia, veces in estadisticas.sentencias.items()
+        if veces >= settings.DB_N1_THRESHOLD
+    ]
+    for sentencia, veces in repetidas:
+        logger.warning(f"Posible N+1 en {ruta}: {veces} ejecuciones de {' '.join(sentencia.split())[:200]}")
+
+    with _metricas_lock:
+        _metricas["peticiones"] += 1
+        if repetidas:
+            _metricas["peticiones_n_mas_1"] += 1
+    return estadisticas
+
+
+def metricas_sql() -> dict:
+    with _metricas_lock:
+        metricas = dict(_metricas)
+    metricas["tiempo_db_ms"] = round(metricas["tiempo_db_ms"], 3)
+    metricas["umbral_consulta_lenta_ms"] = settings.DB_SLOW_QUERY_MS
+    metricas["umbral_n_mas_1"] = settings.DB_N1_THRESHOLD
+    return metricas
@@ -0,0 +1,58 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Paginacion por cursor (keyset): en vez de OFFSET, el cliente devuelve la
+# posicion de la ultima fila vista y la consulta continua con WHERE clave > posicion.
+# El cursor es opaco para el cliente: JSON en base64 url-safe.
+
+
+def _a_json(valor):
+    if isinstance(valor, datetime):
+        # Mismo formato con que MySQL y SQLite guardan DATETIME
+        return valor.isoformat(" ")
+    raise TypeError(f"Tipo no serializable en cursor: {type(valor).__name__}")
+
+
+def codificar_cursor(posicion: dict) -> str:
+    datos = json.dumps(posicion, default=_a_json, separators=(",", ":"))
+    return base64.urlsafe_b64encode(datos.encode()).decode().rstrip("=")
+
+
+def _convertir(valor, tipo: type):
+    '''Valor del cursor convertido al tipo de su columna; ValueError si no corresponde.'''
+    if tipo is int and isinstance(valor, int) and not isinstance(valor, bool):
+        return valor
+    if tipo is datetime and isinstance(valor, str):
+        return datetime.fromisoformat(valor)
+    raise ValueError("Cursor invalido")
+
+
+def decodificar_cursor(cursor: str, campos: Dict[str, type]) -> dict:
+    '''
+    Devuelve la posicion guardada en el cursor, con cada valor convertido al tipo
+    de su campo ({campo: int | datetime}).
+    Lanza ValueError si el cursor no es valido o no trae los campos esperados.
+    '''
+    try:
+        relleno = "=" * (-len(cursor) % 4)
+        posicion = json.loads(base64.urlsafe_b64decode(cursor + relleno))
+    except (binascii.Error, UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise ValueError("Cursor invalido") from e
+
+    if not isinstance(posicion, dict) or set(posicion) != set(campos):
+        raise ValueError("Cursor invalido")
+    return {campo: _convertir(posicion[campo], tipo) for campo, tipo in campos.items()}
+
+
+def recortar_pagina(filas: List[dict], limit: int, campos: Sequence[str]) -> Tuple[List[dict], Optional[dict]]:
+    '''
+    Las consultas piden limit + 1 filas: si llega la fila extra hay pagina siguiente
+    y su posicion es la de la ultima fila devuelta.
+    '''
+    if len(filas) <= limit:
+        return filas, None
+    filas = filas[:limit]
+    return filas, {campo: filas[-1][campo] for campo in campos}
@@ -0,0 +1,254 @@
+'''
+Cargador del esquema a partir del volcado MySQL (avisena_full.sql) y de las
+migraciones en migrations/, para crear una base SQLite equivalente.
+
+Uso:
+    python -m core.schema --url sqlite:///avisena.db
+    python -m core.schema --sql        # solo imprime el DDL generado
+'''
+from pathlib import Path
+from typing import Dict, List, Optional
+import argparse
+import logging
+import re
+
+from sqlalchemy import inspect
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+RAIZ = Path(__file__).resolve().parent.parent
+VOLCADO = RAIZ / "avisena_full.sql"
+MIGRACIONES = RAIZ / "migrations"
+
+_ENTEROS = {"int", "integer", "tinyint", "smallint", "mediumint", "bigint", "bool", "boolean"}
+_DECIMALES = {"decimal", "numeric"}
+_REALES = {"float", "double", "real"}
+
+
+def _limpiar(sql: str) -> str:
+    '''Quita comentarios "--" y directivas /*! ... */ del volcado.'''
+    sql = re.sub(r"/\*.*?\*/;?", "", sql, flags=re.S)
+    return "\n".join(linea for linea in sql.splitlines() if not linea.strip().startswith("--"))
+
+
+def _dividir(texto: str, separador: str) -> List[str]:
+    '''Divide por el separador ignorando los que estan entre comillas o parentesis.'''
+    partes, actual, nivel, comilla = [], [], 0, None
+    for caracter in texto:
+        if comilla:
+            if caracter == comilla:
+                comilla = None
+        elif caracter in "'\"":
+            comilla = caracter
+        elif caracter == "(":
+            nivel += 1
+        elif caracter == ")":
+            nivel -= 1
+        elif caracter == separador and nivel == 0:
+            partes.append("".join(actual).strip())
+            actual = []
+            continue
+        actual.append(caracter)
+    if "".join(actual).strip():
+        partes.append("".join(actual).strip())
+    return [parte for parte in partes if parte]
+
+
+def _nombre(token: str) -> str:
+    return token.strip().strip("`\"")
+
+
+def _columnas(lista: str) -> List[str]:
+    return [_nombre(columna) for columna in lista.split(",")]
+
+
+def _tabla(modelo: Dict, nombre: str) -> Dict:
+    return modelo.setdefault(nombre, {
+        "columnas": {}, "pk": [], "unicos": [], "indices": [], "fks": []
+    })
+
+
+def _definicion_columna(texto: str) -> Dict:
+    '''Interpreta "`col` tipo(n) UNSIGNED NOT NULL DEFAULT x AUTO_INCREMENT".'''
+    coincidencia = re.match(r"(`[^`]+`|\S+)\s+(\w+)\s*(\([^)]*\))?(.*)$", texto.strip(), re.S)
+    nombre, tipo, argumentos, resto = coincidencia.groups()
+    mayus = resto.upper()
+    default = re.search(r"\bDEFAULT\s+('(?:[^']|'')*'|\S+)", resto, re.I)
+    return {
+        "nombre": _nombre(nombre),
+        "tipo": tipo.lower(),
+        "argumentos": argumentos or "",
+        "nulo": "NOT NULL" not in mayus,
+        "default": default.group(1) if default else None,
+        "auto": "AUTO_INCREMENT" in mayus,
+        "unico": re.search(r"\bUNIQUE\b", mayus) is not None,
+        "pk": "PRIMARY KEY" in mayus,
+    }
+
+
+def _aplicar_clausula(tabla: Dict, clausula: str, nombre_tabla: str) -> None:
+    '''Aplica una clausula de CREATE TABLE o ALTER TABLE al modelo de la tabla.'''
+    clausula = re.sub(r"^ADD\s+", "", clausula.strip(), flags=re.I)
+    mayus = clausula.upper()
+
+    borrado = re.match(r"DROP\s+(?:KEY|INDEX)\s+(?:IF EXISTS\s+)?(\S+)$", clausula, re.I)
+    if borrado:
+        nombre = _nombre(borrado.group(1))
+        tabla["indices"] = [i for i in tabla["indices"] if i[0] != nombre]
+        tabla["unicos"] = [i for i in tabla["unicos"] if i[0] != nombre]
+        return
+    if mayus.startswith("PRIMARY KEY"):
+        tabla["pk"] = _columnas(re.search(r"\(([^)]*)\)", clausula).group(1))
+        return
+    if mayus.startswith("CONSTRAINT") or mayus.startswith("FOREIGN KEY"):
+        fk = re.search(r"FOREIGN KEY\s*\(([^)]*)\)\s*REFERENCES\s+(\S+)\s*\(([^)]*)\)", clausula, re.I)
+        if fk:
+            tabla["fks"].append((_columnas(fk.group(1)), _nombre(fk.group(2)), _columnas(fk.group(3))))
+        return
+    indice = re.match(r"(UNIQUE\s+)?(?:KEY|INDEX)\s+(?:IF NOT EXISTS\s+)?(\S+)?\s*\(([^)]*)\)", clausula, re.I)
+    if indice or mayus.startswith("UNIQUE"):
+        if not indice:
+            indice = re.match(r"(UNIQUE)\s*(\S+)?\s*\(([^)]*)\)", clausula, re.I)
+        unico, nombre, columnas = indice.groups()
+        destino = tabla["unicos"] if unico else tabla["indices"]
+        columnas = _columnas(columnas)
+        destino.append((_nombre(nombre or "_".join(columnas)), columnas))
+        return
+
+    # Definicion o modificacion de columna
+    clausula = re.sub(r"^(MODIFY|CHANGE)\s+(COLUMN\s+)?", "", clausula, flags=re.I)
+    clausula = re.sub(r"^COLUMN\s+", "", clausula, flags=re.I)
+    clausula = re.sub(r"^IF NOT EXISTS\s+", "", clausula, flags=re.I)
+    columna = _definicion_columna(clausula)
+    tabla["columnas"][columna["nombre"]] = columna
+    if columna["pk"]:
+        tabla["pk"] = [columna["nombre"]]
+    if columna["unico"]:
+        tabla["unicos"].append((columna["nombre"], [columna["nombre"]]))
+
+
+def cargar_modelo(rutas: List[Path], modelo: Optional[Dict] = None) -> Dict:
+    '''
+    Construye un modelo {tabla: {...}} con las sentencias DDL de los archivos.
+    Las sentencias de datos (INSERT, UPDATE, SET ...) se ignoran.
+    '''
+    modelo = {} if modelo is None else modelo
+    for ruta in rutas:
+        for sentencia in _dividir(_limpiar(Path(ruta).read_text(encoding="utf-8")), ";"):
+            creacion = re.match(r"CREATE TABLE\s+(?:IF NOT EXISTS\s+)?(\S+)\s*\((.*)\)[^)]*$", sentencia, re.I | re.S)
+            alteracion = re.match(r"ALTER TABLE\s+(\S+)\s+(.*)$", sentencia, re.I | re.S)
+            indice = re.match(r"CREATE\s+(UNIQUE\s+)?INDEX\s+(?:IF NOT EXISTS\s+)?(\S+)\s+ON\s+(\S+)\s*\(([^)]*)\)", sentencia, re.I)
+            if creacion:
+                nombre = _nombre(creacion.group(1))
+                tabla = _tabla(modelo, nombre)
+                for clausula in _dividir(creacion.group(2), ","):
+                    _aplicar_clausula(tabla, clausula, nombre)
+            elif alteracion:
+                nombre = _nombre(alteracion.group(1))
+                tabla = _tabla(modelo, nombre)
+                for clausula in _dividir(alteracion.group(2), ","):
+                    _aplicar_clausula(tabla, clausula, nombre)
+            elif indice:
+                tabla = _tabla(modelo, _nombre(indice.group(3)))
+                destino = tabla["unicos"] if indice.group(1) else tabla["indices"]
+                destino.append((_nombre(indice.group(2)), _columnas(indice.group(4))))
+    return modelo
+
+
+def _tipo_sqlite(columna: Dict) -> str:
+    if columna["tipo"] in _ENTEROS:
+        return "INTEGER"
+    if columna["tipo"] in _DECIMALES:
+        return "NUMERIC"
+    if columna["tipo"] in _REALES:
+        return "REAL"
+    return "TEXT"
+
+
+def _default_sqlite(valor: str) -> str:
+    if valor.lower().startswith("current_timestamp"):
+        return "CURRENT_TIMESTAMP"
+    return valor
+
+
+def ddl_sqlite(modelo: Dict) -> List[str]:
+    '''Sentencias CREATE TABLE / CREATE INDEX equivalentes para SQLite.'''
+    sentencias = []
+    for nombre, tabla in modelo.items():
+        lineas = []
+        pk_simple = len(tabla["pk"]) == 1 and tabla["columnas"].get(tabla["pk"][0], {}).get("tipo") in _ENTEROS
+        for columna in tabla["columnas"].values():
+            if pk_simple and columna["nombre"] == tabla["pk"][0]:
+                auto = " AUTOINCREMENT" if columna["auto"] else ""
+                lineas.append(f'"{columna["nombre"]}" INTEGER PRIMARY KEY{auto}')
+                continue
+            linea = f'"{columna["nombre"]}" {_tipo_sqlite(columna)}'
+            if not columna["nulo"]:
+                linea += " NOT NULL"
+            if columna["default"] is not None:
+                linea += f" DEFAULT {_default_sqlite(columna['default'])}"
+            if columna["tipo"] == "enum":
+                linea += f' CHECK ("{columna["nombre"]}" IN {columna["argumentos"]})'
+            lineas.append(linea)
+        if tabla["pk"] and not pk_simple:
+            lineas.append("PRIMARY KEY (" + ", ".join(f'"{c}"' for c in tabla["pk"]) + ")")
+        for columnas, referencia, columnas_ref in tabla["fks"]:
+            lineas.append(
+                "FOREIGN KEY (" + ", ".join(f'"{c}"' for c in columnas) + f') REFERENCES "{referencia}" ('
+                + ", ".join(f'"{c}"' for c in columnas_ref) + ")"
+            )
+        sentencias.append(f'CREATE TABLE IF NOT EXISTS "{nombre}" (\n    ' + ",\n    ".join(lineas) + "\n)")
+
+        vistos = [tuple(tabla["pk"])]
+        for unico, lista in (("UNIQUE ", tabla["unicos"]), ("", tabla["indices"])):
+            for indice, columnas in lista:
+                if tuple(columnas) in vistos:
+                    continue
+                vistos.append(tuple(columnas))
+                sentencias.append(
+                    f'CREATE {unico}INDEX IF NOT EXISTS "{nombre}_{indice}" ON "{nombre}" ('
+                    + ", ".join(f'"{c}"' for c in columnas) + ")"
+                )
+    return sentencias
+
+
+def archivos_esquema() -> List[Path]:
+    '''Volcado base seguido de las migraciones en orden.'''
+    return [VOLCADO] + sorted(MIGRACIONES.glob("*.sql"))
+
+
+def esquema_vacio(engine: Engine) -> bool:
+    return not inspect(engine).get_table_names()
+
+
+def crear_esquema(engine: Engine, rutas: Optional[List[Path]] = None) -> None:
+    '''
+    Crea en una base SQLite todas las tablas e indices del volcado y las migraciones.
+    Las sentencias de datos se ignoran: disponibilidad_huevos la llena quien cargue
+    stock (scripts.generar_datos, scripts.reconstruir_disponibilidad).
+    '''
+    sentencias = ddl_sqlite(cargar_modelo(rutas or archivos_esquema()))
+    with engine.begin() as connection:
+        for sentencia in sentencias:
+            connection.exec_driver_sql(sentencia)
+    logger.info(f"Esquema SQLite creado ({len(sentencias)} sentencias)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Crea el esquema de AVISENA en una base SQLite")
+    parser.add_argument("--url", default="sqlite:///avisena.db", help="URL SQLAlchemy de la base SQLite")
+    parser.add_argument("--sql", action="store_true", help="Solo imprimir el DDL generado")
+    args = parser.parse_args()
+
+    if args.sql:
+        for sentencia in ddl_sqlite(cargar_modelo(archivos_esquema())):
+            print(sentencia + ";\n")
+    else:
+        from sqlalchemy import create_engine
+        from core.dialect import configurar_sqlite
+
+        motor = create_engine(args.url)
+        configurar_sqlite(motor)
+        crear_esquema(motor)
+        print(f"Esquema creado en {args.url}")
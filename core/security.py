@@ -1,11 +1,27 @@
 from passlib.context import CryptContext
+from collections import OrderedDict
 from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional, Tuple
+import threading
+import time
 from jose import JWTError, jwt
 from core.config import settings
 
 # Configurar hashing de contraseñas
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# Revocaciones en memoria: ("usuario" | "rol", id) -> instante de la revocacion.
+# Los tokens emitidos antes de ese instante dejan de ser confiables y el
+# principal se vuelve a consultar en la base de datos.
+_revocaciones: Dict[Tuple[str, int], float] = {}
+_revocaciones_lock = threading.Lock()
+
+# Cache LRU de tokens ya decodificados: token -> (payload, exp).
+# Evita repetir jwt.decode (HMAC + JSON) para tokens que el cliente reenvia.
+_tokens_cache: "OrderedDict[str, Tuple[dict, float]]" = OrderedDict()
+_tokens_cache_lock = threading.Lock()
+_tokens_cache_stats = {"hits": 0, "misses": 0}
+
 # Función para generar un hashed_password
 def get_hashed_password(password: str):
     return pwd_context.hash(password)
@@ -17,18 +33,81 @@ def verify_password(plain_password: str, hashed_password: str):
 # Función para crear un token JWT
 def create_access_token(data: dict):
     to_encode = data.copy()
-    expire = datetime.now(tz=timezone.utc) + timedelta(minutes=settings.jwt_access_token_expire_minutes)
-    to_encode.update({"exp": expire})
+    now = datetime.now(tz=timezone.utc)
+    expire = now + timedelta(minutes=settings.jwt_access_token_expire_minutes)
+    to_encode.update({"exp": expire, "iat": now.timestamp()})
     encoded_jwt = jwt.encode(to_encode, settings.jwt_secret, algorithm=settings.jwt_algorithm)
     return encoded_jwt
 
-# Función para verificar si un token JWT es valido
-def verify_token(token: str):
+# Función para decodificar un token JWT, devuelve None si no es valido
+def decode_token(token: str) -> Optional[dict]:
+    if settings.TOKEN_CACHE_SIZE > 0:
+        with _tokens_cache_lock:
+            entrada = _tokens_cache.get(token)
+            if entrada is not None:
+                payload, exp = entrada
+                if exp > time.time():
+                    _tokens_cache.move_to_end(token)
+                    _tokens_cache_stats["hits"] += 1
+                    return payload
+                # El token expiro desde que se guardo
+                del _tokens_cache[token]
+            _tokens_cache_stats["misses"] += 1
+
     try:
         payload = jwt.decode(token, settings.jwt_secret, algorithms=[settings.jwt_algorithm])
-        user_id = payload.get("sub")
-        return int(user_id) if user_id is not None else None
     except jwt.ExpiredSignatureError: # Token ha expirado
         return None
     except JWTError:
-        return None
\ No newline at end of file
+        return None
+
+    exp = payload.get("exp")
+    if settings.TOKEN_CACHE_SIZE > 0 and exp is not None:
+        with _tokens_cache_lock:
+            _tokens_cache[token] = (payload, float(exp))
+            _tokens_cache.move_to_end(token)
+            while len(_tokens_cache) > settings.TOKEN_CACHE_SIZE:
+                _tokens_cache.popitem(last=False)
+    return payload
+
+# Estadisticas de la cache de tokens decodificados
+def token_cache_stats() -> dict:
+    with _tokens_cache_lock:
+        return {**_tokens_cache_stats, "size": len(_tokens_cache), "max_size": settings.TOKEN_CACHE_SIZE}
+
+# Función para verificar si un token JWT es valido
+def verify_token(token: str):
+    payload = decode_token(token)
+    if payload is None:
+        return None
+    user_id = payload.get("sub")
+    return int(user_id) if user_id is not None else None
+
+
+def _revocar(tipo: str, id: int):
+    ahora = time.time()
+    vida_token = settings.jwt_access_token_expire_minutes * 60
+    with _revocaciones_lock:
+        # Las revocaciones mas viejas que la vida de un token ya no afectan a nadie
+        for clave in [k for k, v in _revocaciones.items() if ahora - v > vida_token]:
+            del _revocaciones[clave]
+        _revocaciones[(tipo, id)] = ahora
+
+# Invalida los claims de los tokens emitidos a un usuario hasta este momento
+def revocar_tokens_usuario(id_usuario: int):
+    _revocar("usuario", id_usuario)
+
+# Invalida los claims de los tokens emitidos a usuarios de un rol hasta este momento
+def revocar_tokens_rol(id_rol: int):
+    _revocar("rol", id_rol)
+
+# Indica si los claims del token fueron revocados despues de emitirlo
+def token_revocado(payload: dict) -> bool:
+    emitido = payload.get("iat")
+    if emitido is None:
+        return True
+    for clave in (("usuario", int(payload.get("sub", 0))), ("rol", payload.get("rol"))):
+        revocado = _revocaciones.get(clave)
+        if revocado is not None and emitido < revocado:
+            return True
+    return False
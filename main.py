@@ -1,6 +1,13 @@
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 
+from core.instrumentation import iniciar_peticion, finalizar_peticion, metricas_sql
+from core.security import token_cache_stats
+from app.crud.conteos import conteos_cache_stats
+from app.crud.catalogo import catalogo_stats
+from app.crud.disponibilidad_huevos import disponibilidad_stats
+from app.router.dependencies import require_permission
+
 
 from app.router import modulos
 from app.router import permisos
@@ -47,6 +54,30 @@ app.add_middleware(
     allow_headers=["*"],  # Permitir cualquier encabezado en las solicitudes
 )
 
+# Cuenta las consultas SQL de cada peticion y las expone en Server-Timing
+@app.middleware("http")
+async def sql_metrics(request: Request, call_next):
+    _, token = iniciar_peticion()
+    try:
+        response = await call_next(request)
+    finally:
+        estadisticas = finalizar_peticion(token, request.url.path)
+    response.headers["Server-Timing"] = (
+        f'db;dur={estadisticas.tiempo_db * 1000:.2f};desc="{estadisticas.consultas} queries"'
+    )
+    return response
+
+# Tiempos y muestras de SQL por ruta: solo para quien puede consultar el modulo de modulos (administracion)
+@app.get("/metrics", dependencies=[Depends(require_permission(modulos.modulo, 'seleccionar'))])
+def read_metrics():
+    return {
+        "sql": metricas_sql(),
+        "token_cache": token_cache_stats(),
+        "conteos_cache": conteos_cache_stats(),
+        "catalogo": catalogo_stats(),
+        "disponibilidad_huevos": disponibilidad_stats(),
+    }
+
 @app.get("/")
 def read_root():
     return {
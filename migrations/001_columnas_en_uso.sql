@@ -0,0 +1,29 @@
+-- Columnas y tablas que la aplicacion ya usa pero que no estan en avisena_full.sql.
+-- Sintaxis MariaDB (IF NOT EXISTS), se puede aplicar sobre una base que ya las tenga.
+
+ALTER TABLE `roles`
+  ADD COLUMN IF NOT EXISTS `estado` tinyint(1) NOT NULL DEFAULT 1;
+
+ALTER TABLE `usuarios`
+  ADD COLUMN IF NOT EXISTS `estado` tinyint(1) NOT NULL DEFAULT 1;
+
+ALTER TABLE `modulos`
+  ADD COLUMN IF NOT EXISTS `estado` tinyint(1) NOT NULL DEFAULT 1;
+
+ALTER TABLE `ventas`
+  ADD COLUMN IF NOT EXISTS `estado` tinyint(1) NOT NULL DEFAULT 1;
+
+-- La venta se crea sin total; se calcula a partir de sus detalles
+ALTER TABLE `ventas`
+  MODIFY `total` decimal(10,0) NOT NULL DEFAULT 0;
+
+CREATE TABLE IF NOT EXISTS `tipo_huevos` (
+  `id_tipo_huevo` tinyint(3) UNSIGNED NOT NULL AUTO_INCREMENT,
+  `color` varchar(30) NOT NULL,
+  `tamaño` varchar(30) NOT NULL,
+  PRIMARY KEY (`id_tipo_huevo`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
+
+ALTER TABLE `stock`
+  ADD COLUMN IF NOT EXISTS `tipo` tinyint(3) UNSIGNED NOT NULL,
+  ADD KEY IF NOT EXISTS `tipo` (`tipo`);
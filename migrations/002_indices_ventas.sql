@@ -0,0 +1,18 @@
+-- Indices para los listados paginados de ventas (app/crud/ventas.py).
+-- Cada uno cubre el filtro y el ORDER BY de su consulta, de modo que la pagina
+-- se lee en orden del indice sin recorrer la tabla ni ordenar en memoria:
+--   all-rango-fechas(-pag)  WHERE fecha_hora >= ? AND fecha_hora < ?  ORDER BY fecha_hora, id_venta
+--   by-id-usuario-pag       WHERE id_usuario = ?                      ORDER BY id_venta
+--   by-tipo_pago-pag        WHERE tipo_pago = ?                       ORDER BY id_venta
+-- Las claves simples id_usuario y tipo_pago del volcado quedan de sobra: el
+-- compuesto empieza por la misma columna y sirve tambien a las llaves foraneas
+-- ventas_ibfk_1/2. Mientras existan, el optimizador puede preferirlas (la llave
+-- primaria ya va al final de todo indice secundario) y la migracion no se nota.
+-- Se comprueban con: python -m scripts.verificar_indices
+
+ALTER TABLE `ventas`
+  ADD KEY IF NOT EXISTS `fecha_hora_id_venta` (`fecha_hora`, `id_venta`),
+  ADD KEY IF NOT EXISTS `id_usuario_id_venta` (`id_usuario`, `id_venta`),
+  ADD KEY IF NOT EXISTS `tipo_pago_id_venta` (`tipo_pago`, `id_venta`),
+  DROP KEY IF EXISTS `id_usuario`,
+  DROP KEY IF EXISTS `tipo_pago`;
@@ -0,0 +1,18 @@
+-- Resumen diario de ventas para los tableros (/ventas/resumen).
+-- Lo mantienen los CRUD de ventas y detalles justo despues del commit de cada
+-- cambio, en una transaccion propia (app/crud/totales_venta.py); se reconstruye con scripts.reconstruir_resumen.
+--   cantidad_ventas: ventas activas (estado = 1)
+--   bruto:           SUM(precio_venta * cantidad) de los detalles
+--   descuento:       SUM(valor_descuento * cantidad) de los detalles
+--   neto:            bruto - descuento (igual a la suma de ventas.total)
+
+CREATE TABLE IF NOT EXISTS `ventas_resumen_diario` (
+  `dia` date NOT NULL,
+  `tipo_pago` tinyint(3) UNSIGNED NOT NULL,
+  `id_usuario` int(10) UNSIGNED NOT NULL,
+  `cantidad_ventas` int(11) NOT NULL DEFAULT 0,
+  `bruto` decimal(14,0) NOT NULL DEFAULT 0,
+  `descuento` decimal(14,0) NOT NULL DEFAULT 0,
+  `neto` decimal(14,0) NOT NULL DEFAULT 0,
+  PRIMARY KEY (`dia`, `tipo_pago`, `id_usuario`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
@@ -0,0 +1,34 @@
+-- Libro de movimientos de existencias y fotos diarias (app/crud/stock.py,
+-- app/crud/movimientos_stock.py).
+-- movimientos_stock: un registro por cada cambio de stock.cantidad_disponible o
+--   salvamento.cantidad_gallinas hecho por ventas, escrito en la misma transaccion.
+--   Con el coalescedor de reservas la fila de la venta se escribe al reservar, sin
+--   id_detalle, y la venta se lo pone al confirmarse (ver app/crud/stock.py).
+--   Solo se agregan filas; delta es negativo al vender y positivo al devolver.
+--   No tiene claves foraneas: conserva la historia aunque se borren ventas o detalles.
+-- snapshots_stock: existencias de cada producto al cierre del dia, calculadas con
+--   la foto anterior y los movimientos del dia (python -m scripts.compactar_stock).
+--   Las consultas "a una fecha" parten de la foto anterior y leen solo los
+--   movimientos posteriores a ella.
+
+CREATE TABLE IF NOT EXISTS `movimientos_stock` (
+  `id_movimiento` bigint(20) UNSIGNED NOT NULL AUTO_INCREMENT,
+  `inventario` enum('stock','salvamento') NOT NULL,
+  `id_producto` int(10) UNSIGNED NOT NULL,
+  `delta` int(11) NOT NULL,
+  `motivo` enum('venta','ajuste','devolucion','cancelacion') NOT NULL,
+  `id_venta` int(10) UNSIGNED DEFAULT NULL,
+  `id_detalle` int(10) UNSIGNED DEFAULT NULL,
+  `fecha_hora` datetime NOT NULL,
+  PRIMARY KEY (`id_movimiento`),
+  KEY `inventario_producto_fecha` (`inventario`, `id_producto`, `fecha_hora`),
+  KEY `inventario_fecha` (`inventario`, `fecha_hora`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
+
+CREATE TABLE IF NOT EXISTS `snapshots_stock` (
+  `inventario` enum('stock','salvamento') NOT NULL,
+  `dia` date NOT NULL,
+  `id_producto` int(10) UNSIGNED NOT NULL,
+  `cantidad` int(11) NOT NULL,
+  PRIMARY KEY (`inventario`, `dia`, `id_producto`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
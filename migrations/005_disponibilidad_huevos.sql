@@ -0,0 +1,21 @@
+-- Existencias de huevos por tipo, en huevos sueltos (app/crud/disponibilidad_huevos.py).
+-- Cada fila de stock es un empaque (unidad, docena, medio_panal, panal); esta tabla
+-- suma cantidad_disponible * huevos por empaque de todas las filas del mismo tipo.
+-- La ajusta app/crud/stock.py despues del commit de cada cambio de stock; se
+-- reconstruye con scripts.reconstruir_disponibilidad (p. ej. tras cargar
+-- produccion por fuera de la API).
+-- huevos es bigint: con existencias grandes la suma de un tipo no cabe en int.
+-- Huevos por empaque: unidad = 1, docena = 12, medio_panal = 15, panal = 30.
+
+CREATE TABLE IF NOT EXISTS `disponibilidad_huevos` (
+  `tipo` tinyint(3) UNSIGNED NOT NULL,
+  `huevos` bigint(20) NOT NULL DEFAULT 0,
+  PRIMARY KEY (`tipo`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
+
+INSERT INTO `disponibilidad_huevos` (`tipo`, `huevos`)
+SELECT `tipo`, SUM(`cantidad_disponible` * CASE `unidad_medida`
+    WHEN 'unidad' THEN 1 WHEN 'docena' THEN 12 WHEN 'medio_panal' THEN 15 WHEN 'panal' THEN 30 END)
+FROM `stock`
+GROUP BY `tipo`
+ON DUPLICATE KEY UPDATE `huevos` = VALUES(`huevos`);
@@ -0,0 +1,59 @@
+"""
+Escribe las fotos diarias de existencias (snapshots_stock) a partir del libro
+movimientos_stock, un dia por transaccion, desde el dia siguiente a la ultima foto
+hasta --hasta. Sin fotos previas escribe solo la de --hasta.
+
+Pensado para correr cada dia despues de medianoche (cron): por defecto compacta
+hasta ayer, asi que no toca el dia en curso. Los movimientos no se borran.
+
+Uso:
+    python -m scripts.compactar_stock
+    python -m scripts.compactar_stock --hasta 2025-12-31 --inventario detalle_huevos
+"""
+from datetime import date, timedelta
+import argparse
+import os
+import time
+
+os.environ.setdefault("JWT_SECRET", "compactar-stock")
+
+from core.database import SessionLocal
+from app.crud.stock import INVENTARIOS
+from app.crud.movimientos_stock import compactar_dia, ultimo_snapshot
+
+
+def compactar(db, tabla_detalle: str, hasta: date) -> int:
+    '''
+    Escribe las fotos que faltan del inventario hasta el dia dado (incluido),
+    un commit por dia. Devuelve las filas escritas.
+    '''
+    ultimo = ultimo_snapshot(db, tabla_detalle)
+    dia = ultimo + timedelta(days=1) if ultimo else hasta
+    filas = 0
+    while dia <= hasta:
+        filas += compactar_dia(db, tabla_detalle, dia)
+        db.commit()
+        dia += timedelta(days=1)
+    return filas
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compacta movimientos_stock en fotos diarias")
+    parser.add_argument("--hasta", type=date.fromisoformat, default=date.today() - timedelta(days=1),
+                        help="ultimo dia a compactar (por defecto, ayer)")
+    parser.add_argument("--inventario", choices=list(INVENTARIOS), action="append",
+                        help="tabla de detalle del inventario (por defecto, todos)")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        for tabla_detalle in args.inventario or INVENTARIOS:
+            inicio = time.perf_counter()
+            filas = compactar(db, tabla_detalle, args.hasta)
+            print(f"{INVENTARIOS[tabla_detalle][0]}: {filas} filas hasta {args.hasta} en {time.perf_counter() - inicio:.1f}s")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,416 @@
+"""
+Generador de datos sinteticos para pruebas de volumen.
+
+Llena todas las tablas de avisena_full.sql (mas tipo_huevos) con datos
+referencialmente consistentes sobre la base de DATABASE_URL (MySQL o SQLite).
+Los ids se asignan en el script, por lo que las tablas deben estar vacias
+(usar --limpiar para vaciarlas antes).
+
+Todos los usuarios comparten la contraseña --password; el usuario
+admin@avisena.co es Superadmin con todos los permisos.
+
+Uso:
+    DATABASE_URL=sqlite:///avisena.db python -m scripts.generar_datos --ventas 1000000
+    python -m scripts.generar_datos --limpiar --ventas 3000000 --lecturas 5000000
+"""
+from bisect import bisect
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from itertools import accumulate
+import argparse
+import json
+import os
+import random
+import time
+
+os.environ.setdefault("JWT_SECRET", "generador-datos")
+
+from sqlalchemy import text
+
+from core.database import engine
+from core.security import get_hashed_password
+from app.crud.totales_venta import recalcular_resumen
+from app.crud.disponibilidad_huevos import recalcular_disponibilidad
+
+# Limites de las columnas de id/cantidad (tinyint/smallint unsigned) del esquema
+MAX_TINYINT = 255
+MAX_SMALLINT = 65535
+
+# Modulos usados por los routers (variable `modulo` de cada uno)
+MODULOS = [
+    (1, "modulos"), (2, "permisos"), (3, "roles"), (4, "usuarios"), (5, "ventas"),
+    (6, "tareas"), (7, "detalle_huevos"), (8, "metodo_pago"), (9, "detalle_salvamento"),
+    (10, "usuarios_admin"), (11, "fincas"),
+]
+ROLES = [
+    (1, "Superadmin", "Acceso total al sistema"),
+    (2, "Administrador", "Administra la granja"),
+    (3, "Vendedor", "Registra ventas"),
+    (4, "Operario", "Atiende galpones y tareas"),
+]
+# Permisos (insertar, actualizar, seleccionar, borrar) por rol; el Superadmin tiene todos
+PERMISOS_ROL = {
+    2: lambda modulo: (1, 1, 1, modulo not in (1, 2, 3)),
+    3: lambda modulo: (1, 1, 1, 0) if modulo in (5, 7, 9) else (0, 0, modulo in (8, 6), 0),
+    4: lambda modulo: (0, 1, 1, 0) if modulo == 6 else (0, 0, 0, 0),
+}
+METODOS_PAGO = [(1, "Efectivo", 60), (2, "Transferencia", 25), (3, "Tarjeta", 12), (4, "Credito", 3)]
+TIPOS_HUEVO = [("Blanco", "A"), ("Blanco", "AA"), ("Blanco", "AAA"), ("Rojo", "A"), ("Rojo", "AA"), ("Rojo", "AAA"), ("Rojo", "Jumbo")]
+# Unidad de venta: (huevos por unidad, precio aproximado por unidad, peso en las ventas)
+UNIDADES = {"unidad": (1, 600, 10), "docena": (12, 7000, 35), "medio_panal": (15, 8500, 20), "panal": (30, 16000, 35)}
+RAZAS = ["Lohmann Brown", "Hy-Line", "Isa Brown", "Babcock", "Novogen", "Dekalb"]
+TIPOS_SENSOR = [("Temperatura", "C"), ("Luz", "lm"), ("Humedad", "%")]
+TIPOS_INCIDENTE = ["Enfermedad", "Herida", "Muerte", "Fuga", "Ataque Depredador", "Produccion", "Alimentacion", "Plaga", "Estres termico", "Otro"]
+ESTADOS_TAREA = [("Completada", 55), ("En proceso", 10), ("Pendiente", 15), ("Asignada", 15), ("Cancelada", 5)]
+NOMBRES = ["Ana", "Luis", "Carlos", "Maria", "Juan", "Laura", "Andres", "Paula", "Jorge", "Diana", "Felipe", "Camila", "Oscar", "Sofia", "Julian", "Natalia"]
+APELLIDOS = ["Garcia", "Rodriguez", "Martinez", "Lopez", "Gonzalez", "Perez", "Sanchez", "Ramirez", "Torres", "Diaz", "Moreno", "Rojas"]
+# Peso de cada hora del dia en las ventas (la granja vende sobre todo en la mañana)
+PESO_HORA = [0, 0, 0, 0, 0, 1, 4, 8, 10, 10, 9, 7, 5, 6, 7, 6, 5, 3, 2, 1, 0, 0, 0, 0]
+
+# Tablas en orden inverso de dependencias, para --limpiar
+ORDEN_BORRADO = [
+    "ventas_resumen_diario", "disponibilidad_huevos", "movimientos_stock", "snapshots_stock", "detalle_huevos", "detalle_salvamento", "ventas", "tareas", "registro_sensores", "aislamiento",
+    "incidentes_gallina", "incidentes_generales", "stock", "produccion_huevos", "salvamento",
+    "ingreso_gallinas", "sensores", "tipo_sensores", "inventario_finca", "categoria_inventario",
+    "galpones", "fincas", "tipo_huevos", "tipo_gallinas", "metodo_pago", "usuarios", "permisos",
+    "modulos", "roles",
+]
+
+
+class Ponderado:
+    '''
+    Eleccion aleatoria con pesos fijos (acumulados una sola vez, a diferencia de random.choices).
+    '''
+    def __init__(self, valores, pesos):
+        self.valores = list(valores)
+        self.acumulados = list(accumulate(pesos))
+
+    def elegir(self, rnd: random.Random):
+        return self.valores[bisect(self.acumulados, rnd.random() * self.acumulados[-1])]
+
+
+_HORAS = Ponderado(range(24), PESO_HORA)
+
+
+class Cargador:
+    '''
+    Inserta filas por lotes (executemany) y confirma cada lote.
+    '''
+    def __init__(self, conexion, lote: int):
+        self.conexion = conexion
+        self.lote = lote
+        self.conteos = defaultdict(int)
+        self.tiempos = defaultdict(float)
+        self._pendientes = defaultdict(list)
+        self._sentencias = {}
+
+    def agregar(self, tabla: str, fila: dict) -> None:
+        self.encolar(tabla, fila)
+        if self.pendientes(tabla) >= self.lote:
+            self.vaciar(tabla)
+
+    def encolar(self, tabla: str, fila: dict) -> None:
+        '''Agrega sin vaciar, para controlar el orden entre tablas relacionadas.'''
+        self._pendientes[tabla].append(fila)
+
+    def pendientes(self, tabla: str) -> int:
+        return len(self._pendientes[tabla])
+
+    def vaciar(self, tabla: str) -> None:
+        filas = self._pendientes[tabla]
+        if not filas:
+            return
+        if tabla not in self._sentencias:
+            # SQL del driver (sin compilar por fila en SQLAlchemy): "?" en SQLite, "%s" en PyMySQL
+            columnas = list(filas[0])
+            marca = "?" if self.conexion.dialect.paramstyle == "qmark" else "%s"
+            self._sentencias[tabla] = (
+                f"INSERT INTO {tabla} ({', '.join(columnas)}) VALUES ({', '.join([marca] * len(columnas))})",
+                columnas,
+            )
+        sentencia, columnas = self._sentencias[tabla]
+        inicio = time.perf_counter()
+        self.conexion.exec_driver_sql(sentencia, [tuple(fila[c] for c in columnas) for fila in filas])
+        self.conexion.commit()
+        self.tiempos[tabla] += time.perf_counter() - inicio
+        self.conteos[tabla] += len(filas)
+        self._pendientes[tabla] = []
+
+    def insertar(self, tabla: str, filas) -> None:
+        for fila in filas:
+            self.agregar(tabla, fila)
+        self.vaciar(tabla)
+
+
+def _limitar(nombre: str, valor: int, maximo: int) -> int:
+    if valor > maximo:
+        print(f"--{nombre} limitado a {maximo} por el tipo de la columna en el esquema")
+        return maximo
+    return valor
+
+
+def _nombre_persona(rnd: random.Random) -> str:
+    return f"{rnd.choice(NOMBRES)} {rnd.choice(APELLIDOS)} {rnd.choice(APELLIDOS)}"
+
+
+def _momento(rnd: random.Random, inicio: date, dias: int) -> datetime:
+    '''Fecha y hora con mas ventas en dias recientes y en horas de la mañana.'''
+    dia = int(dias * (rnd.random() ** 0.8))  # la actividad crece hacia el final del periodo
+    hora = _HORAS.elegir(rnd)
+    return datetime.combine(inicio + timedelta(days=dia), datetime.min.time()) + timedelta(
+        hours=hora, minutes=rnd.randrange(60), seconds=rnd.randrange(60)
+    )
+
+
+def limpiar(conexion) -> None:
+    for tabla in ORDEN_BORRADO:
+        conexion.execute(text(f"DELETE FROM {tabla}"))
+    conexion.commit()
+
+
+def generar(conexion, args) -> Cargador:
+    rnd = random.Random(args.semilla)
+    carga = Cargador(conexion, args.lote)
+    fin = date.today()
+    inicio = fin - timedelta(days=args.dias - 1)
+    galpones = _limitar("galpones", args.galpones, MAX_TINYINT)
+    sensores = _limitar("sensores", args.sensores, MAX_TINYINT)
+    productos = _limitar("productos", args.productos, MAX_SMALLINT)
+    tareas = _limitar("tareas", args.tareas, MAX_SMALLINT)
+    salvamentos = _limitar("salvamentos", args.salvamentos, MAX_SMALLINT)
+
+    # Seguridad: roles, modulos, permisos y usuarios
+    carga.insertar("roles", ({"id_rol": i, "nombre_rol": n, "descripcion": d, "estado": 1} for i, n, d in ROLES))
+    carga.insertar("modulos", ({"id_modulo": i, "nombre_modulo": n, "estado": 1} for i, n in MODULOS))
+    permisos = []
+    for id_modulo, _ in MODULOS:
+        permisos.append((id_modulo, 1, (1, 1, 1, 1)))
+        for id_rol, regla in PERMISOS_ROL.items():
+            permisos.append((id_modulo, id_rol, regla(id_modulo)))
+    carga.insertar("permisos", (
+        {"id_modulo": m, "id_rol": r, "insertar": int(p[0]), "actualizar": int(p[1]), "seleccionar": int(p[2]), "borrar": int(p[3])}
+        for m, r, p in permisos
+    ))
+
+    pass_hash = get_hashed_password(args.password)  # un solo hash bcrypt para todos
+    roles_usuario = [1] * 2 + [2] * 5 + [3] * 60 + [4] * 33
+    vendedores = []
+    def usuarios():
+        yield {"id_usuario": 1, "nombre": "Administrador Avisena", "id_rol": 1, "email": "admin@avisena.co",
+               "telefono": "3000000000", "documento": "1000000000", "pass_hash": pass_hash, "estado": 1}
+        for id_usuario in range(2, args.usuarios + 1):
+            id_rol = rnd.choice(roles_usuario)
+            if id_rol in (2, 3):
+                vendedores.append(id_usuario)
+            yield {"id_usuario": id_usuario, "nombre": _nombre_persona(rnd), "id_rol": id_rol,
+                   "email": f"usuario{id_usuario}@avisena.co", "telefono": f"3{rnd.randrange(10**9):09d}",
+                   "documento": str(1000000000 + id_usuario), "pass_hash": pass_hash,
+                   "estado": int(rnd.random() < 0.95)}
+    carga.insertar("usuarios", usuarios())
+    vendedores = vendedores or [1]
+    # Pocos vendedores concentran la mayoria de ventas (distribucion tipo Zipf)
+    vendedor = Ponderado(vendedores, [1 / (rango + 1) ** 1.1 for rango in range(len(vendedores))])
+
+    carga.insertar("metodo_pago", ({"id_tipo": i, "nombre": n, "descripcion": f"Pago en {n.lower()}", "estado": 1} for i, n, _ in METODOS_PAGO))
+
+    # Granja: fincas, galpones, gallinas, sensores e inventario
+    fincas = max(1, galpones // 8)
+    carga.insertar("fincas", ({"id_finca": i, "nombre": f"Finca {i}", "longitud": -74 + rnd.random(), "latitud": 4 + rnd.random(), "estado": 1} for i in range(1, fincas + 1)))
+    capacidad = {}
+    def filas_galpones():
+        for i in range(1, galpones + 1):
+            capacidad[i] = rnd.randrange(2000, 12000, 500)
+            yield {"id_galpon": i, "id_finca": (i - 1) % fincas + 1, "nombre": f"Galpon {i}",
+                   "capacidad": capacidad[i], "cant_actual": int(capacidad[i] * rnd.uniform(0.6, 0.95))}
+    carga.insertar("galpones", filas_galpones())
+    carga.insertar("tipo_gallinas", ({"id_tipo_gallinas": i, "raza": r, "descripcion": f"Gallina ponedora {r}"} for i, r in enumerate(RAZAS, 1)))
+    carga.insertar("tipo_huevos", ({"id_tipo_huevo": i, "color": c, "tamaño": t} for i, (c, t) in enumerate(TIPOS_HUEVO, 1)))
+    carga.insertar("tipo_sensores", ({"id_tipo": i, "nombre": n, "descripcion": f"Sensor de {n.lower()}", "modelo": f"AV-{i:02d}"} for i, (n, _) in enumerate(TIPOS_SENSOR, 1)))
+    carga.insertar("sensores", ({"id_sensor": i, "nombre": f"Sensor {i}", "id_tipo_sensor": (i - 1) % len(TIPOS_SENSOR) + 1,
+                                 "id_galpon": (i - 1) % galpones + 1, "descripcion": "Sensor instalado en galpon"} for i in range(1, sensores + 1)))
+    carga.insertar("categoria_inventario", ({"id_categoria": i, "nombre": n, "descripcion": None} for i, n in enumerate(["Alimento", "Medicamento", "Vacuna", "Insumo"], 1)))
+    carga.insertar("inventario_finca", ({"id_inventario": i, "nombre": f"Articulo {i}", "cantidad": rnd.randrange(10, 2000),
+                                         "unidad_medida": rnd.choice(["Lb", "Kg"]), "descripcion": "Articulo de inventario",
+                                         "id_categoria": rnd.randrange(1, 5), "id_finca": rnd.randrange(1, fincas + 1)} for i in range(1, fincas * 40 + 1)))
+    carga.insertar("ingreso_gallinas", ({"id_ingreso": i, "id_galpon": i, "fecha": inicio, "id_tipo_gallina": rnd.randrange(1, len(RAZAS) + 1),
+                                         "cantidad_gallinas": int(capacidad[i] * 0.9)} for i in range(1, galpones + 1)))
+
+    # Produccion diaria por galpon; los lotes mas recientes quedan en stock
+    def produccion():
+        id_produccion = 0
+        for dia in range(args.dias):
+            fecha = inicio + timedelta(days=dia)
+            for id_galpon in range(1, galpones + 1):
+                id_produccion += 1
+                yield {"id_produccion": id_produccion, "id_galpon": id_galpon, "cantidad": int(capacidad[id_galpon] * rnd.uniform(0.7, 0.9)),
+                       "fecha": fecha, "id_tipo_huevo": rnd.randrange(1, len(TIPOS_HUEVO) + 1)}
+    carga.insertar("produccion_huevos", produccion())
+    total_produccion = args.dias * galpones
+
+    unidades = list(UNIDADES)
+    unidad_vendida = Ponderado(unidades, [UNIDADES[u][2] for u in unidades])
+    stock = {}
+    def filas_stock():
+        for id_producto in range(1, productos + 1):
+            unidad = unidades[(id_producto - 1) % len(unidades)]
+            id_tipo = ((id_producto - 1) // len(unidades)) % len(TIPOS_HUEVO) + 1
+            stock[id_producto] = (unidad, id_tipo)
+            yield {"id_producto": id_producto, "unidad_medida": unidad, "id_produccion": total_produccion - rnd.randrange(min(total_produccion, galpones * 7)),
+                   "cantidad_disponible": args.stock_inicial, "tipo": id_tipo}
+    carga.insertar("stock", filas_stock())
+    productos_por_unidad = defaultdict(list)
+    for id_producto, (unidad, _) in stock.items():
+        productos_por_unidad[unidad].append(id_producto)
+
+    disponible_salvamento = {}
+    def filas_salvamento():
+        for i in range(1, salvamentos + 1):
+            disponible_salvamento[i] = rnd.randrange(20, 400)
+            yield {"id_salvamento": i, "id_galpon": rnd.randrange(1, galpones + 1), "fecha": inicio + timedelta(days=rnd.randrange(args.dias)),
+                   "id_tipo_gallina": rnd.randrange(1, len(RAZAS) + 1), "cantidad_gallinas": disponible_salvamento[i]}
+    carga.insertar("salvamento", filas_salvamento())
+
+    incidentes = max(1, args.dias * galpones // 20)
+    carga.insertar("incidentes_gallina", ({"id_inc_gallina": i, "galpon_origen": rnd.randrange(1, galpones + 1), "tipo_incidente": rnd.choice(TIPOS_INCIDENTE),
+                                           "cantidad": rnd.randrange(1, 30), "descripcion": "Incidente registrado", "fecha_hora": _momento(rnd, inicio, args.dias),
+                                           "esta_resuelto": int(rnd.random() < 0.8)} for i in range(1, incidentes + 1)))
+    carga.insertar("aislamiento", ({"id_aislamiento": i, "id_incidente_gallina": rnd.randrange(1, incidentes + 1), "fecha_hora": _momento(rnd, inicio, args.dias),
+                                    "id_galpon": rnd.randrange(1, galpones + 1)} for i in range(1, incidentes // 4 + 1)))
+    carga.insertar("incidentes_generales", ({"id_incidente": i, "descripcion": "Novedad en la finca", "fecha_hora": _momento(rnd, inicio, args.dias),
+                                             "id_finca": rnd.randrange(1, fincas + 1), "esta_resuelta": int(rnd.random() < 0.85)} for i in range(1, incidentes // 2 + 1)))
+
+    # Lecturas de sensores repartidas uniformemente en el periodo
+    def lecturas():
+        por_sensor = max(1, args.lecturas // max(sensores, 1))
+        paso = timedelta(seconds=args.dias * 86400 / por_sensor)
+        base = {"C": (24, 4), "lm": (300, 120), "%": (65, 10)}
+        id_registro = 0
+        for id_sensor in range(1, sensores + 1):
+            medida = TIPOS_SENSOR[(id_sensor - 1) % len(TIPOS_SENSOR)][1]
+            media, desviacion = base[medida]
+            momento = datetime.combine(inicio, datetime.min.time())
+            for _ in range(por_sensor):
+                id_registro += 1
+                yield {"id_registro": id_registro, "id_sensor": id_sensor, "dato_sensor": round(rnd.gauss(media, desviacion), 2),
+                       "fecha_hora": momento, "u_medida": medida}
+                momento += paso
+    if sensores:
+        carga.insertar("registro_sensores", lecturas())
+
+    estado_tarea = Ponderado([e for e, _ in ESTADOS_TAREA], [p for _, p in ESTADOS_TAREA])
+    def filas_tareas():
+        for i in range(1, tareas + 1):
+            inicio_tarea = _momento(rnd, inicio, args.dias)
+            yield {"id_tarea": i, "id_usuario": rnd.randrange(1, args.usuarios + 1), "descripcion": f"Tarea programada {i}",
+                   "fecha_hora_init": inicio_tarea, "estado": estado_tarea.elegir(rnd),
+                   "fecha_hora_fin": inicio_tarea + timedelta(hours=rnd.randrange(1, 48))}
+    carga.insertar("tareas", filas_tareas())
+
+    # Ventas con sus detalles; la venta se inserta antes que sus detalles en cada lote
+    metodo = Ponderado([i for i, _, _ in METODOS_PAGO], [p for _, _, p in METODOS_PAGO])
+    items_por_venta = Ponderado((1, 2, 3, 4), (50, 30, 15, 5))
+    vendido = defaultdict(int)
+    id_detalle_huevo = id_detalle_salvamento = 0
+    for id_venta in range(1, args.ventas + 1):
+        cancelada = rnd.random() < 0.03
+        total = 0
+        detalles_huevos, detalles_salvamento = [], []
+        if not cancelada:  # cancelar una venta elimina sus detalles
+            for _ in range(items_por_venta.elegir(rnd)):
+                unidad = unidad_vendida.elegir(rnd)
+                id_producto = rnd.choice(productos_por_unidad[unidad])
+                cantidad = min(int(rnd.expovariate(1 / 3)) + 1, 60)
+                precio = UNIDADES[unidad][1] + rnd.randrange(-5, 6) * 100
+                descuento = 0 if rnd.random() < 0.8 else precio * rnd.choice((5, 10)) // 100
+                id_detalle_huevo += 1
+                vendido[id_producto] += cantidad
+                total += (precio - descuento) * cantidad
+                detalles_huevos.append({"id_detalle": id_detalle_huevo, "id_producto": id_producto, "cantidad": cantidad,
+                                        "id_venta": id_venta, "valor_descuento": descuento, "precio_venta": precio})
+            if disponible_salvamento and rnd.random() < 0.08:
+                id_salvamento = rnd.randrange(1, salvamentos + 1)
+                cantidad = min(rnd.randrange(1, 15), disponible_salvamento[id_salvamento])
+                if cantidad > 0:
+                    disponible_salvamento[id_salvamento] -= cantidad
+                    precio = rnd.randrange(15, 30) * 1000
+                    id_detalle_salvamento += 1
+                    total += precio * cantidad
+                    detalles_salvamento.append({"id_detalle": id_detalle_salvamento, "id_producto": id_salvamento, "cantidad": cantidad,
+                                                "id_venta": id_venta, "valor_descuento": 0, "precio_venta": precio})
+        carga.encolar("ventas", {"id_venta": id_venta, "fecha_hora": _momento(rnd, inicio, args.dias),
+                                 "id_usuario": vendedor.elegir(rnd),
+                                 "tipo_pago": metodo.elegir(rnd), "total": total,
+                                 "estado": int(not cancelada)})
+        for detalle in detalles_huevos:
+            carga.encolar("detalle_huevos", detalle)
+        for detalle in detalles_salvamento:
+            carga.encolar("detalle_salvamento", detalle)
+        if carga.pendientes("ventas") >= args.lote:
+            for tabla in ("ventas", "detalle_huevos", "detalle_salvamento"):
+                carga.vaciar(tabla)
+    for tabla in ("ventas", "detalle_huevos", "detalle_salvamento"):
+        carga.vaciar(tabla)
+
+    # Descontar lo vendido del stock y del salvamento
+    if vendido:
+        conexion.execute(text("UPDATE stock SET cantidad_disponible = cantidad_disponible - :vendido WHERE id_producto = :id_producto"),
+                         [{"vendido": v, "id_producto": p} for p, v in vendido.items()])
+    if disponible_salvamento:
+        conexion.execute(text("UPDATE salvamento SET cantidad_gallinas = :cantidad WHERE id_salvamento = :id_salvamento"),
+                         [{"cantidad": c, "id_salvamento": i} for i, c in disponible_salvamento.items()])
+    conexion.commit()
+
+    # Stock cargado sin pasar por los CRUD: la disponibilidad por tipo se arma al final
+    inicio_disponibilidad = time.perf_counter()
+    carga.conteos["disponibilidad_huevos"] = recalcular_disponibilidad(conexion)
+    carga.tiempos["disponibilidad_huevos"] += time.perf_counter() - inicio_disponibilidad
+    conexion.commit()
+
+    # Las ventas se insertan sin pasar por los CRUD: el resumen diario se arma al final
+    if args.ventas:
+        inicio_resumen = time.perf_counter()
+        carga.conteos["ventas_resumen_diario"] = recalcular_resumen(conexion, inicio, fin + timedelta(days=1))
+        carga.tiempos["ventas_resumen_diario"] += time.perf_counter() - inicio_resumen
+        conexion.commit()
+    return carga
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--usuarios", type=int, default=200)
+    parser.add_argument("--ventas", type=int, default=100000)
+    parser.add_argument("--tareas", type=int, default=20000)
+    parser.add_argument("--lecturas", type=int, default=200000, help="filas de registro_sensores")
+    parser.add_argument("--galpones", type=int, default=24)
+    parser.add_argument("--sensores", type=int, default=72)
+    parser.add_argument("--productos", type=int, default=56, help="filas de stock")
+    parser.add_argument("--salvamentos", type=int, default=500)
+    parser.add_argument("--dias", type=int, default=365, help="dias de historia hacia atras desde hoy")
+    parser.add_argument("--stock-inicial", type=int, default=2_000_000_000)
+    parser.add_argument("--password", default="avisena123", help="contraseña de todos los usuarios")
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--lote", type=int, default=5000, help="filas por INSERT multi-fila")
+    parser.add_argument("--limpiar", action="store_true", help="vaciar las tablas antes de generar")
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    with engine.connect() as conexion:
+        if args.limpiar:
+            limpiar(conexion)
+        elif conexion.execute(text("SELECT COUNT(*) FROM usuarios")).scalar():
+            parser.error("la base ya tiene datos; usar --limpiar para vaciarla")
+        carga = generar(conexion, args)
+    duracion = time.perf_counter() - inicio
+
+    filas = sum(carga.conteos.values())
+    print(json.dumps({
+        "base": engine.url.render_as_string(hide_password=True),
+        "filas": filas,
+        "segundos": round(duracion, 1),
+        "filas_por_segundo": int(filas / duracion) if duracion else None,
+        "tablas": {tabla: {"filas": n, "segundos": round(carga.tiempos[tabla], 2)} for tabla, n in sorted(carga.conteos.items())},
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
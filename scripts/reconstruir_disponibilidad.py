@@ -0,0 +1,29 @@
+"""
+Reconstruye disponibilidad_huevos (huevos disponibles por tipo) a partir de stock.
+
+La tabla la mantiene app/crud/stock.py con cada venta; este script la rehace
+cuando el stock cambia por fuera de la API (carga de produccion, SQL directo).
+
+Uso:
+    python -m scripts.reconstruir_disponibilidad
+"""
+import os
+
+os.environ.setdefault("JWT_SECRET", "reconstruir-disponibilidad")
+
+from core.database import SessionLocal
+from app.crud.disponibilidad_huevos import recalcular_disponibilidad
+
+
+def main():
+    db = SessionLocal()
+    try:
+        tipos = recalcular_disponibilidad(db)
+        db.commit()
+        print(f"Disponibilidad de {tipos} tipos de huevo reconstruida")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Reconstruye ventas_resumen_diario a partir de ventas y sus detalles.
+
+El resumen lo mantienen los CRUD de ventas y detalles; este script lo rehace
+para datos cargados por fuera de la API (scripts.generar_datos, SQL directo)
+o para corregir diferencias. Procesa un mes por transaccion.
+
+Uso:
+    python -m scripts.reconstruir_resumen
+    python -m scripts.reconstruir_resumen --desde 2025-01-01 --hasta 2025-12-31
+"""
+from datetime import date, timedelta
+import argparse
+import os
+import time
+
+os.environ.setdefault("JWT_SECRET", "reconstruir-resumen")
+
+from sqlalchemy import text
+
+from core.database import SessionLocal
+from app.crud.totales_venta import recalcular_resumen
+
+
+def _mes_siguiente(dia: date) -> date:
+    return (dia.replace(day=1) + timedelta(days=32)).replace(day=1)
+
+
+def reconstruir(db, desde: date, hasta: date) -> int:
+    '''
+    Reconstruye los dias entre desde y hasta (ambos incluidos), un mes por commit.
+    Devuelve las filas escritas en el resumen.
+    '''
+    filas = 0
+    inicio = desde
+    while inicio <= hasta:
+        fin = min(_mes_siguiente(inicio), hasta + timedelta(days=1))
+        filas += recalcular_resumen(db, inicio, fin)
+        db.commit()
+        inicio = fin
+    return filas
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reconstruye ventas_resumen_diario")
+    parser.add_argument("--desde", type=date.fromisoformat, help="primer dia (por defecto, el de la venta mas antigua)")
+    parser.add_argument("--hasta", type=date.fromisoformat, help="ultimo dia (por defecto, el de la venta mas reciente)")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        minimo, maximo = db.execute(text("SELECT MIN(fecha_hora), MAX(fecha_hora) FROM ventas")).one()
+        if minimo is None:
+            print("No hay ventas")
+            return
+        desde = args.desde or date.fromisoformat(str(minimo)[:10])
+        hasta = args.hasta or date.fromisoformat(str(maximo)[:10])
+
+        inicio = time.perf_counter()
+        filas = reconstruir(db, desde, hasta)
+        print(f"{filas} filas de resumen ({desde} a {hasta}) en {time.perf_counter() - inicio:.1f}s")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
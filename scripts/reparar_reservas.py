@@ -0,0 +1,57 @@
+"""
+Devuelve a las existencias las reservas del coalescedor de stock que quedaron sin
+vender (app/crud/stock.py, STOCK_COALESCER_VENTANA_MS > 0).
+
+El coalescedor confirma cada reserva, con su movimiento en movimientos_stock, antes
+que la venta; si el proceso cae entre los dos commits o falla la devolucion, las
+existencias quedan descontadas sin detalle de venta. Este script las encuentra en el
+libro y las devuelve con un movimiento "devolucion", una transaccion por reserva.
+Es idempotente: una reserva devuelta no vuelve a aparecer.
+
+Uso:
+    python -m scripts.reparar_reservas
+    python -m scripts.reparar_reservas --minutos 30 --inventario detalle_huevos
+"""
+from datetime import datetime, timedelta
+import argparse
+import os
+
+os.environ.setdefault("JWT_SECRET", "reparar-reservas")
+
+from core.database import SessionLocal
+from app.crud.stock import INVENTARIOS, devolver_reserva
+from app.crud.movimientos_stock import reservas_sin_vender
+
+
+def reparar(db, tabla_detalle: str, antes_de: datetime) -> int:
+    '''
+    Devuelve las reservas sin vender del inventario anteriores a antes_de.
+    Devuelve cuantas se repararon.
+    '''
+    reservas = reservas_sin_vender(db, tabla_detalle, antes_de)
+    for reserva in reservas:
+        devolver_reserva(db, tabla_detalle, reserva["id_producto"], reserva["cantidad"], reserva["id_venta"])
+        db.commit()
+    return len(reservas)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Devuelve las reservas de stock que quedaron sin vender")
+    parser.add_argument("--minutos", type=float, default=10,
+                        help="solo reservas sin movimientos en los ultimos N minutos (por defecto, 10)")
+    parser.add_argument("--inventario", choices=list(INVENTARIOS), action="append",
+                        help="tabla de detalle del inventario (por defecto, todos)")
+    args = parser.parse_args()
+
+    antes_de = datetime.now() - timedelta(minutes=args.minutos)
+    db = SessionLocal()
+    try:
+        for tabla_detalle in args.inventario or INVENTARIOS:
+            reparadas = reparar(db, tabla_detalle, antes_de)
+            print(f"{INVENTARIOS[tabla_detalle][0]}: {reparadas} reservas devueltas")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
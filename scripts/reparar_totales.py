@@ -0,0 +1,55 @@
+"""
+Recalcula ventas.total a partir de detalle_huevos y detalle_salvamento.
+
+ventas.total lo mantienen los CRUD de detalles; este script corrige las ventas
+cuyo total no coincide (cargas directas por SQL, datos anteriores a la
+columna materializada, etc.). Recorre las ventas por rangos de id_venta y
+hace commit por lote para no bloquear la tabla completa.
+
+Uso:
+    python -m scripts.reparar_totales --verificar
+    python -m scripts.reparar_totales --lote 20000
+"""
+import argparse
+import os
+import time
+
+os.environ.setdefault("JWT_SECRET", "reparar-totales")
+
+from sqlalchemy import text
+
+from core.database import SessionLocal
+from app.crud.totales_venta import contar_totales_incorrectos, recalcular_totales
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recalcula ventas.total desde los detalles")
+    parser.add_argument("--lote", type=int, default=10000, help="ventas por transaccion")
+    parser.add_argument("--verificar", action="store_true", help="solo cuenta las ventas con total incorrecto")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        minimo, maximo = db.execute(text("SELECT MIN(id_venta), MAX(id_venta) FROM ventas")).one()
+        if minimo is None:
+            print("No hay ventas")
+            return
+
+        inicio = time.perf_counter()
+        afectadas = 0
+        for desde in range(minimo, maximo + 1, args.lote):
+            hasta = desde + args.lote - 1
+            if args.verificar:
+                afectadas += contar_totales_incorrectos(db, desde, hasta)
+            else:
+                afectadas += recalcular_totales(db, desde, hasta)
+                db.commit()
+
+        accion = "con total incorrecto" if args.verificar else "corregidas"
+        print(f"{afectadas} ventas {accion} (ids {minimo}-{maximo}) en {time.perf_counter() - inicio:.1f}s")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Comprueba con EXPLAIN que los listados de ventas usan sus indices.
+
+Ejecuta las funciones de app/crud/ventas.py contra DATABASE_URL, captura el SQL
+que envian al motor y lo pasa por EXPLAIN (MySQL) o EXPLAIN QUERY PLAN (SQLite).
+Falla si una consulta no usa el indice esperado sobre ventas o si ordena en
+memoria (filesort / temp b-tree). Conviene correrlo con datos cargados
+(scripts.generar_datos) porque el optimizador decide segun las estadisticas.
+
+Uso:
+    python -m scripts.verificar_indices
+    DATABASE_URL=sqlite:///avisena.db python -m scripts.verificar_indices
+"""
+from typing import List, Optional
+import os
+import sys
+
+os.environ.setdefault("JWT_SECRET", "verificar-indices")
+
+from sqlalchemy import event, text
+
+from core.database import SessionLocal, engine
+from core.dialect import es_sqlite
+from app.crud import ventas as crud_ventas
+
+# Indice compuesto (migrations/002) que debe usar cada consulta. Las claves simples
+# id_usuario y tipo_pago del volcado no cuentan: si el optimizador las prefiere, la
+# migracion no esta sirviendo.
+INDICE_FECHA = {"fecha_hora_id_venta"}
+INDICE_USUARIO = {"id_usuario_id_venta"}
+INDICE_TIPO_PAGO = {"tipo_pago_id_venta"}
+
+
+def capturar(db, funcion, *args, **kwargs):
+    '''
+    Ejecuta la funcion del CRUD y devuelve las sentencias (sql, parametros)
+    que consultan la tabla ventas.
+    '''
+    sentencias = []
+
+    def _antes(conn, cursor, statement, parameters, context, executemany):
+        if "FROM ventas" in statement:
+            sentencias.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", _antes)
+    try:
+        funcion(db, *args, **kwargs)
+    finally:
+        event.remove(engine, "before_cursor_execute", _antes)
+    return sentencias
+
+
+def plan_mysql(conexion, sql, parametros):
+    filas = conexion.exec_driver_sql("EXPLAIN " + sql, parametros).mappings().all()
+    fila = next((f for f in filas if f["table"] == "ventas"), {})
+    extra = " ".join(str(f["Extra"] or "") for f in filas)
+    return fila.get("key"), "filesort" in extra.lower()
+
+
+def plan_sqlite(conexion, sql, parametros):
+    detalles = [fila[-1] for fila in conexion.exec_driver_sql("EXPLAIN QUERY PLAN " + sql, parametros).all()]
+    indice = None
+    for detalle in detalles:
+        if detalle.startswith(("SEARCH ventas", "SCAN ventas")) and " INDEX " in detalle:
+            # Los indices se crean como "<tabla>_<nombre>" (core/schema.py)
+            indice = detalle.split(" INDEX ")[1].split()[0].removeprefix("ventas_")
+    return indice, any("TEMP B-TREE" in detalle for detalle in detalles)
+
+
+def verificar(db) -> Optional[List[dict]]:
+    '''
+    Plan de cada consulta de los listados de ventas: nombre, consulta (datos o conteo),
+    indice usado, si ordena en memoria y si es correcto. None si no hay ventas.
+    '''
+    fila = db.execute(text("""
+        SELECT id_usuario, tipo_pago, fecha_hora FROM ventas ORDER BY id_venta DESC LIMIT 1
+    """)).mappings().first()
+    if fila is None:
+        return None
+
+    dia = str(fila["fecha_hora"])[:10]
+    cursor_fecha = {"fecha_hora": fila["fecha_hora"], "id_venta": 0}
+    casos = [
+        ("all-rango-fechas", INDICE_FECHA, crud_ventas.get_ventas_by_date_range, (dia, dia), {}),
+        ("all-rango-fechas-pag", INDICE_FECHA, crud_ventas.get_ventas_by_date_range_pag, (dia, dia), {}),
+        ("all-rango-fechas-pag (cursor)", INDICE_FECHA, crud_ventas.get_ventas_by_date_range_pag, (dia, dia), {"despues_de": cursor_fecha}),
+        ("by-id-usuario-pag", INDICE_USUARIO, crud_ventas.get_ventas_by_usuario_pag, (fila["id_usuario"],), {}),
+        ("by-id-usuario-pag (cursor)", INDICE_USUARIO, crud_ventas.get_ventas_by_usuario_pag, (fila["id_usuario"],), {"despues_de": {"id_venta": 0}}),
+        ("by-tipo_pago-pag", INDICE_TIPO_PAGO, crud_ventas.get_ventas_by_tipo_pago_pag, (fila["tipo_pago"],), {}),
+        ("by-tipo_pago-pag (cursor)", INDICE_TIPO_PAGO, crud_ventas.get_ventas_by_tipo_pago_pag, (fila["tipo_pago"],), {"despues_de": {"id_venta": 0}}),
+    ]
+
+    plan = plan_sqlite if es_sqlite(engine) else plan_mysql
+    resultados = []
+    with engine.connect() as conexion:
+        for nombre, esperados, funcion, args, kwargs in casos:
+            for sql, parametros in capturar(db, funcion, *args, **kwargs):
+                consulta = "conteo" if "COUNT(" in sql else "datos"
+                indice, ordena = plan(conexion, sql, parametros)
+                resultados.append({
+                    "nombre": nombre, "consulta": consulta, "indice": indice, "ordena": ordena,
+                    # El conteo no tiene ORDER BY; solo importa el indice
+                    "correcto": indice in esperados and not (ordena and consulta == "datos"),
+                })
+    return resultados
+
+
+def main():
+    db = SessionLocal()
+    try:
+        resultados = verificar(db)
+        if resultados is None:
+            print("No hay ventas; cargar datos con scripts.generar_datos")
+            return 1
+        for r in resultados:
+            estado = "OK   " if r["correcto"] else "FALLA"
+            print(f"{estado} {r['nombre']:<32} {r['consulta']:<7} indice={r['indice']} ordena_en_memoria={r['ordena']}")
+        return 0 if all(r["correcto"] for r in resultados) else 1
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
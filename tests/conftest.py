@@ -0,0 +1,57 @@
+"""
+Base de pruebas: SQLite en un archivo temporal (varias conexiones, como en
+produccion) con el esquema del volcado y las migraciones (core/schema.py), un
+usuario Superadmin con todos los permisos y un producto de stock y de salvamento.
+"""
+import os
+import tempfile
+
+_directorio = tempfile.mkdtemp(prefix="avisena-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_directorio, 'avisena.db')}"
+os.environ.pop("DATABASE_READ_URL", None)
+os.environ.setdefault("JWT_SECRET", "tests")
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+from core.database import engine
+from core.security import get_hashed_password
+from app.crud.disponibilidad_huevos import recalcular_disponibilidad
+
+CLAVE = "clave-pruebas"
+
+
+@pytest.fixture(scope="session")
+def datos_base():
+    with engine.begin() as conexion:
+        ejecutar = conexion.exec_driver_sql
+        ejecutar("INSERT INTO roles (id_rol, nombre_rol, descripcion, estado) VALUES (1, 'Superadmin', 'Todo', 1)")
+        for modulo in range(1, 12):
+            ejecutar(f"INSERT INTO modulos (id_modulo, nombre_modulo, estado) VALUES ({modulo}, 'modulo{modulo}', 1)")
+            ejecutar(f"INSERT INTO permisos VALUES ({modulo}, 1, 1, 1, 1, 1)")
+        conexion.execute(text("""
+            INSERT INTO usuarios (nombre, id_rol, email, telefono, documento, pass_hash, estado)
+            VALUES ('Pruebas', 1, 'pruebas@avisena.co', '3001112233', '10203040', :clave, 1)
+        """), {"clave": get_hashed_password(CLAVE)})
+        ejecutar("INSERT INTO metodo_pago VALUES (1, 'Efectivo', '', 1), (2, 'Tarjeta', '', 1)")
+        ejecutar("INSERT INTO fincas VALUES (1, 'Finca', 1, 1, 1)")
+        ejecutar("INSERT INTO galpones VALUES (1, 1, 'Galpon', 100, 10)")
+        ejecutar("INSERT INTO tipo_huevos VALUES (1, 'Blanco', 'AA')")
+        ejecutar("INSERT INTO produccion_huevos VALUES (1, 1, 500, '2025-01-01', 1)")
+        ejecutar("INSERT INTO stock (id_producto, unidad_medida, id_produccion, cantidad_disponible, tipo) VALUES (1, 'panal', 1, 100, 1)")
+        ejecutar("INSERT INTO tipo_gallinas VALUES (1, 'Lohmann', '')")
+        ejecutar("INSERT INTO salvamento VALUES (1, 1, '2025-01-01', 1, 50)")
+        recalcular_disponibilidad(conexion)
+    return {"id_usuario": 1, "id_producto": 1, "id_salvamento": 1}
+
+
+@pytest.fixture(scope="session")
+def cliente(datos_base):
+    import main
+
+    cliente = TestClient(main.app)
+    respuesta = cliente.post("/access/token", data={"username": "pruebas@avisena.co", "password": CLAVE})
+    assert respuesta.status_code == 200, respuesta.text
+    cliente.headers["Authorization"] = f"Bearer {respuesta.json()['access_token']}"
+    return cliente
@@ -0,0 +1,10 @@
+"""
+Borrar un detalle que no existe responde 404 sin tocar stock ni totales.
+"""
+import pytest
+
+
+@pytest.mark.parametrize("ruta", ["/detalle_huevos/by-id/999999", "/detalle_salvamento/999999"])
+def test_borrar_detalle_inexistente_da_404(cliente, datos_base, ruta):
+    respuesta = cliente.delete(ruta)
+    assert respuesta.status_code == 404, respuesta.text
@@ -0,0 +1,25 @@
+"""
+Versiones del catalogo (app/crud/catalogo.py): un since de este proceso devuelve
+solo los cambios; uno de otra epoca (otro worker o un reinicio) el catalogo completo.
+"""
+from app.crud import catalogo
+
+
+def test_since_de_esta_epoca_devuelve_solo_cambios(cliente):
+    version = cliente.get("/ventas/catalogo").json()["version"]
+
+    respuesta = cliente.get("/ventas/catalogo", params={"since": version}).json()
+
+    assert respuesta["completo"] is False
+    assert respuesta["huevos"] == [] and respuesta["salvamento"] == []
+
+
+def test_since_de_otra_epoca_devuelve_completo(cliente):
+    version = cliente.get("/ventas/catalogo").json()["version"]
+    contador = version.rpartition("-")[2]
+    otra_epoca = "0" * len(catalogo._epoca)
+
+    for since in (f"{otra_epoca}-{contador}", f"{catalogo._epoca}-{int(contador) + 1}", "5"):
+        respuesta = cliente.get("/ventas/catalogo", params={"since": since}).json()
+        assert respuesta["completo"] is True, since
+        assert respuesta["huevos"], since
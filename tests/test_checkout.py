@@ -0,0 +1,45 @@
+"""
+POST /ventas/checkout solo acepta metodos de pago existentes y activos, igual que
+la actualizacion de una venta; si no, responde 400 sin tocar existencias ni ventas.
+"""
+import pytest
+from sqlalchemy import text
+
+from core.database import engine
+
+
+def _estado(id_producto: int) -> tuple:
+    with engine.connect() as conexion:
+        return (conexion.execute(text("SELECT cantidad_disponible FROM stock WHERE id_producto = :id"), {"id": id_producto}).scalar(),
+                conexion.execute(text("SELECT COUNT(*) FROM ventas")).scalar())
+
+
+@pytest.fixture
+def metodo_inactivo():
+    with engine.begin() as conexion:
+        conexion.execute(text("INSERT INTO metodo_pago VALUES (90, 'Cheque', '', 0)"))
+    yield 90
+    with engine.begin() as conexion:
+        conexion.execute(text("DELETE FROM metodo_pago WHERE id_tipo = 90"))
+
+
+@pytest.mark.parametrize("tipo_pago", [99, "inactivo"])
+def test_checkout_rechaza_metodo_de_pago_invalido(cliente, datos_base, metodo_inactivo, tipo_pago):
+    tipo_pago = metodo_inactivo if tipo_pago == "inactivo" else tipo_pago
+    antes = _estado(datos_base["id_producto"])
+
+    respuesta = cliente.post("/ventas/checkout", json={
+        "id_usuario": datos_base["id_usuario"], "fecha_hora": "2025-08-01T10:00:00", "tipo_pago": tipo_pago,
+        "huevos": [{"id_producto": datos_base["id_producto"], "cantidad": 1, "precio_venta": 16000}],
+    })
+
+    assert respuesta.status_code == 400, respuesta.text
+    assert _estado(datos_base["id_producto"]) == antes
+
+
+def test_checkout_con_metodo_activo(cliente, datos_base):
+    respuesta = cliente.post("/ventas/checkout", json={
+        "id_usuario": datos_base["id_usuario"], "fecha_hora": "2025-08-01T11:00:00", "tipo_pago": 2,
+        "huevos": [{"id_producto": datos_base["id_producto"], "cantidad": 1, "precio_venta": 16000}],
+    })
+    assert respuesta.status_code == 201, respuesta.text
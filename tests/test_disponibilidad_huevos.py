@@ -0,0 +1,66 @@
+"""
+disponibilidad_huevos (app/crud/disponibilidad_huevos.py) sigue a stock: baja con
+cada venta y sube al cancelarla, siempre igual a recalcularla desde stock. Si un
+ajuste despues del commit falla, /metrics y la conciliacion lo muestran.
+"""
+from sqlalchemy import text
+
+from core.database import engine
+from app.crud import disponibilidad_huevos as crud_disponibilidad
+from app.crud.disponibilidad_huevos import HUEVOS_POR_UNIDAD
+
+
+def _disponibilidad() -> dict:
+    with engine.connect() as conexion:
+        return dict(conexion.execute(text("SELECT tipo, huevos FROM disponibilidad_huevos")).all())
+
+
+def _desde_stock() -> dict:
+    totales = {}
+    with engine.connect() as conexion:
+        for tipo, unidad, cantidad in conexion.execute(text("SELECT tipo, unidad_medida, cantidad_disponible FROM stock")):
+            totales[tipo] = totales.get(tipo, 0) + cantidad * HUEVOS_POR_UNIDAD[unidad]
+    return totales
+
+
+def test_disponibilidad_sigue_ventas_y_cancelaciones(cliente, datos_base):
+    assert _disponibilidad() == _desde_stock()
+
+    venta = cliente.post("/ventas/crear", json={"id_usuario": datos_base["id_usuario"], "fecha_hora": "2025-05-01T08:00:00"})
+    assert venta.status_code == 201, venta.text
+    id_venta = venta.json()["data_venta"]["id_venta"]
+    antes = _disponibilidad()
+    respuesta = cliente.post("/detalle_huevos/crear", json={"id_producto": datos_base["id_producto"], "cantidad": 3, "id_venta": id_venta,
+                                                             "valor_descuento": 0, "precio_venta": 1000})
+    assert respuesta.status_code == 201, respuesta.text
+
+    despues = _disponibilidad()
+    assert antes[1] - despues[1] == 3 * HUEVOS_POR_UNIDAD["panal"]
+    assert despues == _desde_stock()
+
+    assert cliente.put(f"/ventas/cambiar-estado/{id_venta}", params={"nuevo_estado": False}).status_code == 200
+    assert _disponibilidad() == antes == _desde_stock()
+
+
+def test_ajuste_fallido_queda_en_metricas_y_conciliacion(cliente, datos_base, monkeypatch):
+    def _fallar(db, deltas):
+        raise RuntimeError("ajuste perdido")
+
+    venta = cliente.post("/ventas/crear", json={"id_usuario": datos_base["id_usuario"], "fecha_hora": "2025-05-02T08:00:00"})
+    assert venta.status_code == 201, venta.text
+    fallidos = cliente.get("/metrics").json()["disponibilidad_huevos"]["ajustes_fallidos"]
+    monkeypatch.setattr(crud_disponibilidad, "ajustar_disponibilidad", _fallar)
+    respuesta = cliente.post("/detalle_huevos/crear", json={"id_producto": datos_base["id_producto"], "cantidad": 2,
+                                                             "id_venta": venta.json()["data_venta"]["id_venta"],
+                                                             "valor_descuento": 0, "precio_venta": 1000})
+    assert respuesta.status_code == 201, respuesta.text
+    monkeypatch.undo()
+
+    assert cliente.get("/metrics").json()["disponibilidad_huevos"]["ajustes_fallidos"] == fallidos + 1
+    diferencias = cliente.get("/detalle_huevos/conciliacion-stock").json()["disponibilidad"]
+    assert diferencias == [{"tipo": 1, "esperado": _desde_stock()[1], "actual": _disponibilidad()[1],
+                            "diferencia": 2 * HUEVOS_POR_UNIDAD["panal"]}]
+
+    with engine.begin() as conexion:
+        crud_disponibilidad.recalcular_disponibilidad(conexion)
+    assert cliente.get("/detalle_huevos/conciliacion-stock").json()["disponibilidad"] == []
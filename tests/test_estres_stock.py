@@ -0,0 +1,113 @@
+"""
+Muchos hilos venden a la vez el mismo producto por la API (POST /detalle_huevos/crear)
+con mas demanda que existencias: nunca se vende de mas ni quedan existencias
+negativas, y las ventas aceptadas suman exactamente las existencias iniciales.
+Misma verificacion que bench/estres_stock.py, sin coalescedor de reservas y con el.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from collections import Counter
+import threading
+
+import pytest
+from sqlalchemy import text
+
+from core.database import engine
+from app.crud import stock
+from app.crud.disponibilidad_huevos import huevos_por_unidad, recalcular_disponibilidad
+
+HILOS = 8
+INTENTOS = 15
+EXISTENCIAS = 60
+CANTIDAD = 2
+
+
+def _existencias(id_producto: int) -> int:
+    with engine.connect() as conexion:
+        return conexion.execute(text("SELECT cantidad_disponible FROM stock WHERE id_producto = :id"),
+                                {"id": id_producto}).scalar()
+
+
+@pytest.fixture
+def producto():
+    with engine.begin() as conexion:
+        id_producto = conexion.execute(text("SELECT COALESCE(MAX(id_producto), 0) + 1 FROM stock")).scalar()
+        conexion.execute(text("""
+            INSERT INTO stock (id_producto, unidad_medida, id_produccion, cantidad_disponible, tipo)
+            VALUES (:id, 'unidad', 1, :cantidad, 1)
+        """), {"id": id_producto, "cantidad": EXISTENCIAS})
+        recalcular_disponibilidad(conexion)
+    return id_producto
+
+
+@pytest.fixture(params=[0, 20], ids=["por_linea", "coalescedor_20ms"])
+def coalescedor(request, monkeypatch):
+    '''
+    Activa el coalescedor con la ventana del parametro y cuenta las reservas que
+    pasan por el. Al terminar lo deja como estaba.
+    '''
+    anterior = stock._coalescedor
+    stock.configurar_coalescedor(request.param)
+    reservas = Counter()
+    reservar = stock.CoalescedorStock.reservar
+
+    def contar(self, *args, **kwargs):
+        reservas["coalescedor"] += 1
+        return reservar(self, *args, **kwargs)
+
+    monkeypatch.setattr(stock.CoalescedorStock, "reservar", contar)
+    yield request.param, reservas
+    stock._coalescedor = anterior
+
+
+def _vender(cliente, detalle: dict, inicio: threading.Barrier) -> Counter:
+    resultados = Counter()
+    inicio.wait()
+    for _ in range(INTENTOS):
+        respuesta = cliente.post("/detalle_huevos/crear", json=detalle)
+        if respuesta.status_code == 201:
+            resultados["vendidas"] += 1
+        elif respuesta.status_code == 400:
+            resultados["sin_existencias"] += 1
+        else:
+            resultados[f"error_{respuesta.status_code}"] += 1
+    return resultados
+
+
+def test_ventas_concurrentes_no_sobrevenden(cliente, datos_base, producto, coalescedor):
+    ventana_ms, reservas = coalescedor
+    assert HILOS * INTENTOS * CANTIDAD > EXISTENCIAS
+    respuesta = cliente.post("/ventas/crear", json={"id_usuario": datos_base["id_usuario"],
+                                                    "fecha_hora": "2025-04-01T09:00:00"})
+    assert respuesta.status_code == 201, respuesta.text
+    id_venta = respuesta.json()["data_venta"]["id_venta"]
+    detalle = {"id_producto": producto, "cantidad": CANTIDAD, "id_venta": id_venta,
+               "valor_descuento": 0, "precio_venta": 1000}
+
+    inicio = threading.Barrier(HILOS)
+    with ThreadPoolExecutor(HILOS) as pool:
+        resultados = sum(pool.map(lambda _: _vender(cliente, detalle, inicio), range(HILOS)), Counter())
+
+    finales = _existencias(producto)
+    with engine.connect() as conexion:
+        detalles = conexion.execute(text("SELECT COUNT(*) FROM detalle_huevos WHERE id_venta = :id"),
+                                    {"id": id_venta}).scalar()
+
+    assert set(resultados) <= {"vendidas", "sin_existencias"}, resultados
+    assert finales == 0
+    assert resultados["vendidas"] * CANTIDAD == EXISTENCIAS
+    assert detalles == resultados["vendidas"]
+    # La disponibilidad por tipo, ajustada despues de cada commit, termina igual que stock
+    with engine.connect() as conexion:
+        assert conexion.execute(text(f"""
+            SELECT disponibilidad_huevos.huevos - (
+                SELECT SUM(cantidad_disponible * {huevos_por_unidad('unidad_medida')}) FROM stock WHERE stock.tipo = 1
+            ) FROM disponibilidad_huevos WHERE tipo = 1
+        """)).scalar() == 0
+    # Cada venta aceptada quedo en el libro con su detalle y no quedan reservas sin vender
+    with engine.connect() as conexion:
+        assert conexion.execute(text("""
+            SELECT COUNT(*), SUM(delta), COUNT(id_detalle) FROM movimientos_stock
+            WHERE inventario = 'stock' AND id_producto = :id AND id_venta = :venta
+        """), {"id": producto, "venta": id_venta}).one() == (detalles, -EXISTENCIAS, detalles)
+    # La sesion de la peticion ya leyo (autenticacion), pero cada reserva usa el coalescedor
+    assert reservas["coalescedor"] == (HILOS * INTENTOS if ventana_ms else 0)
@@ -0,0 +1,54 @@
+"""
+existencias_a_fecha parte de la ultima foto (snapshots_stock) y solo calcula hacia
+atras, recorriendo el libro, los productos que no estan en ella.
+"""
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import event, text
+
+from core.database import SessionLocal, engine
+from app.crud.movimientos_stock import compactar_dia, existencias_a_fecha
+from app.crud.disponibilidad_huevos import recalcular_disponibilidad
+
+
+def _actuales(db) -> dict:
+    return dict(db.execute(text("SELECT id_producto, cantidad_disponible FROM stock")).all())
+
+
+def _consultas_hacia_atras(db, momento: datetime) -> tuple:
+    sentencias = []
+
+    def anotar(conn, cursor, sentencia, *args):
+        sentencias.append(sentencia)
+
+    event.listen(engine, "before_cursor_execute", anotar)
+    try:
+        resultado = existencias_a_fecha(db, "detalle_huevos", momento)
+    finally:
+        event.remove(engine, "before_cursor_execute", anotar)
+    return resultado, sum("AS posteriores" in sentencia for sentencia in sentencias)
+
+
+def test_existencias_a_fecha_solo_recorre_el_libro_sin_foto(datos_base):
+    db = SessionLocal()
+    try:
+        compactar_dia(db, "detalle_huevos", date.today() - timedelta(days=1))
+        db.commit()
+
+        resultado, hacia_atras = _consultas_hacia_atras(db, datetime.now())
+        assert hacia_atras == 0
+        assert {fila["id_producto"]: fila["cantidad"] for fila in resultado["existencias"]} == _actuales(db)
+
+        id_nuevo = db.execute(text("SELECT MAX(id_producto) + 1 FROM stock")).scalar()
+        db.execute(text("""
+            INSERT INTO stock (id_producto, unidad_medida, id_produccion, cantidad_disponible, tipo)
+            VALUES (:id, 'docena', 1, 7, 1)
+        """), {"id": id_nuevo})
+        recalcular_disponibilidad(db)
+        db.commit()
+
+        resultado, hacia_atras = _consultas_hacia_atras(db, datetime.now())
+        assert hacia_atras == 1
+        assert {fila["id_producto"]: fila["cantidad"] for fila in resultado["existencias"]} == _actuales(db)
+    finally:
+        db.close()
@@ -0,0 +1,30 @@
+"""
+Los listados de ventas deben leer por sus indices (migrations/002) sin ordenar
+en memoria. Usa el mismo EXPLAIN (QUERY PLAN) que scripts.verificar_indices.
+"""
+import pytest
+
+from core.database import SessionLocal
+from scripts.verificar_indices import verificar
+
+
+@pytest.fixture(scope="module")
+def ventas(cliente, datos_base):
+    for i in range(30):
+        respuesta = cliente.post("/ventas/crear", json={
+            "id_usuario": datos_base["id_usuario"],
+            "fecha_hora": f"2025-03-{1 + i % 28:02d}T10:00:00",
+        })
+        assert respuesta.status_code == 201, respuesta.text
+
+
+def test_listados_de_ventas_usan_sus_indices(ventas):
+    db = SessionLocal()
+    try:
+        resultados = verificar(db)
+    finally:
+        db.close()
+
+    assert resultados, "no se capturaron consultas de ventas"
+    fallos = [r for r in resultados if not r["correcto"]]
+    assert not fallos, fallos
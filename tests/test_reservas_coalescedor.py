@@ -0,0 +1,94 @@
+"""
+Reservas del coalescedor (app/crud/stock.py): quedan en el libro movimientos_stock
+desde que se confirman, se devuelven si la venta hace rollback y, si el proceso cae
+entre los dos commits, scripts.reparar_reservas las devuelve.
+"""
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import text
+
+from core.database import SessionLocal, engine
+from app.crud import stock
+from app.crud.disponibilidad_huevos import recalcular_disponibilidad
+from scripts.reparar_reservas import reparar
+
+EXISTENCIAS = 40
+
+
+@pytest.fixture
+def coalescedor():
+    anterior = stock._coalescedor
+    stock.configurar_coalescedor(5)
+    yield
+    stock._coalescedor = anterior
+
+
+@pytest.fixture
+def producto_y_venta(cliente, datos_base):
+    with engine.begin() as conexion:
+        id_producto = conexion.execute(text("SELECT COALESCE(MAX(id_producto), 0) + 1 FROM stock")).scalar()
+        conexion.execute(text("""
+            INSERT INTO stock (id_producto, unidad_medida, id_produccion, cantidad_disponible, tipo)
+            VALUES (:id, 'unidad', 1, :cantidad, 1)
+        """), {"id": id_producto, "cantidad": EXISTENCIAS})
+        recalcular_disponibilidad(conexion)
+    respuesta = cliente.post("/ventas/crear", json={"id_usuario": datos_base["id_usuario"], "fecha_hora": "2025-06-01T09:00:00"})
+    assert respuesta.status_code == 201, respuesta.text
+    return id_producto, respuesta.json()["data_venta"]["id_venta"]
+
+
+def _estado(id_producto: int, id_venta: int) -> tuple:
+    with engine.connect() as conexion:
+        existencias = conexion.execute(text("SELECT cantidad_disponible FROM stock WHERE id_producto = :id"),
+                                       {"id": id_producto}).scalar()
+        movimientos = conexion.execute(text("""
+            SELECT motivo, delta, id_detalle IS NOT NULL AS con_detalle FROM movimientos_stock
+            WHERE inventario = 'stock' AND id_producto = :id AND id_venta = :venta
+            ORDER BY id_movimiento
+        """), {"id": id_producto, "venta": id_venta}).all()
+    return existencias, [tuple(movimiento) for movimiento in movimientos]
+
+
+def test_venta_coalescida_deja_un_movimiento_con_detalle(cliente, coalescedor, producto_y_venta):
+    id_producto, id_venta = producto_y_venta
+    respuesta = cliente.post("/detalle_huevos/crear", json={"id_producto": id_producto, "cantidad": 4, "id_venta": id_venta,
+                                                             "valor_descuento": 0, "precio_venta": 1000})
+    assert respuesta.status_code == 201, respuesta.text
+
+    assert _estado(id_producto, id_venta) == (EXISTENCIAS - 4, [("venta", -4, 1)])
+
+
+def test_rollback_devuelve_la_reserva(coalescedor, producto_y_venta):
+    id_producto, id_venta = producto_y_venta
+    db = SessionLocal()
+    try:
+        assert stock.reservar_para_venta(db, "detalle_huevos", id_producto, 5, id_venta)
+        db.rollback()
+    finally:
+        db.close()
+
+    assert _estado(id_producto, id_venta) == (EXISTENCIAS, [("venta", -5, 0), ("devolucion", 5, 0)])
+
+
+def test_reparar_reservas_devuelve_las_que_quedaron_sin_vender(coalescedor, producto_y_venta):
+    id_producto, id_venta = producto_y_venta
+    db = SessionLocal()
+    try:
+        assert stock.reservar_para_venta(db, "detalle_huevos", id_producto, 6, id_venta)
+        # El proceso cae antes del commit de la venta: nadie compensa la reserva
+        db.info.pop(stock.RESERVAS_PENDIENTES)
+        db.rollback()
+    finally:
+        db.close()
+    assert _estado(id_producto, id_venta)[0] == EXISTENCIAS - 6
+
+    db = SessionLocal()
+    try:
+        assert reparar(db, "detalle_huevos", datetime.now() - timedelta(minutes=10)) == 0
+        assert reparar(db, "detalle_huevos", datetime.now() + timedelta(seconds=1)) == 1
+        assert reparar(db, "detalle_huevos", datetime.now() + timedelta(seconds=1)) == 0
+    finally:
+        db.close()
+
+    assert _estado(id_producto, id_venta) == (EXISTENCIAS, [("venta", -6, 0), ("devolucion", 6, 0)])
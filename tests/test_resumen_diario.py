@@ -0,0 +1,73 @@
+"""
+ventas_resumen_diario (app/crud/totales_venta.py) se ajusta despues del commit de
+cada venta y termina igual que reconstruirlo desde ventas y detalles; lo que
+hace rollback no llega al resumen.
+"""
+from datetime import date
+
+from sqlalchemy import text
+
+from core.database import SessionLocal, engine
+from app.crud.totales_venta import recalcular_resumen, sumar_resumen
+
+DIA = date(2025, 7, 1)
+
+
+def _resumen() -> list:
+    with engine.connect() as conexion:
+        return [tuple(fila) for fila in conexion.execute(text("""
+            SELECT dia, tipo_pago, id_usuario, cantidad_ventas, bruto, descuento, neto
+            FROM ventas_resumen_diario
+            WHERE dia = :dia AND (cantidad_ventas <> 0 OR neto <> 0)
+            ORDER BY tipo_pago, id_usuario
+        """), {"dia": DIA})]
+
+
+def _reconstruido() -> list:
+    db = SessionLocal()
+    try:
+        recalcular_resumen(db, DIA, date(2025, 7, 2))
+        db.flush()
+        filas = [tuple(fila) for fila in db.execute(text("""
+            SELECT dia, tipo_pago, id_usuario, cantidad_ventas, bruto, descuento, neto
+            FROM ventas_resumen_diario
+            WHERE dia = :dia AND (cantidad_ventas <> 0 OR neto <> 0)
+            ORDER BY tipo_pago, id_usuario
+        """), {"dia": DIA})]
+        db.rollback()
+        return filas
+    finally:
+        db.close()
+
+
+def test_resumen_sigue_ventas_detalles_y_cancelaciones(cliente, datos_base):
+    ids = []
+    for hora, tipo_pago in ((8, 1), (9, 2), (10, 1)):
+        respuesta = cliente.post("/ventas/crear", json={"id_usuario": datos_base["id_usuario"], "tipo_pago": tipo_pago,
+                                                        "fecha_hora": f"{DIA}T{hora:02d}:00:00"})
+        assert respuesta.status_code == 201, respuesta.text
+        ids.append(respuesta.json()["data_venta"]["id_venta"])
+    for id_venta, cantidad in zip(ids, (1, 2, 3)):
+        respuesta = cliente.post("/detalle_salvamento/crear", json={"id_producto": datos_base["id_salvamento"], "cantidad": cantidad,
+                                                                    "id_venta": id_venta, "valor_descuento": 100, "precio_venta": 2000})
+        assert respuesta.status_code == 201, respuesta.text
+    assert cliente.put(f"/ventas/cambiar-estado/{ids[1]}", params={"nuevo_estado": False}).status_code == 200
+
+    assert _resumen() and _resumen() == _reconstruido()
+
+
+def test_rollback_no_llega_al_resumen(cliente, datos_base):
+    antes = _resumen()
+    id_venta = cliente.post("/ventas/crear", json={"id_usuario": datos_base["id_usuario"], "tipo_pago": 1,
+                                                   "fecha_hora": f"{DIA}T11:00:00"}).json()["data_venta"]["id_venta"]
+    con_venta = _resumen()
+    assert con_venta != antes
+
+    db = SessionLocal()
+    try:
+        sumar_resumen(db, id_venta, ventas=5, bruto=1000)
+        db.rollback()
+    finally:
+        db.close()
+
+    assert _resumen() == con_venta == _reconstruido()